@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CFR', '0002_alter_cfrnode_descendant_range_end_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cfrnode',
+            index=models.Index(fields=['identifier', 'node_type'], name='cfr_node_citation_idx'),
+        ),
+    ]
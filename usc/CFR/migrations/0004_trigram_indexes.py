@@ -0,0 +1,25 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:09
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CFR', '0003_citation_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='cfrnode',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('label'), name='gin_trgm_ops'), name='cfr_node_label_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='cfrnode',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('label_description'), name='gin_trgm_ops'), name='cfr_node_label_desc_trgm'),
+        ),
+    ]
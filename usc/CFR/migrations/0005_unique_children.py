@@ -0,0 +1,42 @@
+# Generated by Django 4.1.2 on 2026-10-19 18:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicates(apps, schema_editor):
+    """Drop the nodes concurrent requests loaded twice, the delete
+    cascades to everything under them"""
+    CFRNode = apps.get_model('CFR', 'CFRNode')
+
+    groups = CFRNode.objects\
+        .values('parent', 'node_type', 'identifier')\
+        .annotate(count=Count('id'), keep=Min('id'))\
+        .filter(count__gt=1)
+
+    for group in groups:
+        CFRNode.objects\
+            .filter(parent=group['parent'])\
+            .filter(node_type=group['node_type'])\
+            .filter(identifier=group['identifier'])\
+            .exclude(id=group['keep'])\
+            .delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CFR', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cfrnode',
+            constraint=models.UniqueConstraint(fields=('parent', 'node_type', 'identifier'), name='cfr_node_child_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='cfrnode',
+            constraint=models.UniqueConstraint(condition=models.Q(('parent__isnull', True)), fields=('identifier',), name='cfr_node_title_uniq'),
+        ),
+    ]
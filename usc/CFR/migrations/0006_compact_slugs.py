@@ -0,0 +1,61 @@
+# Generated by Django 4.1.2 on 2026-10-19 18:25
+
+from django.db import migrations, models
+from django.utils.text import slugify
+from utils.general import compact_slug
+
+BATCH_SIZE = 1000
+
+
+def rebuild_slugs(apps, schema_editor):
+    """Give every node the slug CFRNode.get_slug makes, a level of the
+    tree at a time since a slug is made from the slug of the parent"""
+    CFRNode = apps.get_model('CFR', 'CFRNode')
+    fields = (
+        'id', 'slug_id', 'identifier', 'label', 'label_description',
+        'node_type', 'parent_id',
+    )
+
+    def get_name(node):
+        if node.node_type == 'title':
+            return slugify(node.label_description)
+        return slugify(node.label)
+
+    level = list(CFRNode.objects.filter(parent__isnull=True).only(*fields))
+    for node in level:
+        node.slug_id = compact_slug(get_name(node), 'CFR', node.identifier)
+
+    while level:
+        CFRNode.objects.bulk_update(
+            level, ['slug_id'], batch_size=BATCH_SIZE)
+
+        slugs = {node.id: node.slug_id for node in level}
+        parent_ids = list(slugs)
+
+        level = []
+        for i in range(0, len(parent_ids), BATCH_SIZE):
+            children = CFRNode.objects\
+                .filter(parent_id__in=parent_ids[i:i + BATCH_SIZE])\
+                .only(*fields)
+
+            for node in children:
+                node.slug_id = compact_slug(
+                    get_name(node), slugs[node.parent_id],
+                    node.node_type, node.identifier)
+                level.append(node)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CFR', '0005_unique_children'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cfrnode',
+            name='slug_id',
+            field=models.SlugField(editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CFR', '0006_compact_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cfrnode',
+            name='child_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cfrnode',
+            name='leaf_count',
+            field=models.IntegerField(default=0),
+        ),
+
+        # counts of the nodes already loaded
+        migrations.RunSQL(
+            sql="""
+                UPDATE cfr_node
+                SET child_count = counts.children,
+                    leaf_count = counts.leaves
+                FROM (
+                    SELECT parent_id,
+                        count(*) AS children,
+                        count(*) FILTER (
+                            WHERE node_type IN ('section', 'appendix')
+                        ) AS leaves
+                    FROM cfr_node
+                    WHERE parent_id IS NOT NULL
+                    GROUP BY parent_id
+                ) counts
+                WHERE cfr_node.id = counts.parent_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,62 +1,102 @@
-from functools import reduce
+from time import perf_counter
 from typing import Type
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models, transaction
+from django.db.models import (BooleanField, Case, Count, ExpressionWrapper,
+                              OuterRef, Q, Subquery, When)
+from django.db.models.functions import Coalesce, Length, Upper
 from django.db.models.manager import Manager
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.urls import reverse
-from django.utils.crypto import get_random_string
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from django.utils.text import slugify
-from utils.data import (cfr_full_text_search, get_cfr_html, get_cfr_json,
+from utils.data import (acfr_full_text_search, aget_cfr_html,
+                        cfr_full_text_search, get_cfr_html, get_cfr_json,
                         get_cfr_pdf_link, get_cfr_titles)
-
-
-def merge(a, b):
-    """Merge two queryset"""
-    return a | b
+from utils.general import compact_slug
+from utils.locks import single_flight
+from utils.logger import ingest_logger
+from utils.metrics import record_ingested
 
 
 class CFRNodeManager(Manager):
     def get_queryset(self) -> models.QuerySet['CFRNode']:
-        return super().get_queryset().select_related('parent')
-
-    def full_text_search(self, query: str) -> models.QuerySet['CFRNode']:
-        """Full text search"""
-        results = cfr_full_text_search(query)
-
-        # get the titles
-        titles = self.get_titles()
-
-        sections: list[models.query.QuerySet['CFRNode']] = []
-
-        worked_on = {}
-
-        for res in results:
-
-            _t = res['title']
-            _s = res['section']
-
-            _check_t = worked_on.get(_t)
-            if _check_t is not None:
-                if _s == _check_t:
-                    continue
-
-            title = titles.get(identifier=_t)
+        return super().get_queryset().select_related('parent', 'title_node')
+
+    def full_text_search(self, query: str, load: bool = True
+                         ) -> models.QuerySet['CFRNode']:
+        """Full text search, without load only the sections already
+        stored are found"""
+        return self.get_hits(cfr_full_text_search(query) or [], load)
+
+    async def afull_text_search(self, query: str) -> list['CFRNode']:
+        """full_text_search for the async views, eCFR is awaited and the
+        nodes are read on the thread of the request"""
+        results = await acfr_full_text_search(query) or []
+        return await sync_to_async(
+            lambda: list(self.get_hits(results)))()
+
+    def get_hits(self, results: list[dict], load: bool = True
+                 ) -> models.QuerySet['CFRNode']:
+        """The nodes of the sections eCFR found, without load the titles
+        and sections not stored yet are left out instead of loaded"""
+        hits = dict.fromkeys((str(res['title']), res['section'])
+                             for res in results)
+
+        # get the titles of the results at once
+        titles = self.get_titles() if load else \
+            self.get_queryset().filter(parent__isnull=True)
+        titles = titles.filter(identifier__in={title for title, _ in hits})
+        titles = {title.identifier: title for title in titles}
+
+        # Load the sections of each title the first time, once per title
+        # however many of its sections were hit
+        for title in titles.values() if load else ():
             title.get_child_nodes()
-            section = title.title_nodes.filter(identifier=_s)
-            if section.exists():
-                sections.append(section)
 
-            worked_on[_t] = _s
+        search = Q()
+        for _t, _s in hits:
+            title = titles.get(_t)
+            if title is not None:
+                search |= Q(title_node=title, identifier=_s)
 
-        if not sections:
+        if not search:
             return self.none()
 
-        return reduce(merge, sections).distinct()[:settings.SEARCH_MAX_RESULTS]
+        return self.get_queryset().filter(search)\
+            .distinct()[:settings.SEARCH_MAX_RESULTS]
+
+    def get_by_citation(self, title: int, identifier: str, node_type: str):
+        """Get an already loaded node of a title by its identifier"""
+        return self.get_queryset()\
+            .filter(identifier=identifier, node_type=node_type)\
+            .filter(title_node__identifier=str(title))\
+            .first()
+
+    def autocomplete(self, term: str, limit: int):
+        """Nodes with the term in the label or label description, the
+        ones starting with it first, then the shortest"""
+        search = Q(label__icontains=term) | \
+            Q(label_description__icontains=term)
+        prefix = Q(label__istartswith=term) | \
+            Q(label_description__istartswith=term)
+
+        # The length of what get_title shows
+        length = Case(
+            When(node_type='title', then=Length('label_description')),
+            default=Length('label'),
+        )
+
+        return self.get_queryset().filter(search)\
+            .annotate(
+                prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+                length=length)\
+            .order_by('-prefix', 'length', 'pk')[:limit]
 
     def search(self, title: str, section: str):
         """Search for a node"""
@@ -67,11 +107,13 @@ class CFRNodeManager(Manager):
     def get_titles(self):
         """Get the titles"""
         titles = self.get_queryset().filter(parent__isnull=True)
-        if not titles:
+        if titles.exists():
+            return titles
 
-            with transaction.atomic():
+        with single_flight("cfr-titles"):
+            # Created by the request we waited for
+            if not titles.exists():
                 self.create_titles()
-                titles = self.get_queryset().filter(parent__isnull=True)
 
         return titles
 
@@ -81,13 +123,15 @@ class CFRNodeManager(Manager):
 
         for title in titles:
 
-            self.create(
+            self.update_or_create(
                 identifier=title['number'],
-                label_description=title['name'],
-                reserved=title['reserved'],
-                up_to_date_as_of=title['up_to_date_as_of'],
-                node_type='title',
-                parent=None
+                parent=None,
+                defaults={
+                    'label_description': title['name'],
+                    'reserved': title['reserved'],
+                    'up_to_date_as_of': title['up_to_date_as_of'],
+                    'node_type': 'title',
+                }
             )
 
 
@@ -97,7 +141,7 @@ class CFRNode(models.Model):
     objects = CFRNodeManager()
 
     slug_id = models.SlugField(
-        max_length=1024,
+        max_length=64,
         unique=True,
         editable=False
     )
@@ -115,6 +159,10 @@ class CFRNode(models.Model):
     descendant_range_start = models.CharField(max_length=1024, null=True)
     descendant_range_end = models.CharField(max_length=1024, null=True)
 
+    # Kept by the ingestion
+    child_count = models.IntegerField(default=0)
+    leaf_count = models.IntegerField(default=0)
+
     node_type = models.CharField(max_length=20)
 
     parent: Type['CFRNode'] = models.ForeignKey(
@@ -127,10 +175,27 @@ class CFRNode(models.Model):
     def __str__(self):
         return self.label_description
 
+    # What a reload of a node from eCFR may change
+    UPSERT_FIELDS = (
+        'slug_id', 'label', 'label_level', 'label_description', 'reserved',
+        'volumes', 'title_node', 'descendant_range_start',
+        'descendant_range_end',
+    )
+
     def get_unique_id(self):
         """Get a unique id for the node"""
         return slugify(self.get_title())
 
+    def get_slug(self):
+        """Slug from the path of identifiers down to the node, the url
+        of a node stays the same across reloads"""
+        if self.parent_id is None:
+            identity = (settings.CFR, self.identifier)
+        else:
+            identity = (self.parent.slug_id, self.node_type, self.identifier)
+
+        return compact_slug(self.get_unique_id(), *identity)
+
     def get_collection_name(self):
         """Get the collection name"""
         return settings.CFR
@@ -174,6 +239,33 @@ class CFRNode(models.Model):
         verbose_name = 'CFR Node'
         verbose_name_plural = "CFR Nodes"
         db_table = 'cfr_node'
+        constraints = (
+            models.UniqueConstraint(
+                fields=["parent", "node_type", "identifier"],
+                name="cfr_node_child_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["identifier"],
+                condition=Q(parent__isnull=True),
+                name="cfr_node_title_uniq"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=["identifier", "node_type"],
+                name="cfr_node_citation_idx"
+            ),
+
+            # Trigram indexes on the UPPER() expressions icontains uses
+            GinIndex(
+                OpClass(Upper("label"), name="gin_trgm_ops"),
+                name="cfr_node_label_trgm"
+            ),
+            GinIndex(
+                OpClass(Upper("label_description"), name="gin_trgm_ops"),
+                name="cfr_node_label_desc_trgm"
+            ),
+        )
 
     def html_link(self):
         pass
@@ -201,6 +293,18 @@ class CFRNode(models.Model):
             )
         )
 
+    async def aget_html_content(self):
+        """get_html_content for the async views, the title node has to
+        be selected with the node"""
+        return mark_safe(
+            await aget_cfr_html(
+                self.title_node.identifier,
+                self.title_node.up_to_date_as_of,
+                self.node_type,
+                self.identifier
+            )
+        )
+
     @cached_property
     def pdf_link(self):
 
@@ -258,14 +362,18 @@ class CFRNode(models.Model):
         """Get all the child nodes of the collection"""
         nodes = self.children
 
-        if len(nodes) > 0:
+        # Sections and appendices have no children to load, and the
+        # counts tell loaded nodes without asking the database
+        if not self.has_children() or self.child_count or nodes.exists():
             return nodes
 
-        with transaction.atomic():
-            # If there are no children, get the children from the API
-            nodes = self.new_child_nodes()
+        with single_flight(f"cfr-node:{self.pk}"):
+            # Loaded by the request we waited for
+            if nodes.exists():
+                return nodes
 
-        return nodes
+            # If there are no children, get the children from the API
+            return self.new_child_nodes()
 
     def get_json_data(self):
         return get_cfr_json(
@@ -273,62 +381,130 @@ class CFRNode(models.Model):
             self.up_to_date_as_of
         )
 
-    def create_nodes(
-        self, nodes: dict, parent: Type["CFRNode"],
-        title_node: Type["CFRNode"]
-    ):
-        """Create the nodes for the collection"""
-        children = nodes.get('children', [])
-
-        print("adding nodes")
-
-        if nodes.get('type') != 'title':
-            descendant_range = nodes.get('descendant_range')
-            start, end = None, None
-
-            if descendant_range:
-                descendant_range = descendant_range.replace(
-                    ' – ', '-').split('-')
-
-                if len(descendant_range) == 2:
-                    start, end = descendant_range
-                else:
-                    start = descendant_range[0]
-
-            volumes = nodes.get('volumes')
-            if volumes:
-                volumes = volumes[0]
-
-            identifier = nodes.get('identifier')
-
-            if identifier is not None:
-                parent = CFRNode(
-                    identifier=nodes.get('identifier'),
-                    label=nodes.get('label'),
-                    label_level=nodes.get('label_level'),
-                    label_description=nodes.get('label_description'),
-                    reserved=nodes.get('reserved'),
-                    node_type=nodes.get('type'),
-                    volumes=volumes,
-                    parent=parent,
-                    title_node=title_node,
-                    descendant_range_start=start,
-                    descendant_range_end=end,
-                )
-                parent.save()
-        else:
-            # Update title
-            parent.identifier = nodes.get('identifier')
-            parent.label = nodes.get('label')
-            parent.label_level = nodes.get('label_level')
-            parent.label_description = nodes.get('label_description')
-            parent.reserved = nodes.get('reserved')
-            parent.save()
+    def build_child_node(
+        self, nodes: dict, title_node: Type["CFRNode"]
+    ) -> "CFRNode":
+        """Build an unsaved child of this node from the eCFR json"""
+        descendant_range = nodes.get('descendant_range')
+        start, end = None, None
 
+        if descendant_range:
+            descendant_range = descendant_range.replace(
+                ' – ', '-').split('-')
 
-        if children:
-            for child in children:
-                self.create_nodes(child, parent, title_node)
+            if len(descendant_range) == 2:
+                start, end = descendant_range
+            else:
+                start = descendant_range[0]
+
+        volumes = nodes.get('volumes')
+        if volumes:
+            volumes = volumes[0]
+
+        node = CFRNode(
+            identifier=nodes.get('identifier'),
+            label=nodes.get('label'),
+            label_level=nodes.get('label_level'),
+            label_description=nodes.get('label_description'),
+            reserved=bool(nodes.get('reserved')),
+            node_type=nodes.get('type'),
+            volumes=volumes,
+            parent=self,
+            title_node=title_node,
+            descendant_range_start=start,
+            descendant_range_end=end,
+        )
+        node.slug_id = node.get_slug()
+        return node
+
+    def get_key(self):
+        """What tells the node apart from its siblings"""
+        return self.parent_id, self.node_type, self.identifier
+
+    def create_nodes(self, nodes: dict):
+        """Create the nodes under the title, one upsert per level of the
+        tree so a reload updates the nodes loaded before"""
+
+        start = perf_counter()
+        count = 0
+
+        # Update title
+        self.identifier = nodes.get('identifier')
+        self.label = nodes.get('label')
+        self.label_level = nodes.get('label_level')
+        self.label_description = nodes.get('label_description')
+        self.reserved = bool(nodes.get('reserved'))
+        self.save()
+
+        level = [(self, child) for child in nodes.get('children', [])]
+        while level:
+            # Nodes without an identifier only group their children,
+            # which go under the parent of the group
+            children = {}
+            for parent, child in level:
+                if child.get('identifier') is not None:
+                    node = parent.build_child_node(child, self)
+                    children[node.get_key()] = node
+
+            CFRNode.objects.bulk_create(
+                children.values(),
+                update_conflicts=True,
+                unique_fields=['parent', 'node_type', 'identifier'],
+                update_fields=CFRNode.UPSERT_FIELDS,
+            )
+            record_ingested(settings.CFR, len(children))
+            count += len(children)
+            ingest_logger.debug(
+                "Added %s nodes under %s", len(children), self)
+
+            if not any(child.get('children') for _, child in level):
+                break
+
+            # Upserted rows don't get their ids back
+            saved = {
+                node.get_key(): node
+                for node in CFRNode.objects.filter(
+                    parent__in={parent.pk for parent, _ in level})
+            }
+
+            next_level = []
+            for parent, child in level:
+                if child.get('identifier') is not None:
+                    parent = saved[(
+                        parent.pk, child.get('type'), child.get('identifier')
+                    )]
+
+                next_level.extend(
+                    (parent, grandchild)
+                    for grandchild in child.get('children', [])
+                )
+            level = next_level
+
+        self.update_counts()
+
+        ingest_logger.info(
+            "Added the nodes of %s", self, extra={
+                "node": self.pk,
+                "count": count,
+                "duration_ms": round((perf_counter() - start) * 1000, 2),
+            })
+
+    def update_counts(self):
+        """Count the children and leaves of the title and the nodes under
+        it, in one statement once the tree is loaded"""
+        children = CFRNode.objects\
+            .filter(parent=OuterRef('pk'))\
+            .order_by()\
+            .values('parent')
+        leaves = children.filter(node_type__in=('section', 'appendix'))
+
+        def count(nodes):
+            nodes = nodes.annotate(count=Count('pk')).values('count')
+            return Coalesce(Subquery(nodes), 0)
+
+        CFRNode.objects\
+            .filter(Q(pk=self.pk) | Q(title_node=self))\
+            .update(child_count=count(children), leaf_count=count(leaves))
 
     def new_child_nodes(self):
         """Get and create new child nodes"""
@@ -339,7 +515,7 @@ class CFRNode(models.Model):
 
                 if data:
                     # Create the child nodes
-                    self.create_nodes(data, self, self)
+                    self.create_nodes(data)
 
                     # Return the child nodes
                     return self.children
@@ -358,22 +534,31 @@ class CFRNode(models.Model):
         </li>
         """)
 
+    def get_ancestors(self) -> list['CFRNode']:
+        """The nodes from the title down to this one, in one query
+        instead of one per level"""
+        table = self._meta.db_table
+        return list(type(self).objects.raw(f"""
+            WITH RECURSIVE ancestors AS (
+                SELECT node.*, 0 AS depth FROM {table} node
+                WHERE node.id = %s
+                UNION ALL
+                SELECT node.*, ancestors.depth + 1 FROM {table} node
+                JOIN ancestors ON node.id = ancestors.parent_id
+            )
+            SELECT * FROM ancestors ORDER BY depth DESC
+        """, [self.pk]))
+
     def get_bread_crumbs(self):
         """Get the breadcrumbs to get to this node"""
-
-        parent = ''
-        if self.parent is not None:
-            parent = self.parent.get_bread_crumbs()
-
-        return mark_safe("".join([
-            parent,
-            self.get_crumb()
-        ]))
+        return mark_safe("".join(
+            node.get_crumb() for node in self.get_ancestors()
+        ))
 
 
 # Receiver to automatically create a
 # unique slug_id for each node when it is created
 @receiver(pre_save, sender=CFRNode)
 def create_slug_id(sender, instance: CFRNode, **kwargs):
-    if not instance.id:
-        instance.slug_id = f"{instance.get_unique_id()}-{get_random_string(5)}"
+    if not instance.slug_id:
+        instance.slug_id = instance.get_slug()
@@ -0,0 +1,25 @@
+from Main.jobs import NORMAL, task
+
+from .models import CFRNode
+
+
+# A title comes from eCFR in one document, it is the unit of the
+# ingestion run_jobs workers share
+@task(priority=NORMAL, max_attempts=5)
+def ingest_titles(titles: list = None):
+    """Queue the ingestion of every title, or of some of them"""
+    nodes = CFRNode.objects.get_titles()
+    if titles:
+        nodes = nodes.filter(identifier__in=titles)
+
+    ingest_title.enqueue_many(
+        [{"node_id": node.pk} for node in nodes],
+        key=lambda kwargs: f"cfr-ingest:{kwargs['node_id']}")
+
+
+@task(priority=NORMAL, max_attempts=5)
+def ingest_title(node_id: int):
+    """Load the nodes of a title"""
+    title = CFRNode.objects.filter(pk=node_id, node_type='title').first()
+    if title is not None:
+        title.new_child_nodes()
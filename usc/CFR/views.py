@@ -1,6 +1,11 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
 from django.shortcuts import redirect
 from django.views import generic
 from django.contrib import messages
+from django.conf import settings
+from Main import toc
+from utils.data import upstream_client
 
 from .models import CFRNode
 from .forms import SearchForm
@@ -47,7 +52,8 @@ class CollectionView(SearchMixin):
     def get_context_data(self, **kwargs):
         self.object = None
         context = super().get_context_data(**kwargs)
-        context['nodes'] = self.get_queryset()
+        context['nodes'] = toc.get_root_nodes(settings.CFR) or \
+            self.get_queryset()
         return context
 
 
@@ -66,14 +72,43 @@ class NodeView(SearchMixin):
     def get_context_data(self, **kwargs):
         self.object = self.get_object(self.get_queryset())
         context = super().get_context_data(**kwargs)
-        context['nodes'] = self.object.get_child_nodes()
+
+        # The snapshot answers without walking the tree in the database
+        nodes = toc.get_child_nodes(settings.CFR, self.object.pk)
+        if nodes is None:
+            nodes = self.object.get_child_nodes()
+        context['nodes'] = nodes
+
+        context['bread_crumbs'] = toc.get_bread_crumbs(
+            settings.CFR, self.object.pk)
         return context
 
 
 class Content(NodeView):
     template_name: str = 'CFR/content.html'
 
+    node: CFRNode = None
+    html = None
+
+    async def get(self, request, *args, **kwargs):
+        """Wait on eCFR without holding a thread, the rest of the page
+        is built like the other nodes"""
+        self.node = await self.get_queryset()\
+            .filter(slug_id=kwargs[self.slug_url_kwarg])\
+            .afirst()
+        if self.node is None:
+            raise Http404("CFR document not found")
+
+        # The ancestry and the content share the connection to eCFR
+        async with upstream_client():
+            self.html = await self.node.aget_html_content()
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    def get_object(self, queryset=None):
+        # Read with the async ORM by get
+        return self.node
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["html"] = self.object.get_html_content()
+        context["html"] = self.html
         return context
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
-from .models import PlaceholderInput
+from .models import Job, PlaceholderInput, QAJob
 
 admin.site.register(PlaceholderInput)
+admin.site.register(QAJob)
+admin.site.register(Job)
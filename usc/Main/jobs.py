@@ -0,0 +1,326 @@
+import traceback
+from datetime import timedelta
+from threading import Event, Thread
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from utils.logger import err_logger, logger
+from utils.metrics import JOB_SECONDS
+
+from .models import Job
+
+# Priorities of the queue, higher runs first
+LOW = -10
+NORMAL = 0
+HIGH = 10
+
+# Tasks by name, filled by the tasks modules of the apps
+tasks = {}
+
+
+class JobError(Exception):
+    """Raised by a task to have its job retried"""
+
+
+class JobDeferred(Exception):
+    """Raised by a task to run its job again later, like once other jobs
+    are done. It doesn't count as an attempt"""
+
+    def __init__(self, delay: float):
+        super().__init__(f"Deferred for {delay} seconds")
+        self.delay = delay
+
+
+class Task:
+    """A function the workers run for the jobs queued for it"""
+
+    def __init__(self, func, name: str, priority: int, max_attempts: int):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<Task {self.name}>"
+
+    def build(self, kwargs: dict, key: str = None, priority: int = None,
+              delay: float = 0) -> Job:
+        return Job(
+            task=self.name,
+            kwargs=kwargs,
+            key=key,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def enqueue(self, key: str = None, priority: int = None,
+                delay: float = 0, **kwargs):
+        """Queue a job running the task with the keyword arguments, which
+        have to be JSON. Nothing is queued while a job with the key waits
+        or runs, that job is returned instead"""
+        if settings.JOBS_INLINE:
+            return self.func(**kwargs)
+
+        job = self.build(kwargs, key, priority, delay)
+        if key is None:
+            return Job.objects.bulk_create([job])[0]
+
+        Job.objects.bulk_create([job], ignore_conflicts=True)
+        queued = Job.objects\
+            .filter(key=key, status__in=(Job.PENDING, Job.RUNNING))\
+            .first()
+        if queued is None:
+            # Done meanwhile
+            return job
+
+        if queued.status == Job.RUNNING and queued.created_at < job.created_at:
+            logger.info(
+                "Job %s with the key is running, not queued again", queued.pk,
+                extra={"task": self.name, "key": key})
+        return queued
+
+    def enqueue_many(self, kwargs_list, key=None, priority: int = None):
+        """Queue a job for each keyword arguments in one statement, the
+        key function gets the key of each"""
+        if settings.JOBS_INLINE:
+            for kwargs in kwargs_list:
+                self.func(**kwargs)
+            return []
+
+        return Job.objects.bulk_create(
+            [
+                self.build(kwargs, key and key(kwargs), priority)
+                for kwargs in kwargs_list
+            ],
+            ignore_conflicts=key is not None)
+
+
+def task(name: str = None, priority: int = NORMAL, max_attempts: int = 3):
+    """Make a function a task jobs can be queued for"""
+    def decorator(func) -> Task:
+        task = Task(
+            func, name or f"{func.__module__}.{func.__name__}",
+            priority, max_attempts)
+        tasks[task.name] = task
+        return task
+    return decorator
+
+
+def get_lease_end():
+    return timezone.now() + timedelta(seconds=settings.JOBS_LEASE)
+
+
+def reclaim() -> int:
+    """Queue again the jobs of workers that stopped extending their
+    lease, the lost run counts as an attempt"""
+    expired = Job.objects.filter(
+        status=Job.RUNNING, lease_until__lt=timezone.now())
+
+    expired\
+        .filter(attempts__gte=F('max_attempts'))\
+        .update(
+            status=Job.FAILED, error='The lease of the worker expired',
+            lease_until=None, finished_at=timezone.now())
+    return expired.update(status=Job.PENDING, lease_until=None)
+
+
+def claim(worker: str, count: int = 1) -> list[Job]:
+    """Take the next due jobs off the queue and lease them to the worker.
+    Jobs locked by another worker are skipped rather than waited for"""
+    now = timezone.now()
+    lease_until = get_lease_end()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .filter(status=Job.PENDING, run_at__lte=now)
+            .order_by('-priority', 'run_at')
+            .select_for_update(skip_locked=True)[:count]
+        )
+        Job.objects\
+            .filter(pk__in=[job.pk for job in jobs])\
+            .update(
+                status=Job.RUNNING, worker=worker,
+                attempts=F('attempts') + 1, lease_until=lease_until,
+                started_at=now, updated_at=now)
+
+    for job in jobs:
+        job.status = Job.RUNNING
+        job.worker = worker
+        job.attempts += 1
+        job.lease_until = lease_until
+        job.started_at = now
+    return jobs
+
+
+def extend_leases(jobs: list[Job]) -> int:
+    """Extend the leases the workers still hold of the jobs"""
+    held = Q()
+    for job in jobs:
+        held |= Q(pk=job.pk, worker=job.worker, attempts=job.attempts)
+
+    if not held:
+        return 0
+    return Job.objects\
+        .filter(held, status=Job.RUNNING)\
+        .update(lease_until=get_lease_end())
+
+
+class Heartbeat:
+    """Extends the leases of the jobs a worker runs from a thread of its
+    own, a long job keeps its lease while the worker is alive"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.JOBS_LEASE / 3
+        self.jobs = []
+        self.stopped = Event()
+
+    def __enter__(self):
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    extend_leases(list(self.jobs))
+                except Exception as e:
+                    err_logger.warning(f"Heartbeat failed: {e}")
+        finally:
+            connection.close()
+
+
+def get_retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt, doubling each time"""
+    return min(
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOBS_MAX_RETRY_DELAY)
+
+
+def run(job: Job):
+    """Run the task of a claimed job and store how it went, failed jobs
+    are queued again until they run out of attempts"""
+    start = perf_counter()
+    try:
+        task = tasks.get(job.task)
+        if task is None:
+            raise LookupError(f"No task {job.task}")
+        task.func(**job.kwargs)
+    except JobDeferred as e:
+        job.status = Job.PENDING
+        job.max_attempts += 1
+        job.run_at = timezone.now() + timedelta(seconds=e.delay)
+    except Exception as e:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts and not isinstance(e, LookupError):
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + timedelta(
+                seconds=get_retry_delay(job.attempts))
+            logger.warning(
+                "Job %s failed, retrying", job.pk, extra={
+                    "task": job.task, "attempts": job.attempts})
+        else:
+            job.status = Job.FAILED
+            err_logger.error(
+                "Job %s failed: %s", job.pk, e, extra={
+                    "task": job.task, "attempts": job.attempts})
+    else:
+        job.status = Job.DONE
+        job.error = ''
+
+    duration = perf_counter() - start
+    JOB_SECONDS.observe(duration, task=job.task, result=job.status)
+    logger.info(
+        "Job %s %s", job.pk, job.status, extra={
+            "task": job.task,
+            "duration_ms": round(duration * 1000, 2),
+        })
+
+    finish(job)
+    return job
+
+
+def finish(job: Job) -> bool:
+    """Store how the job went, unless its lease expired and another
+    worker took it over"""
+    job.lease_until = None
+    job.finished_at = timezone.now()
+    updated = Job.objects\
+        .filter(
+            pk=job.pk, worker=job.worker, attempts=job.attempts,
+            status=Job.RUNNING)\
+        .update(
+            status=job.status, run_at=job.run_at, error=job.error,
+            max_attempts=job.max_attempts,
+            lease_until=None, finished_at=job.finished_at,
+            updated_at=job.finished_at)
+
+    if not updated:
+        err_logger.warning(
+            "Job %s was taken over after its lease expired", job.pk,
+            extra={"task": job.task, "worker": job.worker})
+    return bool(updated)
+
+
+def is_busy(names) -> bool:
+    """Are jobs of the tasks waiting or running"""
+    return Job.objects\
+        .filter(task__in=names, status__in=[Job.PENDING, Job.RUNNING])\
+        .exists()
+
+
+def purge():
+    """Delete the jobs done long enough ago"""
+    done = timezone.now() - timedelta(seconds=settings.JOBS_KEEP)
+    return Job.objects\
+        .filter(status=Job.DONE, updated_at__lt=done)\
+        .delete()[0]
+
+
+def get_counts(names) -> dict:
+    """Jobs of the tasks by task and status"""
+    counts = {}
+    for row in Job.objects\
+            .filter(task__in=names)\
+            .values('task', 'status')\
+            .annotate(count=Count('pk'))\
+            .order_by():
+        counts.setdefault(row['task'], {})[row['status']] = row['count']
+    return counts
+
+
+def get_workers(names, since) -> list[dict]:
+    """What each worker ran of the tasks since then, and runs now"""
+    jobs = Job.objects.filter(task__in=names).exclude(worker='').order_by()
+
+    workers = {
+        row['worker']: row
+        for row in jobs
+        .filter(finished_at__gte=since)
+        .values('worker')
+        .annotate(
+            done=Count('pk', filter=Q(status=Job.DONE)),
+            retried=Count('pk', filter=Q(status=Job.PENDING)),
+            failed=Count('pk', filter=Q(status=Job.FAILED)),
+            last_finished=Max('finished_at'),
+        )
+    }
+    for row in jobs\
+            .filter(status=Job.RUNNING)\
+            .values('worker')\
+            .annotate(running=Count('pk'), lease_until=Max('lease_until')):
+        workers.setdefault(row['worker'], {'worker': row['worker']})\
+            .update(row)
+
+    return sorted(workers.values(), key=lambda row: row['worker'])
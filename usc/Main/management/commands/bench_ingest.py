@@ -0,0 +1,128 @@
+import tracemalloc
+from time import perf_counter
+
+from CFR.models import CFRNode
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from USCODE.models import Collection, Node
+from utils import data
+from utils.replay import RECORD, REPLAY, install_replay
+from utils.timing import collect_stats
+
+
+class Command(BaseCommand):
+    help = 'Command to benchmark the ingestion against recorded ' \
+        'govinfo and eCFR responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'collections', nargs='*',
+            default=[settings.USCODE, settings.CFR])
+        parser.add_argument(
+            '--replay-dir', default=settings.UPSTREAM_REPLAY_DIR,
+            help='Directory of the recorded responses')
+        parser.add_argument(
+            '--record', action='store_true',
+            help='Call the real APIs and record their responses')
+        parser.add_argument(
+            '--titles', nargs='+', default=[],
+            help='Only load these titles, all of them by default')
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='Milliseconds added to each replayed response')
+        parser.add_argument(
+            '--jitter', type=float, default=0,
+            help='Milliseconds the latency varies by')
+        parser.add_argument(
+            '--error-rate', type=float, default=0,
+            help='Share of replayed requests failing to connect')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the loaded nodes instead of rolling back')
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def handle(self, *args, **options):
+        if not options['replay_dir']:
+            raise CommandError(
+                "Set --replay-dir or UPSTREAM_REPLAY_DIR to the recordings")
+
+        adapters = dict(data.session.adapters)
+        install_replay(
+            data.session, options['replay_dir'],
+            mode=RECORD if options['record'] else REPLAY,
+            latency=options['latency'] / 1000,
+            jitter=options['jitter'] / 1000,
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+        )
+
+        try:
+            for collection in options['collections']:
+                collection = collection.upper()
+                with transaction.atomic():
+                    self.bench(collection, options['titles'])
+                    if not options['keep']:
+                        transaction.set_rollback(True)
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
+
+        finally:
+            data.session.adapters.clear()
+            data.session.adapters.update(adapters)
+
+    def bench(self, collection: str, titles: list[str]):
+        """Load the collection and report how fast it went"""
+        if collection == settings.USCODE:
+            model, load = Node, self.load_usc
+        else:
+            model, load = CFRNode, self.load_cfr
+
+        before = model.objects.count()
+        tracemalloc.start()
+        start = perf_counter()
+
+        with collect_stats() as stats:
+            load(titles)
+
+        elapsed = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        nodes = model.objects.count() - before
+        per_node = max(nodes, 1)
+        self._write_success(
+            f"{collection}: {nodes} nodes in {elapsed:.1f}s, "
+            f"{nodes / elapsed:.1f} nodes/s, "
+            f"{stats.queries / per_node:.2f} queries/node, "
+            f"{stats.upstream_calls / per_node:.2f} calls/node, "
+            f"peak memory {peak / 2 ** 20:.1f} MB")
+
+    def load_usc(self, titles: list[str]):
+        collection, _ = Collection.objects.get_or_create(
+            code=settings.USCODE)
+        if not titles:
+            collection.start_scraper()
+            return
+
+        # The titles of the latest year, like the scraper
+        years = collection.get_child_nodes()
+        latest = max(years, key=lambda year: int(year.title))
+        for title in latest.get_child_nodes() or []:
+            if str(title.title_number) in titles:
+                title.scrape_it_all()
+
+    def load_cfr(self, titles: list[str]):
+        nodes = CFRNode.objects.get_titles()
+        if titles:
+            nodes = nodes.filter(identifier__in=titles)
+
+        for title in nodes:
+            title.get_child_nodes()
@@ -0,0 +1,29 @@
+from time import time
+
+from django.core.management.base import BaseCommand, CommandError
+from Main.semantic import build_index
+
+
+class Command(BaseCommand):
+    help = 'Command to build the semantic search index of the latest year'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def handle(self, *args, **options):
+        try:
+            start = time()
+
+            index = build_index(options['batch_size'])
+
+            self._write_success(
+                f"Indexed {len(index)} sections in {time() - start:.1f}s")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
@@ -0,0 +1,32 @@
+from time import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from Main.toc import build_toc
+
+
+class Command(BaseCommand):
+    help = 'Command to snapshot the USCODE and CFR trees for browsing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'collections', nargs='*',
+            default=[settings.USCODE, settings.CFR])
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def handle(self, *args, **options):
+        try:
+            for collection in options['collections']:
+                start = time()
+                toc = build_toc(collection.upper())
+                self._write_success(
+                    f"Snapshot {collection} with {len(toc)} nodes "
+                    f"in {time() - start:.1f}s")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
@@ -0,0 +1,47 @@
+from CFR.tasks import ingest_titles
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from Main.tasks import PUBLISH_INTERVAL, publish_ingest
+from USCODE.tasks import ingest_collection
+
+
+class Command(BaseCommand):
+    help = 'Command to queue the ingestion of USCODE and CFR for the ' \
+        'run_jobs workers. The browse snapshot (build_toc) and the ' \
+        'semantic index are rebuilt once the ingestion jobs are done'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'collections', nargs='*',
+            default=[settings.USCODE, settings.CFR])
+        parser.add_argument(
+            '--titles', nargs='+', default=[],
+            help='Only load these titles, all of them by default')
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def handle(self, *args, **options):
+        try:
+            titles = options['titles'] or None
+            for collection in options['collections']:
+                collection = collection.upper()
+                if collection == settings.USCODE:
+                    ingest_collection.enqueue(
+                        key="uscode-ingest", titles=titles)
+                elif collection == settings.CFR:
+                    ingest_titles.enqueue(key="cfr-ingest", titles=titles)
+                else:
+                    raise ValueError(f"Unknown collection {collection}")
+
+                publish_ingest.enqueue(
+                    key=f"publish:{collection}", collection=collection,
+                    delay=PUBLISH_INTERVAL)
+
+                self._write_success(f"Queued the ingestion of {collection}")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
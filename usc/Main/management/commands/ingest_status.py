@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+from Main.jobs import get_counts, get_workers, tasks
+from Main.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Command to show the progress of the ingestion and the ' \
+        'throughput of each worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window', type=float, default=10,
+            help='Minutes the throughput is measured over')
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def handle(self, *args, **options):
+        try:
+            autodiscover_modules('tasks')
+            names = [name for name in tasks if '.ingest_' in name]
+            now = timezone.now()
+            window = options['window']
+
+            statuses = [status for status, _ in Job.STATUSES]
+            self._write_success(
+                f"{'task':<40}" + "".join(f"{s:>10}" for s in statuses))
+            for name, counts in sorted(get_counts(names).items()):
+                self.stdout.write(f"{name:<40}" + "".join(
+                    f"{counts.get(status, 0):>10}" for status in statuses))
+
+            self._write_success(
+                f"\n{'worker':<40}{'jobs/min':>10}{'done':>8}"
+                f"{'retried':>8}{'failed':>8}{'running':>8}  heartbeat")
+            since = now - timedelta(minutes=window)
+            for row in get_workers(names, since):
+                done = row.get('done', 0)
+                heartbeat = "-"
+                if row.get('lease_until'):
+                    # The lease is extended by a heartbeat
+                    lease = row['lease_until'] - now
+                    heartbeat = "expired" if lease.total_seconds() < 0 \
+                        else f"{lease.total_seconds():.0f}s left"
+
+                self.stdout.write(
+                    f"{row['worker']:<40}{done / window:>10.1f}{done:>8}"
+                    f"{row.get('retried', 0):>8}{row.get('failed', 0):>8}"
+                    f"{row.get('running', 0):>8}  {heartbeat}")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
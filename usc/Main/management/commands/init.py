@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
@@ -20,6 +22,8 @@ class Command(BaseCommand):
                     title.get_child_nodes()
                     self._write_success(f"Title {title} created")
 
+            call_command('build_toc', settings.CFR)
+
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -1,6 +1,7 @@
 from django.conf import settings
-from django.contrib.postgres.search import SearchVector
+from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
 from USCODE.models import Collection, Node
 
 
@@ -21,13 +22,15 @@ class Command(BaseCommand):
 
             # 2. Scrape all content for uscode
             usc_code: Collection = usc_code
-            print("Started scraper")
+            self.stdout.write("Started scraper")
             usc_code.start_scraper()
 
-            # 3. Update vector_column
-            vector = SearchVector('title', weight='A') + \
-                SearchVector('content', weight='B')
-            Node.objects.update(vector_column=vector)
+            # 3. Update vector_column, the trigger computes it from the
+            # title and the text of the body
+            Node.objects.update(body=F('body'))
+
+            # 4. Snapshot the tree for the browse views
+            call_command('build_toc', settings.USCODE)
 
         except Exception as e:
             import traceback
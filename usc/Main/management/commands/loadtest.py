@@ -0,0 +1,175 @@
+import os
+import subprocess
+import sys
+from time import sleep, time
+
+import requests
+from CFR.models import CFRNode
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from urllib.parse import urlencode
+from USCODE.models import Node
+from utils.loadtest import Endpoint, LoadTest, parse_mix
+
+DEFAULT_MIX = "collection=1,node=4,leaf=3,cfr=2,search=1"
+
+QUERIES = (
+    "civil rights", "social security", "income tax", "clean water",
+    "bank holding company", "medicare", "copyright", "immigration",
+)
+
+APPS = {
+    "wsgi": ["usc.wsgi"],
+    "asgi": ["usc.asgi", "-k", "uvicorn.workers.UvicornWorker"],
+}
+
+
+class Command(BaseCommand):
+    help = 'Command to load test the site with a mix of browse, ' \
+        'document and search requests, "--serve wsgi asgi" compares ' \
+        'the two deployments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='Site to test, or where --serve starts it')
+        parser.add_argument(
+            '--serve', choices=APPS, nargs='+', default=[],
+            help='Start the site with gunicorn for the test, the same '
+                 'test is run against each server given')
+        parser.add_argument(
+            '--server-workers', type=int, default=4)
+        parser.add_argument(
+            '--replay-dir', default=settings.UPSTREAM_REPLAY_DIR,
+            help='Recordings the started site answers govinfo and eCFR '
+                 'calls from')
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help='Weights of the endpoints, like "node=4,search=1"')
+        parser.add_argument('--rps', type=float, default=20)
+        parser.add_argument(
+            '--duration', type=float, default=60, help='Seconds')
+        parser.add_argument(
+            '--workers', type=int, default=32,
+            help='Requests in flight at most')
+        parser.add_argument(
+            '--sample', type=int, default=200,
+            help='Nodes picked from the database for each endpoint')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def get_endpoints(self, mix: dict, sample: int) -> list[Endpoint]:
+        """The urls of each endpoint, from nodes of the seeded database"""
+        nodes = Node.objects.listing()\
+            .filter(selected_year_from=Node.objects.latest_year())\
+            .order_by('?')
+        sections = CFRNode.objects\
+            .filter(node_type__in=('part', 'section'))\
+            .order_by('?')
+
+        urls = {
+            "collection": [
+                reverse(f'{settings.USCODE}:collection'),
+                reverse(f'{settings.CFR}:collection'),
+            ],
+            "node": [
+                node.get_node_url()
+                for node in nodes.filter(node_type='node')[:sample]
+            ],
+            "leaf": [
+                node.get_view_document_link()
+                for node in nodes.exclude(htmlfile='')[:sample]
+            ],
+            "cfr": [node.get_html_url() for node in sections[:sample]],
+            "search": [
+                reverse('main:search') + '?' + urlencode({
+                    'search': query, 'collection': collection,
+                })
+                for query in QUERIES
+                for collection in (settings.USCODE, settings.CFR)
+            ],
+        }
+
+        unknown = set(mix) - set(urls)
+        if unknown:
+            raise CommandError(f"Unknown endpoints {', '.join(unknown)}")
+
+        return [
+            Endpoint(name, weight, urls[name])
+            for name, weight in mix.items()
+        ]
+
+    def serve(self, app: str, url: str, workers: int, replay_dir: str):
+        """Start the site and wait until it answers"""
+        env = dict(os.environ)
+        if replay_dir:
+            env['UPSTREAM_REPLAY_DIR'] = replay_dir
+
+        bind = url.split('://')[-1].rstrip('/')
+        server = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn', *APPS[app],
+            '--bind', bind, '--workers', str(workers),
+        ], cwd=settings.BASE_DIR, env=env)
+
+        deadline = time() + 30
+        while time() < deadline:
+            try:
+                requests.get(url, timeout=1)
+                return server
+            except requests.ConnectionError:
+                sleep(.5)
+
+        server.terminate()
+        raise CommandError(f"The {app} server did not start on {url}")
+
+    def run(self, endpoints: list[Endpoint], options: dict) -> LoadTest:
+        test = LoadTest(
+            options['url'], endpoints, rps=options['rps'],
+            duration=options['duration'], workers=options['workers'],
+            seed=options['seed'])
+
+        self._write_success(
+            f"Sending {options['rps']:g} requests/s for "
+            f"{options['duration']:g}s to {options['url']}")
+        test.run()
+        self.stdout.write(test.get_report())
+        return test
+
+    def compare(self, tests: dict):
+        """One line per server, of all the requests sent to it"""
+        self._write_success(
+            f"\n{'server':<12}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'errors':>9}")
+        for app, test in tests.items():
+            total = test.get_total()
+            p50, p95, p99 = total.get_percentiles().values()
+            self.stdout.write(
+                f"{app:<12}{total.count / test.elapsed:>9.1f}"
+                f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}"
+                f"{total.get_error_rate():>9.1%}")
+
+    def handle(self, *args, **options):
+        endpoints = self.get_endpoints(
+            parse_mix(options['mix']), options['sample'])
+
+        if not options['serve']:
+            self.run(endpoints, options)
+            return
+
+        tests = {}
+        for app in options['serve']:
+            server = self.serve(
+                app, options['url'],
+                options['server_workers'], options['replay_dir'])
+            try:
+                tests[app] = self.run(endpoints, options)
+            finally:
+                server.terminate()
+                server.wait()
+
+        if len(tests) > 1:
+            self.compare(tests)
@@ -0,0 +1,87 @@
+from time import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+BATCH = """
+    SELECT id, content,
+        encode(sha256(convert_to(content, 'UTF8')), 'hex') AS digest
+    FROM uscode_node
+    WHERE content IS NOT NULL AND body_id IS NULL
+    ORDER BY id
+    LIMIT %s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Command to move the section texts still stored in uscode_node '
+        'into uscode_content, run between USCODE migrations 0005 and 0006'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def has_inline_content(self) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'uscode_node' AND column_name = 'content'
+            """)
+            return cursor.fetchone() is not None
+
+    def move_batch(self, batch_size: int) -> int:
+        """Move one batch in its own transaction, short enough not to
+        hold up the scraper or the site"""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMPORARY TABLE content_batch AS {BATCH}
+            """, [batch_size])
+            cursor.execute("""
+                INSERT INTO uscode_content (digest, text)
+                SELECT DISTINCT ON (digest) digest, content
+                FROM content_batch
+                ON CONFLICT (digest) DO NOTHING
+            """)
+            cursor.execute("""
+                UPDATE uscode_node
+                SET body_id = uscode_content.id, content = NULL
+                FROM content_batch
+                JOIN uscode_content
+                ON uscode_content.digest = content_batch.digest
+                WHERE uscode_node.id = content_batch.id
+            """)
+            moved = cursor.rowcount
+
+            # Dropped here rather than on commit, the batches of a call
+            # inside a transaction only get savepoints
+            cursor.execute("DROP TABLE content_batch")
+            return moved
+
+    def handle(self, *args, **options):
+        try:
+            if not self.has_inline_content():
+                self._write_success("Section texts were already moved")
+                return
+
+            start = time()
+            moved = 0
+            while True:
+                count = self.move_batch(options['batch_size'])
+                if count == 0:
+                    break
+
+                moved += count
+                self.stdout.write(f"Moved {moved} section texts")
+
+            self._write_success(
+                f"Moved {moved} section texts in {time() - start:.1f}s")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
@@ -0,0 +1,85 @@
+import os
+import signal
+import socket
+from time import sleep, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+from Main.jobs import Heartbeat, claim, purge, reclaim, run, tasks
+from utils.metrics import start_saver
+
+
+class Command(BaseCommand):
+    help = 'Command to run the background jobs, as many as needed ' \
+        'on any number of hosts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker', default=f"{socket.gethostname()}:{os.getpid()}",
+            help="Name of the worker in the claimed jobs")
+        parser.add_argument(
+            '--batch', type=int, default=1,
+            help="Jobs claimed at once")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Stop once no job is due")
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def stop(self, *args):
+        # The job running is finished first
+        self.stopped = True
+
+    def handle(self, *args, **options):
+        try:
+            autodiscover_modules('tasks')
+            if settings.METRICS_DIR:
+                # Scraped through the web workers
+                start_saver(
+                    settings.METRICS_DIR, settings.METRICS_SAVE_INTERVAL)
+
+            worker = options['worker']
+            self.stopped = False
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+            self._write_success(
+                f"Worker {worker} running {', '.join(sorted(tasks))}")
+
+            count = 0
+            purged_at = 0
+            with Heartbeat() as heartbeat:
+                while not self.stopped:
+                    close_old_connections()
+
+                    reclaimed = reclaim()
+                    if reclaimed:
+                        self.stdout.write(
+                            f"Reclaimed {reclaimed} jobs of lost workers")
+
+                    if time() - purged_at > \
+                            settings.JOBS_POLL_INTERVAL * 600:
+                        purge()
+                        purged_at = time()
+
+                    jobs = heartbeat.jobs = claim(worker, options['batch'])
+                    if not jobs:
+                        if options['once']:
+                            break
+                        sleep(settings.JOBS_POLL_INTERVAL)
+                        continue
+
+                    for job in jobs:
+                        run(job)
+                        count += 1
+
+            self._write_success(f"Worker {worker} ran {count} jobs")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
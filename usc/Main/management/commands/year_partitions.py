@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from USCODE.models import Node
+
+
+class Command(BaseCommand):
+    help = 'Command to list, attach or detach the year partitions of USCODE'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--attach', type=int, metavar='YEAR',
+            help='Create the partition of a year ahead of its ingest')
+        parser.add_argument(
+            '--detach', type=int, metavar='YEAR',
+            help='Detach the partition of a year, keeping it as an archive')
+        parser.add_argument(
+            '--drop', action='store_true',
+            help='Drop the detached partition instead of keeping it')
+
+    def _write_success(self, message: str):
+        self.stdout.write(
+            self.style.SUCCESS(message))
+
+    def handle(self, *args, **options):
+        if not Node.objects.is_partitioned():
+            raise CommandError(
+                "uscode_node is not partitioned, run the migrations first")
+
+        try:
+            if options['attach']:
+                created = Node.objects.ensure_partition(options['attach'])
+                state = "Attached" if created else "Already attached"
+                self._write_success(
+                    f"{state} {options['attach']}\n")
+
+            if options['detach']:
+                Node.objects.detach_partition(
+                    options['detach'], drop=options['drop'])
+                name = Node.objects.get_partition_name(options['detach'])
+                kept = "dropped" if options['drop'] else f"kept as {name}"
+                self._write_success(
+                    f"Detached {options['detach']}, {kept}\n")
+
+            for year, name, rows in Node.objects.get_partitions():
+                self.stdout.write(f"{year}\t{name}\t~{max(rows, 0)} rows")
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise CommandError(e)
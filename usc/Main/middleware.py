@@ -0,0 +1,212 @@
+import asyncio
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+from django.urls import reverse
+from utils.locks import NodeLoading
+from utils.metrics import (DB_QUERIES, DB_SECONDS, REQUEST_SECONDS,
+                           start_saver)
+from utils.profiling import CPROFILE, SAMPLE, Profiler
+from utils.routers import REPLICA, read_from
+from utils.timing import acollect_stats, collect_stats, current_stats
+
+
+class Middleware:
+    """Runs in the mode of the rest of the stack, under ASGI the async
+    views then don't hold a worker thread. Subclasses handle a request
+    in `__call__` and `__acall__`"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function for Django,
+            # like markcoroutinefunction of later asgiref versions
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class NodeLoadingMiddleware(Middleware):
+    """Answer with a page that reloads itself while another request
+    loads the children of the node from govinfo"""
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, NodeLoading):
+            return None
+
+        response = render(request, 'Main/loading.html', {
+            'retry_after': settings.NODE_LOAD_RETRY_AFTER,
+        }, status=503)
+        response['Retry-After'] = settings.NODE_LOAD_RETRY_AFTER
+        return response
+
+
+class ReplicaMiddleware(Middleware):
+    """Read the legal text of the browse and search pages from the
+    replica, the views in REPLICA_VIEWS"""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        # What the request sets is undone, the thread serves others next
+        token = read_from.set(read_from.get())
+        try:
+            return self.get_response(request)
+        finally:
+            read_from.reset(token)
+
+    async def __acall__(self, request):
+        token = read_from.set(read_from.get())
+        try:
+            return await self.get_response(request)
+        finally:
+            read_from.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        names = {match.view_name, match.namespace}
+        if request.method in ('GET', 'HEAD') \
+                and read_from.get() is None \
+                and names & set(settings.REPLICA_VIEWS):
+            read_from.set(REPLICA)
+
+
+class RequestStatsMiddleware(Middleware):
+    """Count the queries, SQL time and upstream calls of each request
+    for the metrics, and show them in a Server-Timing header when
+    debugging"""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if settings.METRICS_DIR:
+            start_saver(settings.METRICS_DIR, settings.METRICS_SAVE_INTERVAL)
+
+        start = perf_counter()
+        with collect_stats() as stats:
+            response = self.get_response(request)
+
+        return self.record(request, response, stats, start)
+
+    async def __acall__(self, request):
+        if settings.METRICS_DIR:
+            start_saver(settings.METRICS_DIR, settings.METRICS_SAVE_INTERVAL)
+
+        start = perf_counter()
+        async with acollect_stats() as stats:
+            response = await self.get_response(request)
+
+        return self.record(request, response, stats, start)
+
+    def record(self, request, response, stats, start: float):
+        request.stats = stats
+
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        REQUEST_SECONDS.observe(perf_counter() - start, view=view)
+        DB_SECONDS.observe(stats.sql_time, view=view)
+        DB_QUERIES.observe(stats.queries, view=view)
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = stats.get_server_timing()
+
+        return response
+
+
+# Files of the stored profiles, the profile view serves nothing else
+PROFILE_NAME = re.compile(r"[0-9]{8}-[0-9]{6}-[0-9a-f]{8}\.(folded|prof|json)")
+
+
+class ProfilingMiddleware(Middleware):
+    """Profile a request when a staff user asks for it with the profile
+    query parameter or the X-Profile header. The profile and the SQL
+    and upstream timeline of the request are stored, the response links
+    to them in its headers. Other requests only pay for the lookup of
+    the parameter. An async request is profiled on the event loop"""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        mode = self.get_mode(request)
+        if not mode or not request.user.is_staff:
+            return self.get_response(request)
+
+        profiler, start = self.start(mode)
+        with profiler:
+            response = self.get_response(request)
+        return self.save(request, response, profiler, perf_counter() - start)
+
+    async def __acall__(self, request):
+        mode = self.get_mode(request)
+        if not mode or not await sync_to_async(is_staff)(request):
+            return await self.get_response(request)
+
+        profiler, start = self.start(mode)
+        with profiler:
+            response = await self.get_response(request)
+        return await sync_to_async(self.save)(
+            request, response, profiler, perf_counter() - start)
+
+    def get_mode(self, request) -> str:
+        mode = request.GET.get(settings.PROFILE_PARAM) or \
+            request.headers.get('X-Profile')
+        if not mode:
+            return None
+        return CPROFILE if mode == CPROFILE else SAMPLE
+
+    def start(self, mode: str):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.timeline = []
+
+        return Profiler(mode, settings.PROFILE_INTERVAL), perf_counter()
+
+    def save(self, request, response, profiler: Profiler, duration: float):
+        """Store the profile and the timeline, link them in the response"""
+        stats = current_stats.get()
+        mode = profiler.mode
+
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid4().hex[:8]}"
+
+        profile = Path(profiler.save(directory / name))
+        (directory / f"{name}.json").write_text(json.dumps({
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "mode": mode,
+            "duration": round(duration * 1000, 3),
+            "queries": stats.queries if stats else None,
+            "upstream_calls": stats.upstream_calls if stats else None,
+            "timeline": stats.timeline if stats else [],
+        }, indent=2))
+
+        response['X-Profile'] = reverse('main:profile', args=[profile.name])
+        response['X-Profile-Timeline'] = reverse(
+            'main:profile', args=[f"{name}.json"])
+        return response
+
+
+def is_staff(request) -> bool:
+    # Loads the user from the session
+    return request.user.is_staff
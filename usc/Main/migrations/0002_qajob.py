@@ -0,0 +1,29 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:11
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QAJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('question', models.CharField(max_length=1000)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('answer', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'QA Job',
+                'verbose_name_plural': 'QA Jobs',
+            },
+        ),
+    ]
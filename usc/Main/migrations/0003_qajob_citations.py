@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0002_qajob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qajob',
+            name='citations',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
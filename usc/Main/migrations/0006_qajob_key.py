@@ -0,0 +1,22 @@
+# Generated by Django 4.1.2 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0005_job_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qajob',
+            name='key',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='qajob',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['key', 'created_at'], name='main_qajob_pending_idx'),
+        ),
+    ]
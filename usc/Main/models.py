@@ -1,4 +1,8 @@
+import uuid
+
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 
 class PlaceholderInput(models.Model):
@@ -8,3 +12,109 @@ class PlaceholderInput(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class QAJob(models.Model):
+    """A question answered in the background of the search page"""
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    question = models.CharField(max_length=1000)
+    # Cache key of the normalized question, asking again while a job
+    # answers it joins that job
+    key = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    answer = models.TextField(blank=True, default='')
+    citations = models.JSONField(blank=True, default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.question
+
+    class Meta:
+        verbose_name = 'QA Job'
+        verbose_name_plural = 'QA Jobs'
+        indexes = [
+            models.Index(
+                fields=['key', 'created_at'], name='main_qajob_pending_idx',
+                condition=models.Q(status='pending')),
+        ]
+
+
+class Job(models.Model):
+    """Work run off the request path by the run_jobs command, see
+    Main/jobs.py"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(blank=True, default=dict)
+
+    # A job is only queued once while another with its key waits
+    key = models.CharField(max_length=200, null=True, blank=True)
+
+    # Higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+
+    # The worker running the job extends its lease while it is alive,
+    # another worker takes the job once the lease runs out
+    lease_until = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.task} {self.kwargs}"
+
+    class Meta:
+        indexes = (
+            # The queue the workers claim from
+            models.Index(
+                fields=['-priority', 'run_at'],
+                condition=Q(status='pending'),
+                name='main_job_pending_idx'
+            ),
+            models.Index(
+                fields=['lease_until'],
+                condition=Q(status='running'),
+                name='main_job_lease_idx'
+            ),
+            models.Index(
+                fields=['worker', 'finished_at'],
+                name='main_job_worker_idx'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=Q(status__in=('pending', 'running')),
+                name='main_job_key_uniq'
+            ),
+        )
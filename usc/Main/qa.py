@@ -0,0 +1,173 @@
+import asyncio
+from datetime import timedelta
+from itertools import zip_longest
+
+from asgiref.sync import async_to_sync
+from bs4 import BeautifulSoup
+from CFR.models import CFRNode
+from django.conf import settings
+from django.utils import timezone
+from USCODE.models import Node
+from utils.ai_query import (QAError, ai_query, get_cache_key,
+                            get_cached_answer, normalize_question)
+from utils.data import upstream_client
+from utils.locks import single_flight
+from utils.logger import err_logger
+from utils.metrics import SEARCH_SECONDS
+from utils.search import strip_snippet
+
+from .jobs import HIGH, task
+from .models import Job, QAJob
+
+
+def get_usc_passages(query: str) -> list[dict]:
+    """The best matching sections with the fragments that matched"""
+    top_k = settings.QA_RETRIEVAL_TOP_K
+
+    # Nodes above sections match on their title only and have no text
+    nodes = Node.objects.full_text_search(query)[:top_k * 3]
+    nodes = [node for node in nodes if node.snippet][:top_k]
+
+    return [
+        {
+            "label": f"{node.get_collection_name()} {node.get_title()}",
+            "text": strip_snippet(node.snippet),
+            "url": node.get_view_document_link(),
+        }
+        for node in nodes
+    ]
+
+
+async def aget_cfr_pages(nodes: list[CFRNode]) -> list:
+    """The html of the sections, asked from eCFR side by side. A failed
+    call gets its exception"""
+    async with upstream_client():
+        return await asyncio.gather(
+            *(node.aget_html_content() for node in nodes),
+            return_exceptions=True)
+
+
+def get_page_text(page) -> str:
+    """The start of the text of a section page"""
+    if not page or isinstance(page, Exception):
+        return ""
+
+    text = BeautifulSoup(page, 'html.parser').get_text(" ", strip=True)
+    return text[:settings.QA_PASSAGE_MAX_CHARS]
+
+
+def get_cfr_passages(query: str) -> list[dict]:
+    """The best matching CFR sections already loaded, the text is not
+    stored so it is read from eCFR. A question never loads a title"""
+    try:
+        nodes = CFRNode.objects.full_text_search(query, load=False)
+        nodes = list(nodes[:settings.QA_RETRIEVAL_TOP_K])
+        pages = async_to_sync(aget_cfr_pages)(nodes)
+    except Exception as e:
+        err_logger.warning(f"CFR retrieval failed for {query!r}: {e}")
+        return []
+
+    return [
+        {
+            "label": f"{node.get_collection_name()} {node.get_title()}",
+            "text": get_page_text(page) or node.label_description,
+            "url": node.get_html_url(),
+        }
+        for node, page in zip(nodes, pages)
+    ]
+
+
+def retrieve_passages(query: str) -> list[dict]:
+    """Passages of our own data relevant to the question, the best
+    matches of each collection first"""
+    passages = zip_longest(get_usc_passages(query), get_cfr_passages(query))
+    return [
+        passage
+        for pair in passages
+        for passage in pair
+        if passage is not None
+    ]
+
+
+def clean_answer(answer: dict) -> dict:
+    return {**answer, "answer": answer["answer"].lstrip("?")}
+
+
+def make_qa(query: str):
+    """Answer a question right away"""
+    try:
+        return clean_answer(ai_query(query, retrieve_passages))
+    except QAError as e:
+        err_logger.warning(f"QA failed for {query!r}: {e}")
+        return None
+
+
+# Questions are answered by the job workers, the search page polls the
+# QA job for the answer. Without a run_jobs worker, or JOBS_INLINE, no
+# question gets an answer. A late answer is of no use, it isn't retried
+@task(priority=HIGH, max_attempts=1)
+def run_qa_job(job_id):
+    """Answer the question of a job and store the answer"""
+    try:
+        job = QAJob.objects.get(pk=job_id)
+        with SEARCH_SECONDS.time(source="QA"):
+            answer = make_qa(job.question)
+
+        if answer is None:
+            job.status = QAJob.FAILED
+        else:
+            job.status = QAJob.DONE
+            job.answer = answer["answer"]
+            job.citations = answer["citations"]
+        job.save()
+    except Exception:
+        # The page stops polling, the worker records the error
+        QAJob.objects.filter(pk=job_id).update(status=QAJob.FAILED)
+        raise
+
+    # Old jobs are of no use once their page was left
+    expired = timezone.now() - timedelta(seconds=settings.QA_JOB_TTL)
+    QAJob.objects.filter(created_at__lt=expired).delete()
+
+
+def get_queue_key(job: QAJob) -> str:
+    return f"qa:{job.pk}"
+
+
+def is_answering(job: QAJob) -> bool:
+    """Is the job waiting in the queue, however busy, or run by a live
+    worker. A worker that stopped extending its lease was lost"""
+    return Job.objects\
+        .filter(key=get_queue_key(job), status__in=(Job.PENDING, Job.RUNNING))\
+        .exclude(status=Job.RUNNING, lease_until__lt=timezone.now())\
+        .exists()
+
+
+def get_pending_qa(key: str):
+    """The job answering the question right now, if any. A job nothing
+    answers anymore fails, the question gets a new one"""
+    job = QAJob.objects\
+        .filter(key=key, status=QAJob.PENDING)\
+        .order_by('-created_at')\
+        .first()
+    if job is None or is_answering(job):
+        return job
+
+    QAJob.objects.filter(pk=job.pk).update(status=QAJob.FAILED)
+    return None
+
+
+def submit_qa(query: str):
+    """Get the answer if it is cached, else a job answering it. The same
+    question asked meanwhile gets the same job"""
+    answer = get_cached_answer(query)
+    if answer is not None:
+        return clean_answer(answer), None
+
+    key = get_cache_key(normalize_question(query))
+    with single_flight(key):
+        job = get_pending_qa(key)
+        if job is None:
+            job = QAJob.objects.create(question=query[:1000], key=key)
+            run_qa_job.enqueue(key=get_queue_key(job), job_id=str(job.pk))
+    return None, job
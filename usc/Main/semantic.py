@@ -0,0 +1,106 @@
+from functools import lru_cache
+from pathlib import Path
+
+from CFR.models import CFRNode
+from django.conf import settings
+from django.utils.module_loading import import_string
+from USCODE.models import Node
+from utils.semantic import SemanticIndex
+
+QUERYSETS = {
+    settings.USCODE: Node.objects.listing(),
+    settings.CFR: CFRNode.objects.all(),
+}
+
+loaded = {
+    "index": None,
+    "mtime": None,
+}
+
+
+@lru_cache(maxsize=1)
+def load_embedder(path: str):
+    return import_string(path)()
+
+
+def get_embedder():
+    """The embedder of the settings, a model takes seconds to load so
+    each process keeps its own"""
+    return load_embedder(settings.SEMANTIC_EMBEDDER)
+
+
+def get_index():
+    """Get the semantic index, reloaded when a new one was built"""
+    path = Path(settings.SEMANTIC_INDEX_DIR)
+    if not path.exists():
+        return None
+
+    mtime = path.stat().st_mtime
+    if loaded["mtime"] != mtime:
+        loaded["index"] = SemanticIndex.load(path)
+        loaded["mtime"] = mtime
+
+    return loaded["index"]
+
+
+def get_documents():
+    """(collection, id, text) of every section to index"""
+    sections = Node.objects\
+        .filter(selected_year_from=Node.objects.latest_year())\
+        .filter(node_type='leaf', section='LEAF')\
+        .values_list('id', 'heading', 'title', 'body__text')
+
+    for node_id, heading, title, content in sections.iterator(2000):
+        text = f"{heading} {title}\n{content or ''}"
+        yield settings.USCODE, node_id, text
+
+    cfr_sections = CFRNode.objects\
+        .filter(node_type='section')\
+        .values_list('id', 'label', 'label_description')
+
+    for node_id, label, description in cfr_sections.iterator(2000):
+        yield settings.CFR, node_id, f"{label}\n{description}"
+
+
+def build_index(batch_size: int = 1000) -> SemanticIndex:
+    """Index the sections of the latest year and swap the index in for
+    the workers"""
+    index = SemanticIndex.build(
+        get_documents(),
+        get_embedder(),
+        labels=[settings.USCODE, settings.CFR],
+        batch_size=batch_size,
+    )
+    index.save(settings.SEMANTIC_INDEX_DIR)
+    return index
+
+
+def semantic_search(query: str) -> list:
+    """Get the nodes closest in meaning to the query, best first"""
+    index = get_index()
+    if index is None:
+        return []
+
+    vector = get_embedder().embed([query])[0]
+    if len(vector) != index.vectors.shape[1]:
+        # Built by another embedder, until the index is rebuilt
+        return []
+
+    hits = [
+        hit for hit in index.search(vector, settings.SEMANTIC_MAX_RESULTS)
+        if hit[2] >= settings.SEMANTIC_MIN_SCORE
+    ]
+
+    # One query per collection, then back in the order of the scores
+    nodes = {}
+    for collection, queryset in QUERYSETS.items():
+        ids = [node_id for label, node_id, _ in hits if label == collection]
+        if ids:
+            found = queryset.in_bulk(ids)
+            nodes.update({(collection, i): n for i, n in found.items()})
+
+    return [
+        nodes[(label, node_id)]
+        for label, node_id, _ in hits
+        if (label, node_id) in nodes
+    ]
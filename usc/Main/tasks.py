@@ -0,0 +1,35 @@
+from CFR.tasks import ingest_title, ingest_titles
+from django.conf import settings
+from USCODE.tasks import ingest_collection, ingest_node, ingest_section
+from utils.logger import ingest_logger
+
+from .jobs import LOW, JobDeferred, is_busy, task
+# The run_jobs command imports the tasks module of every app
+from .qa import run_qa_job  # noqa: F401
+from .semantic import build_index
+from .toc import build_toc
+
+INGEST_TASKS = {
+    settings.USCODE: [ingest_collection, ingest_node, ingest_section],
+    settings.CFR: [ingest_titles, ingest_title],
+}
+
+# Seconds between the checks for the end of an ingestion
+PUBLISH_INTERVAL = 60
+
+
+@task(priority=LOW)
+def publish_ingest(collection: str):
+    """Rebuild the browse snapshot of the collection and the semantic
+    index once its ingestion jobs are done, until then the pages serve
+    the tree they were built from"""
+    if is_busy([task.name for task in INGEST_TASKS[collection]]):
+        raise JobDeferred(PUBLISH_INTERVAL)
+
+    toc = build_toc(collection)
+    index = build_index()
+    ingest_logger.info(
+        "Published the ingestion of %s", collection, extra={
+            "toc_nodes": len(toc),
+            "indexed": len(index),
+        })
@@ -2,6 +2,7 @@
 from django import template
 from Main.models import PlaceholderInput
 from random import choice
+from utils.search import render_snippet
 
 register = template.Library()
 
@@ -9,9 +10,13 @@ register = template.Library()
 @register.simple_tag()
 def get_random_placeholder():
     """Get a random placeholder"""
-    qset = PlaceholderInput.objects.all()
-    default = "Enter a source name, citation, or terms."
-    print(qset.count(), default)
-    if qset.count() == 0:
-        return default
-    return choice(qset).name
+    names = list(PlaceholderInput.objects.values_list('name', flat=True))
+    if not names:
+        return "Enter a source name, citation, or terms."
+    return choice(names)
+
+
+@register.filter()
+def highlight(snippet):
+    """Render a search snippet with the matched terms highlighted"""
+    return render_snippet(snippet)
@@ -0,0 +1,213 @@
+import os
+from pathlib import Path
+from time import monotonic
+from typing import Callable, Iterator, Optional
+
+from CFR.models import CFRNode
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from USCODE.models import Node
+from utils.toc import HAS_CHILDREN, HAS_PAPER, TocRow, TocSnapshot
+
+DOCUMENT_URLS = {
+    settings.USCODE: f'{settings.USCODE}:leaf',
+    settings.CFR: f'{settings.CFR}:html',
+}
+
+loaded = {}
+
+
+class TocNode:
+    """A node of the snapshot, with what the listing templates use"""
+
+    def __init__(self, collection: str, toc: TocSnapshot, index: int):
+        self.collection = collection
+        self.slug_id = toc.get_string("slug", index)
+        self.label = toc.get_string("label", index)
+        self.crumb = toc.get_string("crumb", index)
+        self.pdffile = self.pdf_link = toc.get_string("pdf", index)
+        self.flags = int(toc.flags[index])
+
+    def __str__(self):
+        return self.label
+
+    def get_title(self):
+        return self.label
+
+    def get_collection_name(self):
+        return self.collection
+
+    def has_children(self):
+        return bool(self.flags & HAS_CHILDREN)
+
+    def has_html_paper(self):
+        return bool(self.flags & HAS_PAPER)
+
+    def get_pdf_link(self):
+        return self.pdf_link
+
+    def get_node_url(self):
+        return str(reverse(f'{self.collection}:node', kwargs={
+            'slug_id': self.slug_id
+        }))
+
+    def get_view_document_link(self):
+        return str(reverse(DOCUMENT_URLS[self.collection], kwargs={
+            'slug_id': self.slug_id
+        }))
+
+    def get_html_url(self):
+        return self.get_view_document_link()
+
+    def get_crumb(self):
+        return format_html(
+            "<li class=\"breadcrumb-item\"><a href='{}'>{}</a></li>",
+            self.get_node_url(), self.crumb
+        )
+
+
+def get_toc_path(collection: str) -> Path:
+    return Path(settings.TOC_SNAPSHOT_DIR) / collection.lower()
+
+
+def get_toc(collection: str) -> Optional[TocSnapshot]:
+    """Get the snapshot of a collection, reloaded when a new one was
+    published. The link is only looked at every TOC_RELOAD_INTERVAL
+    seconds"""
+    now = monotonic()
+    checked_at, version, snapshot = loaded.get(collection, (None, ) * 3)
+    if checked_at is not None \
+            and now - checked_at < settings.TOC_RELOAD_INTERVAL:
+        return snapshot
+
+    path = get_toc_path(collection)
+    # The version the link points to, files of one version are loaded
+    # even if another one is published meanwhile
+    current = os.path.realpath(path) if path.exists() else None
+    if current is None:
+        snapshot = None
+    elif current != version:
+        snapshot = TocSnapshot.load(current)
+
+    loaded[collection] = (now, current, snapshot)
+    return snapshot
+
+
+def get_root_nodes(collection: str) -> Optional[list]:
+    """The top nodes of a collection, None without a snapshot"""
+    toc = get_toc(collection)
+    if not toc:
+        return None
+
+    return [TocNode(collection, toc, i) for i in toc.get_roots()]
+
+
+def get_child_nodes(collection: str, node_id: int) -> Optional[list]:
+    """The children of a node, None when the snapshot can't tell them
+    and the database has to, like for nodes loaded after it was built"""
+    toc = get_toc(collection)
+    index = toc.index_of(node_id) if toc else None
+    if index is None:
+        return None
+
+    children = toc.get_children(index)
+    if not children and toc.flags[index] & HAS_CHILDREN:
+        return None
+
+    return [TocNode(collection, toc, i) for i in children]
+
+
+def get_bread_crumbs(collection: str, node_id: int,
+                     prefix: Callable[[], str] = None):
+    """Crumbs from the root down to the node, None without it in the
+    snapshot. The prefix is only asked for when the node is in it"""
+    toc = get_toc(collection)
+    index = toc.index_of(node_id) if toc else None
+    if index is None:
+        return None
+
+    prefix = prefix() if prefix else ""
+    return mark_safe(prefix + "".join(
+        TocNode(collection, toc, i).get_crumb() for i in toc.get_path(index)
+    ))
+
+
+def find_node(collection: str, key: str) -> Optional[TocNode]:
+    """The node a citation key points to"""
+    toc = get_toc(collection)
+    index = toc.find(key) if toc else None
+    if index is None:
+        return None
+
+    return TocNode(collection, toc, index)
+
+
+def get_usc_key(title_number, section) -> str:
+    return f"{title_number}/{section}"
+
+
+def get_cfr_key(title, identifier, node_type) -> str:
+    return f"{title}/{identifier}/{node_type}"
+
+
+def get_usc_rows() -> Iterator[TocRow]:
+    latest_year = Node.objects.latest_year()
+
+    for node in Node.objects.listing().iterator(2000):
+        key = ""
+        is_section = node.node_type == 'leaf' and node.section == 'LEAF'
+        if is_section and node.selected_year_from == latest_year:
+            key = get_usc_key(node.title_number, node.leaf_number_from)
+
+        flags = HAS_CHILDREN if node.has_children() else 0
+        if node.htmlfile:
+            flags |= HAS_PAPER
+
+        yield TocRow(
+            id=node.pk,
+            parent_id=node.parent_id,
+            slug=node.slug_id,
+            label=node.get_title(),
+            crumb=node.title,
+            pdf=node.get_pdf_link() if node.pdffile else "",
+            flags=flags,
+            key=key,
+        )
+
+
+def get_cfr_rows() -> Iterator[TocRow]:
+    nodes = CFRNode.objects.select_related('title_node')
+
+    for node in nodes.iterator(2000):
+        key = ""
+        if node.title_node_id and node.node_type in ('part', 'section'):
+            key = get_cfr_key(
+                node.title_node.identifier, node.identifier, node.node_type)
+
+        flags = HAS_CHILDREN if node.has_children() else 0
+        if node.has_html_paper():
+            flags |= HAS_PAPER
+
+        yield TocRow(
+            id=node.pk,
+            parent_id=node.parent_id,
+            slug=node.slug_id,
+            label=node.get_title(),
+            crumb=node.get_title(),
+            pdf=node.pdf_link or "",
+            flags=flags,
+            key=key,
+        )
+
+
+def build_toc(collection: str) -> TocSnapshot:
+    """Snapshot the tree of a collection and swap it in for the
+    workers"""
+    rows = get_usc_rows() if collection == settings.USCODE \
+        else get_cfr_rows()
+
+    toc = TocSnapshot.build(rows)
+    toc.save(get_toc_path(collection))
+    return toc
@@ -8,4 +8,8 @@ app_name = 'main'
 urlpatterns = [
     path('', views.index, name='index'),
     path('search/', views.full_text_search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('qa/<uuid:job_id>/', views.qa_answer, name='qa'),
+    path('metrics', views.metrics, name='metrics'),
+    path('profiles/<str:name>', views.profile, name='profile'),
 ]
@@ -1,12 +1,30 @@
-from threading import Thread
+import asyncio
+import hashlib
+import heapq
+import hmac
+from itertools import islice
+from pathlib import Path
 from typing import Union
 
-from CFR.models import CFRNode, CFRNodeManager
+from asgiref.sync import sync_to_async
+from CFR.models import CFRNode
 from django.conf import settings
-from django.shortcuts import render
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.cache import cache_page
-from USCODE.models import Node, NodeManager
-from utils.ai_query import ai_query
+from USCODE.models import Node
+from utils.citation import parse_citation
+from utils.metrics import SEARCH_SECONDS, record_cache
+from utils.metrics import render as render_metrics
+from utils.timing import track
+
+from . import toc
+from .middleware import PROFILE_NAME
+from .models import QAJob
+from .qa import submit_qa
+from .semantic import semantic_search
 
 QA = "QA"
 
@@ -30,27 +48,112 @@ def index(request):
     return render(request, 'Main/index.html', context)
 
 
-def make_qa(query: str):
-    return ai_query(query).lstrip("?")
+def get_suggestion(node: Union[Node, CFRNode]) -> dict:
+    """Get what the search box shows for a suggested node"""
+    if node.has_children():
+        url = node.get_node_url()
+    else:
+        url = node.get_html_url()
 
+    return {
+        "collection": node.get_collection_name(),
+        "title": node.get_title(),
+        "url": url,
+    }
+
+
+def get_suggestions(term: str, collection: str) -> list[dict]:
+    """Get the nodes whose titles contain the term"""
+    limit = settings.AUTOCOMPLETE_MAX_RESULTS
+    sources = []
+
+    if collection in ('', settings.USCODE):
+        sources.append(Node.objects.autocomplete(term, limit))
+
+    if collection in ('', settings.CFR):
+        sources.append(CFRNode.objects.autocomplete(term, limit))
+
+    # Each source is ranked by the database, the nodes starting with the
+    # term first, then the shortest ones
+    nodes = heapq.merge(
+        *sources, key=lambda node: (not node.prefix, node.length))
+    return [get_suggestion(node) for node in islice(nodes, limit)]
+
+
+def autocomplete(request):
+    """Suggest nodes for what is typed in the search box"""
+    term = " ".join(request.GET.get("search", "").split())
+    collection = request.GET.get("collection", "")
+
+    if len(term) < settings.AUTOCOMPLETE_MIN_LENGTH or collection == QA:
+        return JsonResponse({"results": []})
+
+    # Hash the key, typed text is not a safe cache key
+    key = hashlib.md5(f"{collection}:{term.lower()}".encode()).hexdigest()
+    key = f"autocomplete:{key}"
+
+    results = record_cache("autocomplete", cache.get(key))
+    if results is None:
+        results = get_suggestions(term, collection)
+        cache.set(key, results, settings.AUTOCOMPLETE_CACHE_TTL)
+
+    return JsonResponse({"results": results})
+
+
+def in_thread(func):
+    """Run a search on a thread of its own, with connections of its own,
+    so the sources are searched side by side"""
+    func = track(func)
+
+    def inner(*args):
+        # The threads are reused, so are their connections
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+async def get_cfr(query):
+    with SEARCH_SECONDS.time(source=settings.CFR):
+        return await CFRNode.objects.afull_text_search(query)
+
+
+def get_usc(query):
+    with SEARCH_SECONDS.time(source=settings.USCODE):
+        return list(Node.objects.full_text_search(query))
 
-def get_qa(query, datax: dict):
-    qa = make_qa(query)
-    datax["qa"] = qa
 
+def get_semantic(query):
+    with SEARCH_SECONDS.time(source="semantic"):
+        return semantic_search(query)
 
-def get_cfr(query, datax: dict):
-    cfr_results = CFRNode.objects.full_text_search(query)
-    datax["cfr"] = cfr_results
 
+def find_citation(query: str, collection: str):
+    """Get the node a citation typed as the query points to"""
+    citation = parse_citation(query)
 
-def get_usc(query, datax: dict):
-    usc_results = Node.objects.full_text_search(query)
-    datax["usc"] = usc_results
+    if citation is None or collection not in ('', citation.collection):
+        return None
 
+    # Ranges jump to their first section, subsections to their section
+    if citation.collection == settings.USCODE:
+        key = toc.get_usc_key(citation.title, citation.section)
+        return toc.find_node(settings.USCODE, key) or \
+            Node.objects.get_by_citation(citation.title, citation.section)
 
-def full_text_search(request):
-    """Full text search for collections
+    node_type = 'part' if citation.part else 'section'
+    key = toc.get_cfr_key(citation.title, citation.section, node_type)
+    return toc.find_node(settings.CFR, key) or \
+        CFRNode.objects.get_by_citation(
+            citation.title, citation.section, node_type)
+
+
+async def full_text_search(request):
+    """Full text search for collections, eCFR is awaited while the
+    database is searched
     """
 
     query = request.GET.get("search")
@@ -59,32 +162,21 @@ def full_text_search(request):
     context = {}
 
     if query:
+        node = await sync_to_async(find_citation)(query, collection or '')
+        if node:
+            return redirect(node.get_html_url())
 
         if collection == '':
-
-            datax = {
-                "usc": None,
-                "cfr": None,
-                "qa": None
-            }
-
-            # Run all searches in parallel
-            threads = (
-                Thread(target=get_qa, args=(query, datax)),
-                Thread(target=get_cfr, args=(query, datax)),
-                Thread(target=get_usc, args=(query, datax)),
+            # Run all searches in parallel, the answer is delivered to
+            # the page once it is ready
+            searches = await asyncio.gather(
+                sync_to_async(submit_qa)(query),
+                get_cfr(query),
+                in_thread(get_usc)(query),
+                in_thread(get_semantic)(query),
             )
-
-            for thread in threads:
-                thread.start()
-
-            for thread in threads:
-                thread.join()
-
-
-            usc_results = datax["usc"]
-            cfr_results = datax["cfr"]
-            qa = datax["qa"]
+            (qa, qa_job), cfr_results, usc_results, semantic_results = \
+                searches
 
             # Combine results of separate model arranged 5 each in a list
             results = []
@@ -92,28 +184,68 @@ def full_text_search(request):
                 results.extend(usc_results[i:i+5])
                 results.extend(cfr_results[i:i+5])
 
+            # Close matches the full text search missed come last
+            found = {(n.get_collection_name(), n.pk) for n in results}
+            results.extend(
+                node for node in semantic_results
+                if (node.get_collection_name(), node.pk) not in found
+            )
+
             context = {
                 "nodes": results,
-                "qa": qa
+                "qa": qa,
+                "qa_job": qa_job,
             }
 
         elif collection == QA:
+            qa, qa_job = await sync_to_async(submit_qa)(query)
             context = {
-                "qa": make_qa(query)
+                "qa": qa,
+                "qa_job": qa_job,
             }
 
-        else:
-            COLLECTION: dict[str, Union[NodeManager, CFRNodeManager]] = {
-                settings.USCODE: Node.objects,
-                settings.CFR: CFRNode.objects,
-            }
+        elif collection == settings.CFR:
+            context['nodes'] = await get_cfr(query)
 
-            main = COLLECTION.get(collection)
-            if main:
-                context['nodes'] = main.full_text_search(query)
+        elif collection == settings.USCODE:
+            context['nodes'] = await sync_to_async(get_usc)(query)
 
-    return render(
+    return await sync_to_async(render)(
         request,
         "Main/search.html",
         context
     )
+
+
+def qa_answer(request, job_id):
+    """Get the state of a question answered in the background"""
+    job = get_object_or_404(QAJob, pk=job_id)
+    return JsonResponse({
+        "status": job.status,
+        "answer": job.answer,
+        "citations": job.citations,
+    })
+
+
+def metrics(request):
+    """The metrics for Prometheus, only shown to the scraper with the
+    token. The client address is the proxy's, it can't tell"""
+    token = settings.METRICS_TOKEN
+    sent = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(sent, f"Bearer {token}"):
+        raise Http404()
+
+    return HttpResponse(
+        render_metrics(settings.METRICS_DIR, settings.METRICS_RETIRE_AFTER),
+        content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def profile(request, name: str):
+    """A profile stored by the profiling middleware, for staff only"""
+    path = Path(settings.PROFILE_DIR) / name
+    if not request.user.is_staff or not PROFILE_NAME.fullmatch(name) \
+            or not path.exists():
+        raise Http404()
+
+    return FileResponse(
+        open(path, 'rb'), as_attachment=not name.endswith('.json'))
@@ -15,7 +15,7 @@ class SearchForm(forms.Form):
         if not self.node:
             raise forms.ValidationError("Node is not set")
 
-        max_length = self.node.get_root_node().get_child_nodes().count()
+        max_length = self.node.get_root_node().child_count
         if title > max_length:
             raise forms.ValidationError(
                 f"Title is too big. Max value is {max_length}")
@@ -0,0 +1,40 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USCODE', '0002_add_auto_trigger'),
+    ]
+
+    operations = [
+
+        # sections already loaded take the title number of their title node
+        migrations.RunSQL(
+            sql="""
+                WITH RECURSIVE tree (id, title_number) AS (
+                    SELECT id, title_number
+                    FROM uscode_node
+                    WHERE title_number IS NOT NULL
+                UNION ALL
+                    SELECT child.id, tree.title_number
+                    FROM uscode_node child
+                    JOIN tree ON child.parent_id = tree.id
+                    WHERE child.title_number IS NULL
+                )
+                UPDATE uscode_node
+                SET title_number = tree.title_number
+                FROM tree
+                WHERE uscode_node.id = tree.id
+                AND uscode_node.title_number IS NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        migrations.AddIndex(
+            model_name='node',
+            index=models.Index(fields=['selected_year_from', 'title_number', 'leaf_number_from'], name='uscode_node_citation_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+VECTOR_FUNCTION = """
+    CREATE FUNCTION uscode_node_vector_update() RETURNS trigger
+    AS $$
+    BEGIN
+        NEW.vector_column :=
+            to_tsvector('pg_catalog.english', coalesce((
+                SELECT text FROM uscode_content WHERE id = NEW.body_id
+            ), '')) ||
+            to_tsvector('pg_catalog.english', coalesce(NEW.title, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+"""
+
+VECTOR_TRIGGER = """
+    CREATE TRIGGER usc_uscode_vector_update
+    BEFORE INSERT OR UPDATE OF title, body_id
+    ON uscode_node
+    FOR EACH ROW EXECUTE PROCEDURE uscode_node_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USCODE', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('text', models.TextField()),
+            ],
+            options={
+                'verbose_name_plural': 'Section contents',
+                'db_table': 'uscode_content',
+            },
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='body',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='nodes', to='USCODE.sectioncontent'),
+        ),
+
+        # lz4 compresses and decompresses the toasted text faster than
+        # the default pglz, when the server was built with it
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF current_setting('server_version_num')::int >= 140000
+                    THEN
+                        ALTER TABLE uscode_content
+                        ALTER COLUMN text SET COMPRESSION lz4;
+                    END IF;
+                EXCEPTION WHEN feature_not_supported THEN
+                    NULL;
+                END $$;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        # the vector now reads the text through body_id, and is only
+        # computed again when the title or the text changes. It stays
+        # unweighted, the text then the title like tsvector_update_trigger
+        migrations.RunSQL(
+            sql=f"""
+                DROP TRIGGER usc_uscode_vector_update ON uscode_node;
+                {VECTOR_FUNCTION}
+                {VECTOR_TRIGGER}
+            """,
+            reverse_sql="""
+                DROP TRIGGER usc_uscode_vector_update ON uscode_node;
+                DROP FUNCTION uscode_node_vector_update();
+
+                CREATE TRIGGER usc_uscode_vector_update
+                BEFORE INSERT OR UPDATE
+                ON uscode_node
+                FOR EACH ROW EXECUTE PROCEDURE
+                tsvector_update_trigger(
+                    vector_column, 'pg_catalog.english', content, title
+                );
+            """,
+        ),
+    ]
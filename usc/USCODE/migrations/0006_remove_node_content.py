@@ -0,0 +1,64 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+BATCH = """
+    SELECT id, content,
+        encode(sha256(convert_to(content, 'UTF8')), 'hex') AS digest
+    FROM uscode_node
+    WHERE content IS NOT NULL AND body_id IS NULL
+    ORDER BY id
+    LIMIT %s
+"""
+
+
+def move_content(apps, schema_editor):
+    """Move the texts still inline, the move_section_content command
+    does the same online before this runs"""
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(f"""
+                INSERT INTO uscode_content (digest, text)
+                SELECT DISTINCT ON (digest) digest, content
+                FROM ({BATCH}) batch
+                ON CONFLICT (digest) DO NOTHING
+            """, [BATCH_SIZE])
+            cursor.execute(f"""
+                UPDATE uscode_node
+                SET body_id = uscode_content.id, content = NULL
+                FROM ({BATCH}) batch
+                JOIN uscode_content ON uscode_content.digest = batch.digest
+                WHERE uscode_node.id = batch.id
+            """, [BATCH_SIZE])
+            if cursor.rowcount == 0:
+                break
+
+
+def restore_content(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE uscode_node
+            SET content = uscode_content.text
+            FROM uscode_content
+            WHERE uscode_content.id = uscode_node.body_id
+        """)
+
+
+class Migration(migrations.Migration):
+
+    # Every batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('USCODE', '0005_section_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_content, restore_content),
+        migrations.RemoveField(
+            model_name='node',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,185 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USCODE', '0006_remove_node_content'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+
+                # year roots only have the year in their title, every
+                # other node takes the year of its root
+                migrations.RunSQL(
+                    sql="""
+                        UPDATE uscode_node
+                        SET selected_year_from = title::integer
+                        WHERE root_node AND selected_year_from IS NULL;
+
+                        WITH RECURSIVE tree (id, year) AS (
+                            SELECT id, selected_year_from
+                            FROM uscode_node
+                            WHERE root_node
+                        UNION ALL
+                            SELECT child.id, tree.year
+                            FROM uscode_node child
+                            JOIN tree ON child.parent_id = tree.id
+                        )
+                        UPDATE uscode_node
+                        SET selected_year_from = tree.year
+                        FROM tree
+                        WHERE uscode_node.id = tree.id
+                        AND uscode_node.selected_year_from IS NULL;
+                    """,
+                ),
+
+                # copy the rows into a table list partitioned by year, one
+                # partition per year already loaded
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE uscode_node RENAME TO uscode_node_old;
+
+                        CREATE TABLE uscode_node (
+                            LIKE uscode_node_old INCLUDING DEFAULTS
+                        ) PARTITION BY LIST (selected_year_from);
+
+                        ALTER TABLE uscode_node
+                        ALTER COLUMN selected_year_from SET NOT NULL;
+
+                        DO $$
+                        DECLARE
+                            year integer;
+                        BEGIN
+                            FOR year IN
+                                SELECT DISTINCT selected_year_from
+                                FROM uscode_node_old
+                            LOOP
+                                EXECUTE format(
+                                    'CREATE TABLE uscode_node_y%s '
+                                    'PARTITION OF uscode_node '
+                                    'FOR VALUES IN (%s)',
+                                    year, year
+                                );
+                            END LOOP;
+                        END $$;
+
+                        INSERT INTO uscode_node SELECT * FROM uscode_node_old;
+
+                        CREATE SEQUENCE uscode_node_new_id_seq
+                        OWNED BY uscode_node.id;
+
+                        SELECT setval(
+                            'uscode_node_new_id_seq',
+                            coalesce(max(id), 0) + 1,
+                            false
+                        ) FROM uscode_node;
+
+                        ALTER TABLE uscode_node ALTER COLUMN id
+                        SET DEFAULT nextval('uscode_node_new_id_seq');
+
+                        DROP TABLE uscode_node_old;
+
+                        ALTER SEQUENCE uscode_node_new_id_seq
+                        RENAME TO uscode_node_id_seq;
+                    """,
+                ),
+
+                # keys of a partitioned table must hold the year
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE uscode_node
+                        ADD CONSTRAINT uscode_node_pkey
+                        PRIMARY KEY (id, selected_year_from);
+
+                        ALTER TABLE uscode_node
+                        ADD CONSTRAINT uscode_node_slug_year_uniq
+                        UNIQUE (slug_id, selected_year_from);
+
+                        ALTER TABLE uscode_node
+                        ADD CONSTRAINT uscode_node_collection_id_fk
+                        FOREIGN KEY (collection_id)
+                        REFERENCES "USCODE_collection" (id)
+                        DEFERRABLE INITIALLY DEFERRED;
+
+                        ALTER TABLE uscode_node
+                        ADD CONSTRAINT uscode_node_collection_code_id_fk
+                        FOREIGN KEY (collection_code_id)
+                        REFERENCES "USCODE_collection" (id)
+                        DEFERRABLE INITIALLY DEFERRED;
+
+                        ALTER TABLE uscode_node
+                        ADD CONSTRAINT uscode_node_body_id_fk
+                        FOREIGN KEY (body_id)
+                        REFERENCES uscode_content (id)
+                        DEFERRABLE INITIALLY DEFERRED;
+                    """,
+                ),
+
+                # indexes on the partitioned table are created on every
+                # partition, and on the ones attached later
+                migrations.RunSQL(
+                    sql="""
+                        CREATE INDEX uscode_node_vector__5fb865_gin
+                        ON uscode_node USING gin (vector_column);
+
+                        CREATE INDEX uscode_node_title_trgm
+                        ON uscode_node USING gin ((UPPER(title)) gin_trgm_ops);
+
+                        CREATE INDEX uscode_node_heading_trgm
+                        ON uscode_node
+                        USING gin ((UPPER(heading)) gin_trgm_ops);
+
+                        CREATE INDEX uscode_node_citation_idx
+                        ON uscode_node
+                        (selected_year_from, title_number, leaf_number_from);
+
+                        CREATE INDEX uscode_node_parent_id_idx
+                        ON uscode_node (parent_id);
+
+                        CREATE INDEX uscode_node_collection_id_idx
+                        ON uscode_node (collection_id);
+
+                        CREATE INDEX uscode_node_collection_code_id_idx
+                        ON uscode_node (collection_code_id);
+
+                        CREATE INDEX uscode_node_body_id_idx
+                        ON uscode_node (body_id);
+
+                        CREATE TRIGGER usc_uscode_vector_update
+                        BEFORE INSERT OR UPDATE OF title, body_id
+                        ON uscode_node
+                        FOR EACH ROW EXECUTE PROCEDURE
+                        uscode_node_vector_update();
+                    """,
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='node',
+                    name='parent',
+                    field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='USCODE.node'),
+                ),
+                migrations.AlterField(
+                    model_name='node',
+                    name='selected_year_from',
+                    field=models.IntegerField(default=None),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='node',
+                    name='slug_id',
+                    field=models.CharField(max_length=1024),
+                ),
+                migrations.AddConstraint(
+                    model_name='node',
+                    constraint=models.UniqueConstraint(fields=('slug_id', 'selected_year_from'), name='uscode_node_slug_year_uniq'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.1.2 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USCODE', '0007_partition_by_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='node_key',
+            field=models.CharField(default='', max_length=1024),
+        ),
+
+        # keys of the loaded nodes, then drop the children concurrent
+        # requests loaded twice with everything under them
+        migrations.RunSQL(
+            sql="""
+                UPDATE uscode_node
+                SET node_key = CASE
+                    WHEN root_node THEN title
+                    ELSE coalesce(
+                        nullif(granule_id, ''),
+                        nullif(browse_path_alias, ''),
+                        title
+                    )
+                END;
+
+                WITH RECURSIVE duplicate (id) AS (
+                    SELECT id FROM (
+                        SELECT id, row_number() OVER (
+                            PARTITION BY
+                                selected_year_from, parent_id, node_key
+                            ORDER BY id
+                        ) AS position
+                        FROM uscode_node
+                    ) ranked
+                    WHERE position > 1
+                UNION
+                    SELECT child.id
+                    FROM uscode_node child
+                    JOIN duplicate ON child.parent_id = duplicate.id
+                )
+                DELETE FROM uscode_node
+                WHERE id IN (SELECT id FROM duplicate);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        migrations.AddConstraint(
+            model_name='node',
+            constraint=models.UniqueConstraint(fields=('selected_year_from', 'parent', 'node_key'), name='uscode_node_child_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='node',
+            constraint=models.UniqueConstraint(condition=models.Q(('root_node', True)), fields=('selected_year_from',), name='uscode_node_year_uniq'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.1.2 on 2026-10-19 18:25
+
+from django.db import migrations, models
+from utils.general import compact_slug
+
+BATCH_SIZE = 1000
+
+
+def rebuild_slugs(apps, schema_editor):
+    """Give every node the slug Node.get_slug makes, a level of the
+    tree at a time since a slug is made from the slug of the parent"""
+    Node = apps.get_model('USCODE', 'Node')
+    fields = (
+        'id', 'slug_id', 'root_node', 'title', 'selected_year_from',
+        'granule_id', 'package_id', 'node_key', 'parent_id',
+    )
+
+    level = list(Node.objects.filter(root_node=True).only(*fields))
+    for node in level:
+        node.slug_id = compact_slug(
+            node.title, 'USCODE', node.selected_year_from)
+
+    while level:
+        Node.objects.bulk_update(level, ['slug_id'], batch_size=BATCH_SIZE)
+
+        slugs = {node.id: node.slug_id for node in level}
+        parent_ids = list(slugs)
+
+        level = []
+        for i in range(0, len(parent_ids), BATCH_SIZE):
+            children = Node.objects\
+                .filter(parent_id__in=parent_ids[i:i + BATCH_SIZE])\
+                .only(*fields)
+
+            for node in children:
+                name = node.granule_id or node.package_id or node.title
+                node.slug_id = compact_slug(
+                    name, slugs[node.parent_id], node.node_key)
+                level.append(node)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USCODE', '0008_unique_children'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='node',
+            name='slug_id',
+            field=models.CharField(max_length=64),
+        ),
+    ]
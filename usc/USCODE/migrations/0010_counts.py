@@ -0,0 +1,46 @@
+# Generated by Django 4.1.2 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USCODE', '0009_compact_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='child_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='leaf_count',
+            field=models.IntegerField(default=0),
+        ),
+
+        # counts of the nodes already loaded
+        migrations.RunSQL(
+            sql="""
+                UPDATE uscode_node
+                SET child_count = counts.children,
+                    leaf_count = counts.leaves
+                FROM (
+                    SELECT parent_id, selected_year_from,
+                        count(*) AS children,
+                        count(*) FILTER (
+                            WHERE node_type = 'leaf'
+                            AND section NOT IN ('TOC', 'FRONTMATTER')
+                        ) AS leaves
+                    FROM uscode_node
+                    WHERE parent_id IS NOT NULL
+                    GROUP BY parent_id, selected_year_from
+                ) counts
+                WHERE uscode_node.id = counts.parent_id
+                AND uscode_node.selected_year_from = counts.selected_year_from;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,40 +1,200 @@
+import hashlib
+import re
+from time import perf_counter
 from typing import List, Optional, Type, Union
 
 from django.conf import settings
-from django.contrib.postgres.indexes import GinIndex
-from django.contrib.postgres.search import (SearchQuery, SearchRank,
-                                            SearchVectorField)
-from django.db import models, transaction
-from django.db.models import F
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, SearchVectorField)
+from django.db import connection, models
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.db.models.functions import Length, Substr, Upper
 from django.db.models.manager import Manager
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.urls import reverse
-from django.utils.crypto import get_random_string
 from django.utils.safestring import mark_safe
-from utils.data import (get_collection_name, get_content_text,
-                        get_content_title_css_file, request_data)
+from utils.data import (aget_content_title_css_file, get_collection_name,
+                        get_content_text, get_content_title_css_file,
+                        request_data)
+from utils.general import compact_slug
+from utils.locks import single_flight
+from utils.logger import ingest_logger
+from utils.metrics import record_ingested
+from utils.search import HIGHLIGHT_START, HIGHLIGHT_STOP
 from utils.sort import is_a_gt_b
 from utils.validators import validate_collection_code
 
+# Bound of a year partition, FOR VALUES IN (2022)
+PARTITION_BOUND = re.compile(r"IN \('?(\d+)'?\)")
+
 
 class NodeManager(Manager):
+    def snippet(self, query: SearchQuery) -> SearchHeadline:
+        """Highlighted fragments of the content matching the query"""
+
+        # ts_headline re-parses the whole document, so each row only gets
+        # its share of the per query budget of content characters
+        max_chars = settings.SEARCH_SNIPPET_BUDGET // \
+            settings.SEARCH_MAX_RESULTS
+
+        return SearchHeadline(
+            Substr('body__text', 1, max_chars),
+            query,
+            start_sel=HIGHLIGHT_START,
+            stop_sel=HIGHLIGHT_STOP,
+            max_words=settings.SEARCH_SNIPPET_MAX_WORDS,
+            min_words=settings.SEARCH_SNIPPET_MIN_WORDS,
+            max_fragments=settings.SEARCH_SNIPPET_MAX_FRAGMENTS,
+            fragment_delimiter=" ... ",
+        )
+
+    def get_partition_name(self, year: int) -> str:
+        return f"{self.model._meta.db_table}_y{int(year)}"
+
+    def is_partitioned(self) -> bool:
+        """Check if the table is partitioned by year, it isn't before the
+        migrations or in a test database built without them"""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT FROM pg_partitioned_table partitioned
+                    JOIN pg_class parent ON partitioned.partrelid = parent.oid
+                    WHERE parent.relname = %s
+                )
+            """, [self.model._meta.db_table])
+            return cursor.fetchone()[0]
+
+    def ensure_partition(self, year: int) -> bool:
+        """Create the partition of a year before its nodes come in, get
+        whether it was created. The catalog is read first, the DDL only
+        runs for a year the partitioned table doesn't have yet"""
+        if not self.is_partitioned():
+            return False
+
+        if int(year) in {year for year, *_ in self.get_partitions()}:
+            return False
+
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.get_partition_name(year)}
+                PARTITION OF {table} FOR VALUES IN (%s)
+            """, [int(year)])
+        return True
+
+    def detach_partition(self, year: int, drop: bool = False):
+        """Take the nodes of a year out of the tree, the detached table
+        is kept as an archive unless dropped"""
+        table = self.model._meta.db_table
+        name = self.get_partition_name(year)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+
+    def get_partitions(self) -> List[tuple]:
+        """(year, table, estimated rows) of the attached partitions"""
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT child.relname, child.reltuples::bigint,
+                    pg_get_expr(child.relpartbound, child.oid)
+                FROM pg_inherits
+                JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+                JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+                WHERE parent.relname = %s
+                ORDER BY child.relname
+            """, [self.model._meta.db_table])
+
+            return [
+                (int(PARTITION_BOUND.search(bound).group(1)), name, rows)
+                for name, rows, bound in cursor.fetchall()
+            ]
+
+    def latest_year(self) -> int:
+        """Get the latest year available"""
+        year_nodes = Collection.objects.first().get_child_nodes()
+        return int(max(year_nodes, key=lambda x: x.title).title)
+
+    def get_by_citation(self, title_number: int, section: str):
+        """Get the latest section leaf of a title by its number"""
+        return self.get_queryset()\
+            .filter(selected_year_from=self.latest_year())\
+            .filter(title_number=title_number)\
+            .filter(node_type='leaf', section='LEAF')\
+            .filter(leaf_number_from=section)\
+            .first()
+
+    def autocomplete(self, term: str, limit: int):
+        """Nodes of the latest year with the term in title or heading,
+        the ones starting with it first, then the shortest"""
+        prefix = Q(title__istartswith=term) | Q(heading__istartswith=term)
+        nodes = self.get_queryset()\
+            .filter(selected_year_from=self.latest_year())\
+            .filter(Q(title__icontains=term) | Q(heading__icontains=term))\
+            .annotate(
+                prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+                length=Length('title'))\
+            .order_by('-prefix', 'length', 'pk')
+
+        # Only what get_title and the urls need
+        return nodes.only(
+            'slug_id', 'title', 'heading', 'section', 'root_node', 'level',
+            'this_node', 'node_type', 'leaf_number_from', 'leaf_number_to',
+        )[:limit]
+
+    def listing(self):
+        """Nodes without the section text and search vector, for the
+        tree listings and walks that never show them"""
+        return self.get_queryset().only(*Node.LISTING_FIELDS)
+
     def full_text_search(self, query: str):
         to_query = SearchQuery(query)
         rank = SearchRank(F('vector_column'), to_query)
 
         # Get the latest year
-        year_nodes = Collection.objects.first().get_child_nodes()
-        max_year = int(max(year_nodes, key=lambda x: x.title).title)
-        # max_year = 1994
+        max_year = self.latest_year()
 
         return self.get_queryset()\
             .filter(selected_year_from=max_year)\
             .filter(vector_column=to_query)\
-            .annotate(rank=rank)\
+            .annotate(rank=rank, snippet=self.snippet(to_query))\
             .order_by('-rank')[:settings.SEARCH_MAX_RESULTS]
 
 
+class SectionContentManager(Manager):
+    def store(self, text: str) -> 'SectionContent':
+        """Get the stored row of the text, sections that did not change
+        between years share one"""
+        digest = SectionContent.get_digest(text)
+        content, _ = self.get_or_create(digest=digest, defaults={
+            'text': text,
+        })
+        return content
+
+
+class SectionContent(models.Model):
+    """The text of a section leaf, kept apart from the narrow tree rows"""
+
+    objects = SectionContentManager()
+
+    digest = models.CharField(max_length=64, unique=True)
+    text = models.TextField()
+
+    class Meta:
+        verbose_name_plural = "Section contents"
+        db_table = 'uscode_content'
+
+    def __str__(self):
+        return self.digest
+
+    @staticmethod
+    def get_digest(text: str) -> str:
+        """Same as encode(sha256(convert_to(text, 'UTF8')), 'hex')"""
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
 class Collection(models.Model):
     """A processing code for a node"""
 
@@ -49,21 +209,27 @@ class Collection(models.Model):
         verbose_name_plural = "Collections"
 
     def start_scraper(self):
-        with transaction.atomic():
-            years_nodes = self.get_child_nodes()
+        # Each node commits its children, an interrupted load keeps
+        # what it loaded
+        lastest_year = self.get_latest_year()
+        if lastest_year is None:
+            return
+
+        lastest_year.scrape_it_all()
 
-            # Get the lastest year node
-            max_year = 0
-            lastest_year: Optional[Node] = None
-            for year in years_nodes:
-                if int(year.title) > max_year:
-                    lastest_year = year
-                    max_year = int(year.title)
+    def get_latest_year(self) -> Optional['Node']:
+        """The node of the latest year govinfo has"""
+        years_nodes = self.get_child_nodes()
 
-            if lastest_year is None:
-                return
+        # Get the lastest year node
+        max_year = 0
+        lastest_year: Optional[Node] = None
+        for year in years_nodes:
+            if int(year.title) > max_year:
+                lastest_year = year
+                max_year = int(year.title)
 
-            lastest_year.scrape_it_all()
+        return lastest_year
 
     def get_full_path(self):
         """Get the full path of the collection"""
@@ -71,13 +237,18 @@ class Collection(models.Model):
 
     def get_child_nodes(self) -> models.query.QuerySet['Node']:
         """Get all the child nodes of the collection"""
-        nodes = self.node_set.all()
+        nodes = self.node_set.listing()
 
-        if len(nodes) > 0:
+        if nodes.exists():
             return nodes
 
-        # If there are no children, get the children from the API
-        return self.new_child_nodes()
+        with single_flight(f"uscode-collection:{self.pk}"):
+            # Loaded by the request we waited for
+            if nodes.exists():
+                return nodes
+
+            # If there are no children, get the children from the API
+            return self.new_child_nodes()
 
     def new_child_nodes(self):
         """Get and create new child nodes"""
@@ -93,22 +264,29 @@ class Collection(models.Model):
                 self.add_child_node(child_node['nodeValue'])
 
             # Return the child nodes
-            return self.node_set.all()
+            return self.node_set.listing()
 
         return Node.objects.none()
 
     def add_child_node(self, child_node: dict):
-        # Create a child node
-        node = Node(
-            collection=self,
-            collection_code=self,
+        # The title of a year node is the year it holds
+        year = int(child_node.get('title'))
+        Node.objects.ensure_partition(year)
+
+        # Create the year node or update the one loaded before
+        node, _ = Node.objects.update_or_create(
+            selected_year_from=year,
             root_node=True,
-            title=child_node.get('title'),
-            level=child_node.get('level'),
-            browse_path=child_node.get('browsePath'),
-            node_type=child_node.get('nodetype'),
+            defaults={
+                'collection': self,
+                'collection_code': self,
+                'title': child_node.get('title'),
+                'node_key': child_node.get('title'),
+                'level': child_node.get('level'),
+                'browse_path': child_node.get('browsePath'),
+                'node_type': child_node.get('nodetype'),
+            }
         )
-        node.save()
         return node
 
     def get_absolute_url(self):
@@ -143,7 +321,7 @@ class Node(models.Model):
         ('LEAF', 'LEAF')
     )
 
-    slug_id = models.CharField(max_length=1024, unique=True)
+    slug_id = models.CharField(max_length=64)
 
     package_id = models.CharField(max_length=200, null=True, blank=True)
     granule_id = models.CharField(max_length=200, null=True, blank=True)
@@ -152,7 +330,8 @@ class Node(models.Model):
         Collection, on_delete=models.CASCADE, null=True, blank=True)
     collection_code = models.ForeignKey(
         Collection, on_delete=models.CASCADE, related_name="collectionCode")
-    selected_year_from = models.IntegerField(null=True, blank=True)
+    # The year every node is partitioned by, see migration 0007
+    selected_year_from = models.IntegerField()
 
     root_node = models.BooleanField()
 
@@ -165,8 +344,11 @@ class Node(models.Model):
     htmlfile = models.CharField(max_length=1024)
     pdffile = models.CharField(max_length=1024)
     level = models.IntegerField()
+    # Postgres can't reference a partitioned table without the year,
+    # parents are always in the partition of their children
     parent: Type['Node'] = models.ForeignKey(
-        'self', on_delete=models.CASCADE, null=True, blank=True)
+        'self', on_delete=models.CASCADE, null=True, blank=True,
+        db_constraint=False)
     browse_path = models.CharField(max_length=1024)
     browse_path_alias = models.CharField(max_length=1024)
 
@@ -178,16 +360,77 @@ class Node(models.Model):
     leaf_number_from = models.CharField(max_length=20, null=True, blank=True)
     leaf_number_to = models.CharField(max_length=20, null=True, blank=True)
 
-    content = models.CharField(max_length=1_000_000, blank=True, null=True)
+    body = models.ForeignKey(
+        SectionContent, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='nodes')
+
+    # Tells siblings apart, a child is only stored once under its parent
+    node_key = models.CharField(max_length=1024, default='')
+
+    # Kept by the ingestion, the sections under a node are the range
+    # leaf_number_from to leaf_number_to
+    child_count = models.IntegerField(default=0)
+    leaf_count = models.IntegerField(default=0)
 
     vector_column = SearchVectorField(null=True)
 
+    # What the listings, breadcrumbs and the scraper read from a child,
+    # the section text alone can be a megabyte
+    LISTING_FIELDS = (
+        'slug_id', 'collection', 'collection_code', 'selected_year_from',
+        'root_node', 'title', 'title_number', 'heading', 'section',
+        'htmlfile', 'pdffile', 'level', 'parent', 'browse_path',
+        'browse_path_alias', 'node_type', 'this_node', 'leaf_number_from',
+        'leaf_number_to', 'child_count', 'leaf_count',
+    )
+
+    # What a reload of a child from govinfo may change
+    UPSERT_FIELDS = (
+        'slug_id', 'package_id', 'granule_id', 'collection_code',
+        'title', 'title_number', 'heading', 'section', 'textfile',
+        'htmlfile', 'pdffile', 'level', 'browse_path_alias', 'node_type',
+        'this_node', 'leaf_number_from', 'leaf_number_to', 'body',
+    )
+
     def __str__(self):
         return self.title
 
     class Meta:
         verbose_name_plural = "Nodes"
-        indexes = (GinIndex(fields=["vector_column"]),)
+        indexes = (
+            GinIndex(fields=["vector_column"]),
+
+            # Trigram indexes on the UPPER() expressions icontains uses
+            GinIndex(
+                OpClass(Upper("title"), name="gin_trgm_ops"),
+                name="uscode_node_title_trgm"
+            ),
+            GinIndex(
+                OpClass(Upper("heading"), name="gin_trgm_ops"),
+                name="uscode_node_heading_trgm"
+            ),
+            models.Index(
+                fields=[
+                    "selected_year_from", "title_number", "leaf_number_from"
+                ],
+                name="uscode_node_citation_idx"
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=["slug_id", "selected_year_from"],
+                name="uscode_node_slug_year_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["selected_year_from", "parent", "node_key"],
+                name="uscode_node_child_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["selected_year_from"],
+                condition=Q(root_node=True),
+                name="uscode_node_year_uniq"
+            ),
+        )
         db_table = 'uscode_node'
 
     def get_collection_name(self):
@@ -198,6 +441,11 @@ class Node(models.Model):
         """Check if the node has children"""
         return self.node_type == 'node'
 
+    def is_section(self):
+        """Check if the node is the leaf of a section"""
+        return self.node_type == 'leaf' and \
+            self.section not in ('TOC', 'FRONTMATTER')
+
     def get_browse_path(self):
         return self.browse_path or self.join_paths(
             str(self.selected_year_from), self.browse_path_alias
@@ -211,8 +459,9 @@ class Node(models.Model):
         for child in children:
             child.scrape_it_all()
 
-    def new_child_nodes(self):
-        """Get and create new child nodes"""
+    def new_child_nodes(self, with_body: bool = True):
+        """Get and create new child nodes, without with_body the text of
+        the sections is left to load on its own"""
 
         path = self.get_browse_path()
 
@@ -221,22 +470,40 @@ class Node(models.Model):
             path
         )
 
+        start = perf_counter()
+
         # Get the child nodes from the API
         data: dict = request_data(url)
         if data:
             # Create the child nodes
             childNodes: List[dict] = data.get('childNodes')
-            for child_node in childNodes:
-                self.add_child_node(child_node['nodeValue'])
+            nodes = [
+                self.build_child_node(child_node['nodeValue'], with_body)
+                for child_node in childNodes
+            ]
+            # A reload without the text keeps the text stored before
+            fields = Node.UPSERT_FIELDS
+            if not with_body:
+                fields = tuple(field for field in fields if field != 'body')
+            self.save_child_nodes([node for node in nodes if node], fields)
+
+            ingest_logger.info(
+                "Added the children of %s", self, extra={
+                    "node": self.pk,
+                    "count": self.child_count,
+                    "duration_ms": round((perf_counter() - start) * 1000, 2),
+                })
 
             # Return the child nodes
-            return self.node_set.all()
+            return self.get_children()
 
         return Node.objects.none()
 
-    def add_child_node(self, child_node: dict):
+    def build_child_node(
+        self, child_node: dict, with_body: bool = True
+    ) -> Optional['Node']:
         # Create a child node
-        print("added", child_node.get('heading'))
+        ingest_logger.debug("Adding %s", child_node.get('heading'))
 
         title = child_node.get('title')
 
@@ -247,14 +514,18 @@ class Node(models.Model):
                 collection_code=self.collection_code,
                 root_node=False,
                 title=title,
-                title_number=child_node.get('titlenumber'),
+                # Sections inherit the title number of their title node
+                title_number=(
+                    child_node.get('titlenumber') or self.title_number),
                 heading=child_node.get('heading') or "",
                 section=child_node.get('section') or "",
                 textfile=child_node.get('textfile'),
                 htmlfile=child_node.get('htmlfile'),
                 pdffile=child_node.get('pdffile'),
                 level=child_node.get('level'),
-                selected_year_from=child_node.get('selectedYearFrom'),
+                selected_year_from=(
+                    child_node.get('selectedYearFrom') or
+                    self.selected_year_from),
                 parent=self,
                 browse_path_alias=child_node.get('browsePathAlias'),
                 node_type=child_node.get('nodetype'),
@@ -262,24 +533,70 @@ class Node(models.Model):
                 leaf_number_from=child_node.get('leafnumberfrom'),
                 leaf_number_to=child_node.get('leafnumberto'),
             )
+            node.node_key = node.get_node_key()
+            node.slug_id = node.get_slug()
 
-            if node.node_type == 'leaf' and node.section == 'LEAF':
-                text = get_content_text(node.get_document_link())
-                node.content = text
+            if with_body and node.has_body():
+                node.fetch_body()
 
-            node.save()
             return node
 
+    def has_body(self):
+        """Check if the node is a section with its text stored"""
+        return self.node_type == 'leaf' and self.section == 'LEAF'
+
+    def fetch_body(self):
+        """Get the text of the section from govinfo"""
+        text = get_content_text(self.get_document_link())
+        if text:
+            self.body = SectionContent.objects.store(text)
+        return self.body
+
+    def save_child_nodes(
+        self, nodes: List['Node'], update_fields=UPSERT_FIELDS
+    ):
+        """Insert the children in one statement, children loaded before
+        are updated in place and keep their slug"""
+
+        # One statement may only touch a row once
+        nodes = {node.node_key: node for node in nodes}
+
+        Node.objects.bulk_create(
+            nodes.values(),
+            update_conflicts=True,
+            unique_fields=['selected_year_from', 'parent', 'node_key'],
+            update_fields=update_fields,
+        )
+
+        record_ingested(settings.USCODE, len(nodes))
+
+        self.child_count = len(nodes)
+        self.leaf_count = sum(node.is_section() for node in nodes.values())
+        Node.objects\
+            .filter(pk=self.pk, selected_year_from=self.selected_year_from)\
+            .update(child_count=self.child_count, leaf_count=self.leaf_count)
+
+    def get_children(self):
+        """The children of the node, the year keeps the query in the
+        partition of the node"""
+        return self.node_set.listing()\
+            .filter(selected_year_from=self.selected_year_from)
+
     def get_child_nodes(self):
         """Get the children of the node"""
         if self.has_children():
-            print(f"Getting child nodes for {str(self)}")
-            nodes = self.node_set.all()
+            ingest_logger.debug("Getting child nodes for %s", self)
+            nodes = self.get_children()
 
-            if len(nodes) > 0:
+            # The counts tell loaded nodes without asking the database
+            if self.child_count or nodes.exists():
                 return nodes
 
-            with transaction.atomic():
+            with single_flight(f"uscode-node:{self.pk}"):
+                # Loaded by the request we waited for
+                if nodes.exists():
+                    return nodes
+
                 return self.new_child_nodes()
 
         return None
@@ -297,19 +614,42 @@ class Node(models.Model):
 
         return True
 
+    def refresh_counts(self):
+        """Read the counts again, the year keeps the query in the
+        partition of the node"""
+        counts = Node.objects\
+            .filter(pk=self.pk, selected_year_from=self.selected_year_from)\
+            .values('child_count', 'leaf_count')\
+            .first()
+        if counts:
+            self.child_count = counts['child_count']
+            self.leaf_count = counts['leaf_count']
+
+    def has_section_leaves(self, nodes) -> bool:
+        """Check if the children are the section leaves"""
+        # The children were there before, or loaded by the request
+        # get_child_nodes waited for, after this node read its counts
+        if not self.child_count:
+            self.refresh_counts()
+
+        if self.child_count:
+            return bool(self.leaf_count)
+
+        # Children stored without the counts, the first one tells
+        first = nodes.first()
+        return first is not None and first.node_type == 'leaf'
+
     def drill_down_to_section_leaf(self, section: str):
         """Drill down to a section leaf"""
         nodes = self.get_child_nodes()
+        if nodes is None:
+            return None
 
         # Filter for nodes that section type is not TOC or FRONTMATTER
         nodes = nodes.exclude(section__in=['TOC', 'FRONTMATTER'])
 
-        if not nodes:
-            return None
-
-        # Check if any node in the nodes has a node_type of leaf
-        test_node = nodes[0]
-        if test_node.node_type == 'leaf':
+        # Nodes with section leaves list the sections themselves
+        if self.has_section_leaves(nodes):
             for node in nodes:
                 if node.leaf_number_from == node.leaf_number_to:
                     if node.leaf_number_from == section:
@@ -399,6 +739,13 @@ class Node(models.Model):
             path
         )
 
+    def get_node_key(self):
+        """The govinfo identity of the node among its siblings"""
+        if self.root_node:
+            return self.title
+
+        return self.granule_id or self.browse_path_alias or self.title
+
     def get_unique_id(self):
         """Get a unique id for the node"""
         if self.root_node:
@@ -406,6 +753,16 @@ class Node(models.Model):
 
         return self.granule_id or self.package_id
 
+    def get_slug(self):
+        """Slug from the year and the path of node keys down to the
+        node, the url of a node stays the same across reloads"""
+        if self.root_node:
+            identity = (settings.USCODE, self.selected_year_from)
+        else:
+            identity = (self.parent.slug_id, self.node_key)
+
+        return compact_slug(self.get_unique_id() or self.title, *identity)
+
     def get_document_link(self):
         """Get the link to the leaf"""
         return self.join_paths(
@@ -435,6 +792,13 @@ class Node(models.Model):
         full_css_link = self.join_paths(self.get_css_base_link(), css)
         return title, full_css_link, mark_safe(html)
 
+    async def aget_document(self):
+        """get_document for the async views"""
+        title, css, html = await aget_content_title_css_file(
+            self.get_document_link())
+        full_css_link = self.join_paths(self.get_css_base_link(), css)
+        return title, full_css_link, mark_safe(html)
+
     def get_document_iframe_link(self):
         """Get the link to the leaf html"""
         return str(
@@ -467,11 +831,30 @@ class Node(models.Model):
         </li>
         """)
 
+    def get_ancestors(self) -> list["Node"]:
+        """The nodes from the root down to this one, in one query
+        instead of one per level"""
+        table = self._meta.db_table
+        return list(type(self).objects.raw(f"""
+            WITH RECURSIVE ancestors AS (
+                SELECT node.*, 0 AS depth FROM {table} node
+                WHERE node.id = %s AND node.selected_year_from = %s
+                UNION ALL
+                SELECT node.*, ancestors.depth + 1 FROM {table} node
+                JOIN ancestors ON node.id = ancestors.parent_id
+                    AND node.selected_year_from =
+                        ancestors.selected_year_from
+                WHERE ancestors.collection_id IS NULL
+            )
+            SELECT * FROM ancestors ORDER BY depth DESC
+        """, [self.pk, self.selected_year_from]))
+
     def get_bread_crumbs(self):
         """Get the breadcrumbs to get to this node"""
+        nodes = self.get_ancestors()
         return mark_safe("".join([
-            self.get_parent().get_bread_crumbs(),
-            self.get_crumb()
+            nodes[0].get_parent().get_bread_crumbs(),
+            *(node.get_crumb() for node in nodes)
         ]))
 
 
@@ -479,8 +862,8 @@ class Node(models.Model):
 # unique slug_id for each node when it is created
 @receiver(pre_save, sender=Node)
 def create_slug_id(sender, instance: Node, **kwargs):
-    if not instance.id:
-        instance.slug_id = f"{instance.get_unique_id()}-{get_random_string(5)}"
+    if not instance.slug_id:
+        instance.slug_id = instance.get_slug()
 
 
 @receiver(post_save, sender=Collection)
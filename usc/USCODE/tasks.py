@@ -0,0 +1,98 @@
+from typing import Optional
+
+from django.conf import settings
+from Main.jobs import LOW, NORMAL, task
+
+from .models import Collection, Node
+
+
+def get_node(node_id: int, year: int) -> Optional[Node]:
+    """The node, the year keeps the query in its partition"""
+    return Node.objects.listing()\
+        .filter(pk=node_id, selected_year_from=year)\
+        .first()
+
+
+@task(priority=LOW)
+def load_child_nodes(node_id: int, year: int):
+    """Load the children of a node from govinfo"""
+    node = get_node(node_id, year)
+    if node is not None:
+        node.get_child_nodes()
+
+
+def prefetch_child_nodes(nodes):
+    """Queue the loading of the children not loaded yet, the next page
+    of the browse is ready before it is asked for"""
+    if not nodes or settings.JOBS_INLINE:
+        return
+
+    load_child_nodes.enqueue_many(
+        [
+            {"node_id": node.pk, "year": node.selected_year_from}
+            for node in nodes
+            if node.has_children() and not node.child_count
+        ],
+        key=lambda kwargs: f"uscode-node:{kwargs['node_id']}")
+
+
+# The ingestion is a job per browse path and per section text, any
+# number of run_jobs workers share it
+@task(priority=NORMAL, max_attempts=5)
+def ingest_collection(titles: list = None):
+    """Queue the ingestion of the latest year, or of some of its titles"""
+    collection, _ = Collection.objects.get_or_create(code=settings.USCODE)
+    year = collection.get_latest_year()
+    if year is None:
+        return
+
+    nodes = [year]
+    if titles:
+        nodes = [
+            node for node in year.get_child_nodes() or []
+            if str(node.title_number) in titles
+        ]
+    ingest_nodes(nodes)
+
+
+@task(priority=NORMAL, max_attempts=5)
+def ingest_node(node_id: int, year: int):
+    """Load the children of a browse path and queue theirs"""
+    node = get_node(node_id, year)
+    if node is None or not node.has_children():
+        return
+
+    node.new_child_nodes(with_body=False)
+    ingest_nodes(node.get_children())
+
+
+@task(priority=NORMAL, max_attempts=5)
+def ingest_section(node_id: int, year: int):
+    """Load the text of a section"""
+    node = get_node(node_id, year)
+    if node is None or not node.fetch_body():
+        return
+
+    Node.objects\
+        .filter(pk=node.pk, selected_year_from=year)\
+        .update(body=node.body)
+
+
+def ingest_nodes(nodes):
+    """Queue the browse paths and the sections among the nodes"""
+    nodes = list(nodes)
+
+    ingest_node.enqueue_many(
+        [
+            {"node_id": node.pk, "year": node.selected_year_from}
+            for node in nodes
+            if node.has_children()
+        ],
+        key=lambda kwargs: f"uscode-ingest:{kwargs['node_id']}")
+    ingest_section.enqueue_many(
+        [
+            {"node_id": node.pk, "year": node.selected_year_from}
+            for node in nodes
+            if node.has_body()
+        ],
+        key=lambda kwargs: f"uscode-section:{kwargs['node_id']}")
@@ -1,11 +1,15 @@
+from asgiref.sync import sync_to_async
 from django.http import Http404
 from django.shortcuts import redirect
 from django.views import generic
 from django.contrib import messages
 from django.conf import settings
 
+from Main import toc
+
 from .models import Collection, Node
 from .forms import SearchForm
+from .tasks import prefetch_child_nodes
 
 
 class CollectionView(generic.DetailView):
@@ -22,12 +26,18 @@ class CollectionView(generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['nodes'] = self.object.get_child_nodes()
+        nodes = toc.get_root_nodes(settings.USCODE)
+        if not nodes:
+            nodes = self.object.get_child_nodes()
+            prefetch_child_nodes(nodes)
+        context['nodes'] = nodes
         return context
 
 
 class NodeView(generic.DetailView):
     model = Node
+    # The collection starts the bread crumbs
+    queryset = Node.objects.select_related('collection_code')
     template_name = 'Data/node.html'
     slug_field: str = 'slug_id'
     slug_url_kwarg: str = 'slug_id'
@@ -65,25 +75,50 @@ class NodeView(generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['nodes'] = self.object.get_child_nodes()
+
+        # The snapshot answers without walking the tree in the database
+        nodes = toc.get_child_nodes(settings.USCODE, self.object.pk)
+        if nodes is None:
+            nodes = self.object.get_child_nodes()
+            prefetch_child_nodes(nodes)
+        context['nodes'] = nodes
+
+        context['bread_crumbs'] = toc.get_bread_crumbs(
+            settings.USCODE, self.object.pk,
+            prefix=self.object.collection_code.get_bread_crumbs)
         return context
 
 
 class LeafView(NodeView):
     template_name: str = 'Data/leaf.html'
 
+    node: Node = None
+    document = None
+
+    async def get(self, request, *args, **kwargs):
+        """Wait on govinfo without holding a thread, the rest of the
+        page is built like the other nodes"""
+        node = await self.get_queryset()\
+            .filter(slug_id=kwargs[self.slug_url_kwarg])\
+            .afirst()
+
+        # Check if the node is a leaf
+        if node is None or not node.htmlfile:
+            raise Http404("Resource not found")
+
+        self.node = node
+        self.document = await node.aget_document()
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        title, css, html = self.object.get_document()
+        title, css, html = self.document
         context["title"] = title
         context["css"] = css
         context["html"] = html
 
         return context
 
-    def get(self, request, *args, **kwargs):
-        """Check if the node is a leaf"""
-        node = self.get_object()
-        if not node.htmlfile:
-            raise Http404("Resource not found")
-        return super().get(request, *args, **kwargs)
+    def get_object(self, queryset=None):
+        # Read with the async ORM by get
+        return self.node
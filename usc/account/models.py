@@ -1,7 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.db import models
 from django.urls import reverse
-from utils.general import send_email
 from utils.validators import validate_phone, validate_special_char
 from django.dispatch import receiver
 from django.db.models.signals import post_save
@@ -73,7 +72,19 @@ class User(AbstractBaseUser):
         return self.email
 
     def email_user(self, subject, message, fail=True):
-        return send_email(self.email, subject, message, fail)
+        """Queue the email, the request doesn't wait for SendGrid"""
+        from .tasks import send_user_email
+        return send_user_email.enqueue(
+            email=self.email, subject=subject, message=message)
+
+    def email_verification(self, request, subject: str, template: str):
+        """Queue an email with a verification or password reset link, the
+        link is made when it's sent"""
+        from .tasks import send_verification_email
+        from .utils import get_site
+        return send_verification_email.enqueue(
+            user_id=self.pk, subject=subject, template=template,
+            site=get_site(request))
 
     @property
     def is_active(self):
@@ -0,0 +1,26 @@
+from Main.jobs import HIGH, JobError, task
+from utils.general import send_email
+
+from .models import User
+from .utils import verification_message
+
+
+@task(priority=HIGH, max_attempts=5)
+def send_user_email(email: str, subject: str, message: str):
+    """Send an email, retried while SendGrid doesn't take it"""
+    if not send_email(email, subject, message):
+        raise JobError(f"Email {subject!r} to {email} was not sent")
+
+
+@task(priority=HIGH, max_attempts=5)
+def send_verification_email(user_id: int, subject: str, template: str,
+                            site: dict):
+    """Send a link with a token to the user. The token is made here, the
+    queued job doesn't hold it"""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+
+    message = verification_message(user, template, site)
+    if not send_email(user.email, subject, message):
+        raise JobError(f"Email {subject!r} to {user.email} was not sent")
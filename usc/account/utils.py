@@ -7,35 +7,36 @@ from django.utils.http import urlsafe_base64_encode
 from .tokens import account_token
 
 
-def verification_message(request: HttpRequest, user, template):
+def get_site(request: HttpRequest) -> dict:
+    """Where the links of an email point to"""
+    return {
+        'domain': get_current_site(request).domain,
+        'protocol': 'https' if request.is_secure() else 'http',
+    }
+
+
+def verification_message(user, template: str, site: dict):
     uid = urlsafe_base64_encode(force_bytes(user.pk))
     token = account_token.make_token(user)
 
     message = compose_email(
-        request,
         template,
         {
             'user': user,
             'uid': uid,
             'token': token,
             'name': user.profile.get_fullname,
-        }
+        },
+        site
     )
     return message
 
 
-def compose_email(request: HttpRequest, template: str, context: dict):
-    site = get_current_site(request)
-
-    protocol = 'http'
-    if request.is_secure():
-        protocol = 'https'
-
+def compose_email(template: str, context: dict, site: dict):
     context.update({
-        'domain': site.domain,
+        **site,
         'from': settings.DEFAULT_FROM_EMAIL,
         'app_name': settings.APP_NAME,
-        'protocol': protocol,
     })
 
     message = render_to_string(template, context)
@@ -8,12 +8,12 @@ from django.urls.base import reverse
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from django.views.generic import FormView, TemplateView, UpdateView
+from utils.logger import logger
 
 from .forms import (ChangePasswordForm, ForgetPasswordForm, LoginForm,
                     ProfileForm, RegisterForm, ResetPasswordValidateEmailForm)
 from .models import User
 from .tokens import account_token
-from .utils import verification_message
 
 
 def activate_email(request, uidb64, token):
@@ -41,9 +41,8 @@ def activate_email(request, uidb64, token):
 
     # Send another verification email
     subject = f"{settings.APP_NAME} Account Verification"
-    message = verification_message(
-        request, user, "account/email/activation_email.html")
-    user.email_user(subject, message)
+    user.email_verification(
+        request, subject, "account/email/activation_email.html")
 
     messages.success(
         request, 'Email verification link is expired \
@@ -89,7 +88,8 @@ class LoginView(TemplateView):
             messages.error(request, 'Account has been deactivated.')
             return redirect('account:login')
 
-        print(form.errors)
+        logger.debug(
+            "Login failed", extra={"errors": form.errors.get_json_data()})
 
         return render(
             request, self.template_name, {'form': form})
@@ -115,10 +115,8 @@ class RegisterPage(TemplateView):
             user = form.save()
 
             subject = f"{settings.APP_NAME} Email Verification"
-            message = verification_message(
-                request, user, "account/email/activation_email.html")
-
-            user.email_user(subject, message)
+            user.email_verification(
+                request, subject, "account/email/activation_email.html")
 
             messages.success(
                 request,
@@ -224,10 +222,8 @@ class ForgetPasswordView(FormView):
 
                 # Send password reset link
                 subject = f"{settings.APP_NAME} Account Password Reset"
-                message = verification_message(
-                    request, user, "account/email/password_reset.html")
-
-                user.email_user(subject, message)
+                user.email_verification(
+                    request, subject, "account/email/password_reset.html")
             except User.DoesNotExist:
                 pass
 
@@ -246,10 +242,9 @@ class ResendEmailVerificationLink(TemplateView):
             try:
                 user: User = User.objects.get(pk=resend_email_uid)
                 subject = f"{settings.APP_NAME} Email Verification"
-                message = verification_message(
-                    self.request, user, "account/email/activation_email.html")
-
-                user.email_user(subject, message)
+                user.email_verification(
+                    self.request, subject,
+                    "account/email/activation_email.html")
             except User.DoesNotExist:
                 pass
 
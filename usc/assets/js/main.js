@@ -198,4 +198,108 @@ if ($('#submit-ai-query').length) {
     $('#submit-ai-query').click(function(){
         submit_query()
     })
-}
\ No newline at end of file
+}
+
+// Search box suggestions
+let searchInput = document.querySelector('[data-autocomplete-url]');
+
+if (searchInput) {
+    let suggestions = document.querySelector('#search-suggestions');
+    let collectionSelect = document.querySelector('#selectCollection');
+    let suggestionTimer = null;
+
+    let showSuggestions = function (data) {
+        suggestions.innerHTML = '';
+
+        data['results'].forEach(function (result) {
+            let option = document.createElement('option');
+            option.value = result['title'];
+            option.label = result['collection'];
+            option.dataset.url = result['url'];
+            suggestions.appendChild(option);
+        });
+    }
+
+    searchInput.addEventListener('input', function () {
+        // Go straight to a suggestion once it is picked
+        let picked = Array.from(suggestions.options).find(function (option) {
+            return option.value === searchInput.value;
+        });
+
+        if (picked) {
+            window.location = picked.dataset.url;
+            return
+        }
+
+        clearTimeout(suggestionTimer);
+        suggestionTimer = setTimeout(function () {
+            $.ajax({
+                method: "GET",
+                url: searchInput.dataset.autocompleteUrl,
+                data: {
+                    'search': searchInput.value,
+                    'collection': collectionSelect ? collectionSelect.value : '',
+                },
+                success: showSuggestions,
+            })
+        }, 200);
+    });
+}
+
+
+// Answers of questions are delivered after the search page renders
+let qaResult = document.querySelector('[data-qa-url]');
+
+if (qaResult) {
+    let polls = 0;
+
+    let showAnswer = function (data) {
+        let answer = document.createElement('p');
+        answer.textContent = data['answer'];
+        qaResult.replaceChildren(answer);
+
+        if (data['citations'].length == 0) {
+            return
+        }
+
+        let citations = document.createElement('ol');
+        citations.classList.add('citations');
+
+        data['citations'].forEach(function (citation) {
+            let item = document.createElement('li');
+            let link = document.createElement('a');
+            item.value = citation['number'];
+            link.href = citation['url'];
+            link.textContent = citation['label'];
+            item.appendChild(link);
+            citations.appendChild(item);
+        });
+
+        qaResult.appendChild(citations);
+    }
+
+    let pollAnswer = function () {
+        $.ajax({
+            method: "GET",
+            url: qaResult.dataset.qaUrl,
+            success: function (data) {
+                if (data['status'] == 'pending' && polls++ < 60) {
+                    setTimeout(pollAnswer, 1000);
+                    return
+                }
+
+                if (data['status'] == 'done' && data['answer'] != '') {
+                    showAnswer(data);
+                    return
+                }
+
+                qaResult.parentElement.classList.add('d-none');
+            },
+            error: function () {
+                qaResult.parentElement.classList.add('d-none');
+            },
+        })
+    }
+
+    setTimeout(pollAnswer, 500);
+}
@@ -0,0 +1,157 @@
+import pytest
+from CFR.models import CFRNode
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from USCODE.models import Collection, Node
+
+# Skip the database benchmarks without Postgres, like the tests
+from tests.conftest import (create_extensions,  # noqa: F401
+                            pytest_collection_modifyitems)
+
+YEAR = 2022
+
+# A year of 20 titles of 20 chapters of 25 sections, 10441 nodes
+TITLES = 20
+CHAPTERS = 20
+SECTIONS = 25
+
+# 10 CFR titles of 100 parts of 9 sections, 10010 nodes
+CFR_TITLES = 10
+PARTS = 100
+PART_SECTIONS = 9
+
+
+def get_section_number(n: int) -> str:
+    """Some sections have a letter, like 1396a"""
+    return f"{n}a" if n % 5 == 0 else str(n)
+
+
+def build_usc_levels(collection: Collection) -> list[list[Node]]:
+    """Unsaved nodes of a synthetic year, level by level"""
+    common = {"collection_code": collection, "selected_year_from": YEAR}
+
+    year = Node(
+        collection=collection, root_node=True, title=str(YEAR),
+        node_key=str(YEAR), level=0, node_type="node", child_count=TITLES,
+        **common)
+    levels = [[year], [], [], []]
+
+    for t in range(1, TITLES + 1):
+        last = CHAPTERS * SECTIONS
+        title = Node(
+            parent=year, root_node=False, title=f"Title {t}",
+            this_node=f"Title {t}", title_number=t, node_key=f"title{t}",
+            level=1, node_type="node", child_count=CHAPTERS,
+            leaf_number_from="1", leaf_number_to=get_section_number(last),
+            **common)
+        levels[1].append(title)
+
+        for c in range(1, CHAPTERS + 1):
+            first = (c - 1) * SECTIONS + 1
+            chapter = Node(
+                parent=title, root_node=False, title=f"Chapter {c}",
+                title_number=t, node_key=f"title{t}/chap{c}", level=2,
+                node_type="node", child_count=SECTIONS, leaf_count=SECTIONS,
+                leaf_number_from=get_section_number(first),
+                leaf_number_to=get_section_number(first + SECTIONS - 1),
+                **common)
+            levels[2].append(chapter)
+
+            for s in range(first, first + SECTIONS):
+                number = get_section_number(s)
+                levels[3].append(Node(
+                    parent=chapter, root_node=False,
+                    title=f"Definitions of terms used in section {number}",
+                    heading=f"§{number}.", title_number=t,
+                    node_key=f"title{t}/sec{number}", level=3,
+                    node_type="leaf", section="LEAF",
+                    leaf_number_from=number, leaf_number_to=number,
+                    htmlfile=f"USCODE-{YEAR}-title{t}/html/{number}.htm",
+                    pdffile=f"USCODE-{YEAR}-title{t}/pdf/{number}.pdf",
+                    **common))
+
+    for level in levels:
+        for node in level:
+            node.slug_id = node.get_slug()
+
+    return levels
+
+
+def build_cfr_levels() -> list[list[CFRNode]]:
+    """Unsaved nodes of synthetic CFR titles, level by level"""
+    levels = [[], [], []]
+
+    for t in range(1, CFR_TITLES + 1):
+        title = CFRNode(
+            identifier=str(t), node_type="title", label=f"Title {t}",
+            label_description=f"Title {t} of the regulations",
+            up_to_date_as_of="2022-12-01", child_count=PARTS)
+        levels[0].append(title)
+
+        for p in range(1, PARTS + 1):
+            part = CFRNode(
+                identifier=str(p), node_type="part", label=f"Part {p}",
+                parent=title, title_node=title, child_count=PART_SECTIONS,
+                leaf_count=PART_SECTIONS, descendant_range_start=f"{p}.1",
+                descendant_range_end=f"{p}.{PART_SECTIONS}")
+            levels[1].append(part)
+
+            levels[2].extend(
+                CFRNode(
+                    identifier=f"{p}.{s}", node_type="section",
+                    label=f"§ {p}.{s} Definitions", parent=part,
+                    title_node=title)
+                for s in range(1, PART_SECTIONS + 1)
+            )
+
+    for level in levels:
+        for node in level:
+            node.slug_id = node.get_slug()
+
+    return levels
+
+
+@pytest.fixture(scope="session")
+def usc_levels():
+    collection = Collection(code=settings.USCODE, name="United States Code")
+    return build_usc_levels(collection)
+
+
+@pytest.fixture(scope="module")
+def usc_db(django_db_setup, django_db_blocker):
+    """The synthetic year in the database, created once per module"""
+    with django_db_blocker.unblock():
+        # Without the signal asking govinfo for the name
+        collection, = Collection.objects.bulk_create([
+            Collection(code=settings.USCODE, name="United States Code")])
+
+        levels = build_usc_levels(collection)
+        for level in levels:
+            for node in level:
+                # Set the ids of the parents saved with the level above
+                node.parent = node.parent
+            Node.objects.bulk_create(level, batch_size=2000)
+
+        # The trigger of the migrations is missing without them
+        Node.objects.update(
+            vector_column=SearchVector('title', 'heading'))
+
+        yield levels
+
+        Node.objects.all().delete()
+        collection.delete()
+
+
+@pytest.fixture(scope="module")
+def cfr_db(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        levels = build_cfr_levels()
+        for level in levels:
+            for node in level:
+                node.parent = node.parent
+                node.title_node = node.title_node
+            CFRNode.objects.bulk_create(level, batch_size=2000)
+
+        yield levels
+
+        CFRNode.objects.all().delete()
@@ -0,0 +1,67 @@
+from Main import toc
+from utils.sort import is_a_gt_b
+from utils.toc import TocRow, TocSnapshot
+
+from .conftest import CHAPTERS, SECTIONS
+
+PAIRS = [
+    ("101", "99"),
+    ("1396a", "1396"),
+    ("1396b-1", "1396b"),
+    ("2000e-16c", "2000e-16b"),
+    ("300gg-111", "300gg-91"),
+    ("5", "5a"),
+]
+
+
+def test_is_a_gt_b(benchmark):
+    def compare():
+        return [is_a_gt_b(a, b) for a, b in PAIRS]
+
+    assert benchmark(compare) == [True, True, True, True, True, False]
+
+
+def test_section_within_node(benchmark, usc_levels):
+    # The chapters of a title, scanned for a section like the drill down
+    chapters = usc_levels[2][:CHAPTERS]
+    section = str(CHAPTERS * SECTIONS - 1)
+
+    def find():
+        return [
+            chapter for chapter in chapters
+            if chapter.section_within_node(section)
+        ]
+
+    assert len(benchmark(find)) == 1
+
+
+def test_get_title(benchmark, usc_levels):
+    nodes = [node for level in usc_levels[:3] for node in level]
+    nodes.extend(usc_levels[3][:1000])
+
+    titles = benchmark(lambda: [node.get_title() for node in nodes])
+    assert len(titles) == len(nodes)
+
+
+def test_toc_bread_crumbs(benchmark, usc_levels, settings, tmp_path):
+    settings.TOC_SNAPSHOT_DIR = tmp_path
+
+    # Ids in the order of the levels stand in for the database ones
+    ids = {}
+    rows = []
+    for level in usc_levels:
+        for node in level:
+            ids[id(node)] = len(ids) + 1
+            rows.append(TocRow(
+                id=ids[id(node)],
+                parent_id=ids.get(id(node.parent)) if node.parent else None,
+                slug=node.slug_id,
+                label=node.get_title(),
+                crumb=node.title,
+            ))
+
+    TocSnapshot.build(rows).save(toc.get_toc_path(settings.USCODE))
+    leaf = ids[id(usc_levels[3][-1])]
+
+    crumbs = benchmark(toc.get_bread_crumbs, settings.USCODE, leaf)
+    assert crumbs.count("breadcrumb-item") == 4
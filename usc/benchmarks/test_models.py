@@ -0,0 +1,64 @@
+import pytest
+from CFR.models import CFRNode
+from USCODE.models import Node
+
+from .conftest import CHAPTERS, PARTS, SECTIONS
+
+pytestmark = pytest.mark.django_db
+
+
+def test_drill_down_to_section_leaf(benchmark, usc_db):
+    title = usc_db[1][-1]
+    section = str(CHAPTERS * SECTIONS - 1)
+
+    node = benchmark(title.drill_down_to_section_leaf, section)
+    assert node.leaf_number_from == section
+
+
+def test_usc_search(benchmark, usc_db):
+    year = usc_db[0][0]
+
+    node = benchmark(year.search, "7", "251")
+    assert node.leaf_number_from == "251"
+
+
+def test_cfr_search(benchmark, cfr_db):
+    title = cfr_db[0][-1]
+    section = f"{PARTS}.9"
+
+    node = benchmark(title.search, section)
+    assert node.identifier == section
+
+
+def test_usc_bread_crumbs(benchmark, usc_db):
+    leaf = Node.objects.get(pk=usc_db[3][-1].pk)
+
+    crumbs = benchmark(leaf.get_bread_crumbs)
+    assert crumbs.count("breadcrumb-item") == 5
+
+
+def test_cfr_bread_crumbs(benchmark, cfr_db):
+    leaf = CFRNode.objects.get(pk=cfr_db[2][-1].pk)
+
+    crumbs = benchmark(leaf.get_bread_crumbs)
+    assert crumbs.count("breadcrumb-item") == 3
+
+
+def test_usc_full_text_search(benchmark, usc_db):
+    def search():
+        return list(Node.objects.full_text_search("definitions terms"))
+
+    assert benchmark(search)
+
+
+def test_cfr_full_text_search(benchmark, cfr_db, monkeypatch):
+    # The eCFR search answers from a recording, the database is measured
+    monkeypatch.setattr("CFR.models.cfr_full_text_search", lambda query: [
+        {"title": str(t), "section": f"{p}.1"}
+        for t in (1, 2) for p in range(1, 11)
+    ])
+
+    def search():
+        return list(CFRNode.objects.full_text_search("definitions"))
+
+    assert len(benchmark(search)) == 20
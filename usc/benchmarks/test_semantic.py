@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from utils.semantic import LexicalEmbedder, SemanticIndex
+
+# Sections of a year of the USC and of the CFR, as many as the index
+# holds in production, with the 384 dimensions of all-MiniLM-L6-v2
+DOCUMENTS = 250_000
+DIM = 384
+
+# What a semantic query may take, embedding included
+QUERY_BUDGET = 0.05
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = np.random.default_rng(0)
+    vectors = rng.integers(-127, 128, (DOCUMENTS, DIM), dtype=np.int8)
+    return SemanticIndex(
+        vectors=vectors,
+        ids=np.arange(DOCUMENTS, dtype=np.int64),
+        collections=np.zeros(DOCUMENTS, dtype=np.int8),
+        labels=["USCODE"],
+    )
+
+
+def test_search(benchmark, index):
+    query = np.random.default_rng(1).standard_normal(DIM).astype(np.float32)
+
+    hits = benchmark(index.search, query, 20)
+
+    assert len(hits) == 20
+    assert benchmark.stats.stats.mean < QUERY_BUDGET
+
+
+def test_lexical_query(benchmark):
+    embedder = LexicalEmbedder()
+
+    benchmark(embedder.embed, ["employment discrimination for religion"])
+
+    assert benchmark.stats.stats.mean < QUERY_BUDGET
+
+
+def test_sentence_query(benchmark, index):
+    pytest.importorskip("sentence_transformers")
+    from utils.semantic import SentenceEmbedder
+
+    embedder = SentenceEmbedder()
+
+    def query():
+        vector = embedder.embed(["firing someone over their faith"])[0]
+        return index.search(vector, 20)
+
+    assert len(benchmark(query)) == 20
+    assert benchmark.stats.stats.mean < QUERY_BUDGET
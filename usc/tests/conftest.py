@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+import psycopg2
+import pytest
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from utils.routers import REPLICA, use_primary
+
+
+@lru_cache
+def database_available() -> bool:
+    """Can the tests reach the Postgres server of the settings"""
+    db = settings.DATABASES['default']
+    try:
+        psycopg2.connect(
+            dbname='postgres', user=db['USER'], password=db['PASSWORD'],
+            host=db['HOST'] or None, port=db['PORT'] or None,
+            connect_timeout=2,
+        ).close()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def pytest_collection_modifyitems(items):
+    if database_available():
+        return
+
+    skip = pytest.mark.skip(reason="Postgres is not available")
+    for item in items:
+        if item.get_closest_marker("django_db"):
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def primary_reads(request):
+    """The replica doesn't see what a test writes in its transaction,
+    tests read from the primary unless they allow the replica"""
+    marker = request.node.get_closest_marker("django_db")
+    if not marker or REPLICA in marker.kwargs.get("databases", ()):
+        yield
+        return
+
+    with use_primary():
+        yield
+
+
+@receiver(connection_created)
+def create_extensions(sender, connection, **kwargs):
+    """The tests skip the migrations, the trigram indexes still need
+    the extension the first one creates"""
+    if connection.settings_dict['NAME'].startswith('test_'):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
@@ -0,0 +1,216 @@
+from datetime import timedelta
+from threading import Event, Thread
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from django.core.cache import cache
+from django.utils import timezone
+from Main.jobs import claim
+from Main.models import Job, QAJob
+from Main.qa import get_cfr_passages, run_qa_job, submit_qa
+from utils.ai_query import (QAError, ai_query, answer_question,
+                            build_prompt, get_citations, normalize_question)
+import pytest
+
+
+PASSAGES = [
+    {"label": "USCODE Sec. 1", "text": "a" * 400, "url": "/content/1/"},
+    {"label": "USCODE Sec. 2", "text": "b" * 400, "url": "/content/2/"},
+    {"label": "CFR § 3", "text": "c" * 4000, "url": "/CFR/3/html/"},
+]
+
+
+def retrieve(question):
+    return PASSAGES
+
+
+class CountingBackend:
+    calls = []
+    release = Event()
+
+    def complete(self, prompt, timeout):
+        self.calls.append(prompt)
+        self.release.wait(5)
+        return " It depends [2], see also [1] and [2]. "
+
+
+@pytest.fixture
+def backend(settings):
+    settings.QA_BACKEND = "tests.test_ai_query.CountingBackend"
+    CountingBackend.calls = []
+    CountingBackend.release = Event()
+    cache.clear()
+    yield CountingBackend
+    CountingBackend.release.set()
+    cache.clear()
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("What is a tort?", "what is a tort"),
+        ("  what IS a   tort ", "what is a tort"),
+        ("What is a tort?!", "what is a tort"),
+    ]
+)
+def test_normalize_question(query, expected):
+    assert normalize_question(query) == expected
+
+
+@pytest.mark.parametrize(
+    "budget, used",
+    [
+        (100, 0),
+        (300, 2),
+        (400, 3),
+        (5000, 3),
+    ]
+)
+def test_build_prompt_budget(budget, used):
+    prompt, passages = build_prompt("What is a tort?", PASSAGES, budget)
+
+    assert passages == PASSAGES[:used]
+    assert len(prompt) // 4 <= max(budget, 150)
+    assert "Question: What is a tort?" in prompt
+
+
+def test_get_citations():
+    citations = get_citations("Yes [2], unlike [1], [2] and [7].", PASSAGES)
+
+    assert [c["url"] for c in citations] == ["/content/2/", "/content/1/"]
+
+
+def test_answer_is_cached(backend):
+    backend.release.set()
+
+    answer = ai_query("What is a tort?", retrieve)
+    assert answer["answer"] == "It depends [2], see also [1] and [2]."
+    assert [c["number"] for c in answer["citations"]] == [2, 1]
+
+    assert ai_query("what is a TORT", retrieve) == answer
+    assert len(backend.calls) == 1
+
+
+def test_no_passages_no_call(backend):
+    answer = ai_query("What is a tort?", lambda question: [])
+
+    assert answer == {"answer": "Unknown", "citations": []}
+    assert backend.calls == []
+
+
+def test_concurrent_questions_share_one_call(backend):
+    answers = []
+    threads = [
+        Thread(target=lambda: answers.append(
+            ai_query("What is a tort?", retrieve)))
+        for _ in range(5)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    backend.release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(answers) == 5
+    assert len(backend.calls) == 1
+
+
+def test_timeout(backend, settings):
+    settings.QA_TIMEOUT = 0.05
+
+    with pytest.raises(QAError):
+        ai_query("What is a tort?", retrieve)
+
+
+@pytest.mark.django_db
+def test_same_question_joins_the_job():
+    cache.clear()
+
+    _, job = submit_qa("What is a tort?")
+    _, same = submit_qa("what is a  TORT")
+
+    assert same.pk == job.pk
+    assert Job.objects.filter(task=run_qa_job.name).count() == 1
+
+
+@pytest.mark.django_db
+def test_waiting_job_is_joined():
+    cache.clear()
+    _, job = submit_qa("What is a tort?")
+
+    # Long in a busy queue
+    QAJob.objects.update(created_at=timezone.now() - timedelta(hours=1))
+    _, same = submit_qa("What is a tort?")
+
+    assert same.pk == job.pk
+
+
+@pytest.mark.django_db
+def test_job_of_a_lost_worker_is_replaced():
+    cache.clear()
+    _, job = submit_qa("What is a tort?")
+    claim("lost")
+    Job.objects.update(lease_until=timezone.now() - timedelta(seconds=1))
+
+    _, new = submit_qa("What is a tort?")
+
+    assert new.pk != job.pk
+    job.refresh_from_db()
+    assert job.status == QAJob.FAILED
+    assert Job.objects.filter(status=Job.PENDING).count() == 1
+
+
+@pytest.mark.django_db
+def test_failed_qa_job(monkeypatch):
+    job = QAJob.objects.create(question="What is a tort?")
+    monkeypatch.setattr("Main.qa.make_qa", Mock(side_effect=ValueError))
+
+    with pytest.raises(ValueError):
+        run_qa_job(str(job.pk))
+
+    job.refresh_from_db()
+    assert job.status == QAJob.FAILED
+
+
+def cfr_node(number, page):
+    async def aget_html_content():
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+    return SimpleNamespace(
+        get_collection_name=lambda: "CFR",
+        get_title=lambda: f"§ {number}",
+        get_html_url=lambda: f"/CFR/{number}/html/",
+        label_description=f"Section {number}",
+        aget_html_content=aget_html_content,
+    )
+
+
+def test_cfr_passages_have_the_section_text(monkeypatch, settings):
+    settings.QA_PASSAGE_MAX_CHARS = 12
+    nodes = [
+        cfr_node(1, "<div><h4>§ 1</h4><p>Banks must report.</p></div>"),
+        cfr_node(2, ValueError("eCFR is down")),
+    ]
+    search = Mock(return_value=nodes)
+    monkeypatch.setattr("Main.qa.CFRNode.objects.full_text_search", search)
+
+    passages = get_cfr_passages("banks")
+
+    # Only the sections already loaded are searched
+    search.assert_called_once_with("banks", load=False)
+    assert [p["text"] for p in passages] == ["§ 1 Banks mu", "Section 2"]
+
+
+def test_answer_question_closes_all_connections(monkeypatch, backend):
+    backend.release.set()
+    close_all = Mock()
+    monkeypatch.setattr("utils.ai_query.connections.close_all", close_all)
+
+    answer_question("What is a tort?", retrieve)
+
+    close_all.assert_called_once_with()
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+from CFR.models import CFRNode
+from django.test import RequestFactory
+from Main.views import autocomplete, get_suggestions
+from USCODE.models import Node
+import json
+import pytest
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"search": ""},
+        {"search": " a  "},
+        {"search": "ab"},
+        {"search": "civil rights", "collection": "QA"},
+    ]
+)
+def test_autocomplete_skips_short_terms(params):
+    request = RequestFactory().get("/autocomplete/", params)
+
+    response = autocomplete(request)
+
+    assert response.status_code == 200
+    assert json.loads(response.content) == {"results": []}
+
+
+def suggested(title, prefix):
+    return SimpleNamespace(title=title, prefix=prefix, length=len(title))
+
+
+def test_sources_are_merged_in_rank_order(monkeypatch, settings):
+    settings.AUTOCOMPLETE_MAX_RESULTS = 3
+    usc = [suggested("Banks", True), suggested("Bankruptcy rules", True),
+           suggested("Central banks", False)]
+    cfr = [suggested("Banking", True), suggested("Federal banks", False)]
+
+    monkeypatch.setattr(
+        Node.objects, "autocomplete", lambda term, limit: iter(usc))
+    monkeypatch.setattr(
+        CFRNode.objects, "autocomplete", lambda term, limit: iter(cfr))
+    monkeypatch.setattr(
+        "Main.views.get_suggestion", lambda node: node.title)
+
+    assert get_suggestions("bank", "") == [
+        "Banks", "Banking", "Bankruptcy rules"]
+
+
+@pytest.mark.django_db
+def test_prefix_matches_are_not_cut_by_the_limit(settings):
+    settings.AUTOCOMPLETE_MAX_RESULTS = 2
+    for i in range(5):
+        CFRNode.objects.create(
+            identifier=str(i), node_type="part", label=f"Part {i}",
+            label_description=f"Rules for national banks {i}")
+    CFRNode.objects.create(
+        identifier="99", node_type="part", label="Part 99",
+        label_description="Banks and banking")
+
+    nodes = list(CFRNode.objects.autocomplete("bank", 2))
+
+    assert nodes[0].label_description == "Banks and banking"
+    assert nodes[0].prefix
@@ -0,0 +1,46 @@
+from utils.citation import parse_citation
+import pytest
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("42 USC 1983", ("USCODE", 42, "1983", None, (), False)),
+        ("42 U.S.C. § 1983", ("USCODE", 42, "1983", None, (), False)),
+        ("42 U.S.C. §1983(a)(1)",
+         ("USCODE", 42, "1983", None, ("a", "1"), False)),
+        ("42  u.s.c.\xa0§ 1983", ("USCODE", 42, "1983", None, (), False)),
+        ("42 USCA § 1983", ("USCODE", 42, "1983", None, (), False)),
+        ("42 U.S.C. 1983 et seq.", ("USCODE", 42, "1983", None, (), False)),
+        ("42 U.S.C. §§ 1981-1983",
+         ("USCODE", 42, "1981", "1983", (), False)),
+        ("42 USC 1981 to 1983", ("USCODE", 42, "1981", "1983", (), False)),
+        ("26 U.S. Code § 1400Z-2",
+         ("USCODE", 26, "1400Z-2", None, (), False)),
+        ("26 U.S.C. §§ 1400Z-2", ("USCODE", 26, "1400Z-2", None, (), False)),
+        ("40 CFR 60.1", ("CFR", 40, "60.1", None, (), False)),
+        ("40 C.F.R. § 60.5(b)(2)",
+         ("CFR", 40, "60.5", None, ("b", "2"), False)),
+        ("40 C.F.R. Part 60", ("CFR", 40, "60", None, (), True)),
+        ("40 cfr 60", ("CFR", 40, "60", None, (), True)),
+        ("40 CFR §§ 60.1-60.5", ("CFR", 40, "60.1", "60.5", (), False)),
+        ("26 CFR 1.401(a)-1", ("CFR", 26, "1.401(a)-1", None, (), False)),
+    ]
+)
+def test_parse_citation(query, expected):
+    assert tuple(parse_citation(query)) == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "",
+        None,
+        "1983",
+        "civil rights 1983",
+        "42 USC",
+        "how to get custody of your child?",
+    ]
+)
+def test_not_a_citation(query):
+    assert parse_citation(query) is None
@@ -0,0 +1,70 @@
+from USCODE.forms import SearchForm
+from USCODE.models import Collection, Node
+import pytest
+
+
+class YearNode:
+    """A node of a year with 54 titles"""
+
+    def get_root_node(self):
+        return Node(root_node=True, title="2022", child_count=54)
+
+
+@pytest.mark.parametrize(
+    "title, valid",
+    [(1, True), (54, True), (55, False)]
+)
+def test_title_range_is_a_column_read(title, valid):
+    form = SearchForm({"title": title, "section": "1983"})
+    form.node = YearNode()
+
+    # Without the django_db mark any query would raise
+    assert form.is_valid() == valid
+
+
+@pytest.mark.parametrize(
+    "node_type, section, expected",
+    [
+        ("leaf", "LEAF", True),
+        ("leaf", "TOC", False),
+        ("leaf", "FRONTMATTER", False),
+        ("node", "TOPPARENT", False),
+    ]
+)
+def test_is_section(node_type, section, expected):
+    assert Node(node_type=node_type, section=section).is_section() == expected
+
+
+@pytest.fixture
+def title(settings):
+    """A title whose sections were loaded by another request"""
+    collection = Collection.objects.create(code=settings.USCODE)
+    common = {"collection_code": collection, "selected_year_from": 2022}
+
+    title = Node.objects.create(
+        collection=collection, root_node=False, title="Title 42",
+        title_number=42, node_key="title42", level=1, node_type="node",
+        **common)
+    for number in ("1981", "1983"):
+        Node.objects.create(
+            parent=title, root_node=False, title=f"Sec. {number}",
+            title_number=42, node_key=f"sec{number}", level=2,
+            node_type="leaf", section="LEAF", leaf_number_from=number,
+            leaf_number_to=number, **common)
+    return title
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("counts", [
+    {"child_count": 2, "leaf_count": 2},
+    # Stored before the counts, the first child tells
+    {"child_count": 0, "leaf_count": 0},
+])
+def test_drill_down_with_stale_counts(title, counts):
+    Node.objects.filter(pk=title.pk).update(**counts)
+
+    # This instance read the counts before the sections were loaded
+    section = title.drill_down_to_section_leaf("1983")
+
+    assert section is not None
+    assert section.leaf_number_from == "1983"
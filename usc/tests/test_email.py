@@ -0,0 +1,19 @@
+from unittest.mock import Mock
+
+import pytest
+from utils import general
+
+
+@pytest.mark.parametrize("status, sent", [
+    (202, True),
+    (400, False),
+    (503, False),
+])
+def test_send_email_status(monkeypatch, settings, status, sent):
+    settings.PRINT_LOG = False
+    settings.OFF_EMAIL = False
+    response = Mock(status_code=status, ok=status < 400, text="")
+    monkeypatch.setattr(general.requests, "post", Mock(return_value=response))
+
+    assert general.send_email("reader@example.com", "Verify", "<p>Link</p>") \
+        is sent
@@ -0,0 +1,84 @@
+import pytest
+from django.conf import settings
+from Main.jobs import JobDeferred
+from Main.models import Job
+from Main.tasks import publish_ingest
+from USCODE import tasks
+from USCODE.models import Collection, Node
+
+CHILD_NODES = {
+    "childNodes": [
+        {"nodeValue": {
+            "title": "Chapter 1", "heading": "Chapter 1", "nodetype": "node",
+            "browsePathAlias": "2022/title42/chap1", "level": 2}},
+        {"nodeValue": {
+            "title": "Sec. 1", "heading": "Sec. 1", "nodetype": "leaf",
+            "section": "LEAF", "level": 2,
+            "htmlfile": "USCODE-2022-title42/html/1.htm"}},
+    ]
+}
+
+
+@pytest.fixture
+def title(monkeypatch):
+    monkeypatch.setattr(
+        "USCODE.models.get_collection_name", lambda code: "United States Code")
+    collection = Collection.objects.create(code="USCODE")
+    common = {"collection_code": collection, "selected_year_from": 2022}
+
+    year = Node.objects.create(
+        collection=collection, root_node=True, title="2022", node_key="2022",
+        level=0, node_type="node", **common)
+    return Node.objects.create(
+        parent=year, root_node=False, title="Title 42", title_number=42,
+        node_key="title42", level=1, node_type="node",
+        browse_path_alias="2022/title42", **common)
+
+
+@pytest.mark.django_db
+def test_ingest_node(monkeypatch, title):
+    texts = []
+    monkeypatch.setattr(
+        "USCODE.models.request_data", lambda url: CHILD_NODES)
+    monkeypatch.setattr(
+        "USCODE.models.get_content_text",
+        lambda url: texts.append(url) or "Sec. 1 text")
+
+    tasks.ingest_node(title.pk, 2022)
+
+    # The text of the section is a job of its own
+    assert not texts
+    queued = dict(Job.objects.values_list("key", "task"))
+    chapter, section = title.get_children().order_by("title")
+    assert queued == {
+        f"uscode-ingest:{chapter.pk}": tasks.ingest_node.name,
+        f"uscode-section:{section.pk}": tasks.ingest_section.name,
+    }
+
+    tasks.ingest_section(section.pk, 2022)
+    assert Node.objects.get(pk=section.pk).body.text == "Sec. 1 text"
+
+    # A reload keeps the text
+    tasks.ingest_node(title.pk, 2022)
+    assert Node.objects.get(pk=section.pk).body.text == "Sec. 1 text"
+
+
+def test_publish_waits_for_the_ingestion(monkeypatch):
+    monkeypatch.setattr("Main.tasks.is_busy", lambda names: True)
+
+    with pytest.raises(JobDeferred):
+        publish_ingest(settings.USCODE)
+
+
+def test_publish(monkeypatch):
+    built = []
+    monkeypatch.setattr("Main.tasks.is_busy", lambda names: False)
+    monkeypatch.setattr(
+        "Main.tasks.build_toc",
+        lambda collection: built.append(collection) or [])
+    monkeypatch.setattr(
+        "Main.tasks.build_index", lambda: built.append("semantic") or [])
+
+    publish_ingest(settings.CFR)
+
+    assert built == [settings.CFR, "semantic"]
@@ -0,0 +1,183 @@
+from datetime import timedelta
+
+import pytest
+from account.models import User
+from account.tasks import send_user_email, send_verification_email
+from django.utils import timezone
+from Main import jobs
+from Main.jobs import (HIGH, LOW, JobDeferred, JobError, claim,
+                       extend_leases, finish, reclaim, run, task)
+from Main.models import Job
+
+calls = []
+
+
+@task(max_attempts=2)
+def flaky(fail: bool):
+    calls.append(fail)
+    if fail:
+        raise JobError("upstream is down")
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    calls.clear()
+
+
+def test_registered():
+    assert jobs.tasks["tests.test_jobs.flaky"] is flaky
+    assert "account.tasks.send_user_email" in jobs.tasks
+
+
+def test_inline(settings):
+    settings.JOBS_INLINE = True
+
+    flaky.enqueue(fail=False)
+
+    assert calls == [False]
+
+
+def test_retry_delay(settings):
+    settings.JOBS_RETRY_DELAY = 10
+    settings.JOBS_MAX_RETRY_DELAY = 60
+
+    assert [jobs.get_retry_delay(n) for n in (1, 2, 3, 4)] == [10, 20, 40, 60]
+
+
+@pytest.mark.parametrize("attempts, status", [
+    (1, Job.PENDING),
+    (2, Job.FAILED),
+])
+def test_run_failed(monkeypatch, attempts, status):
+    monkeypatch.setattr(jobs, "finish", lambda job: True)
+    job = flaky.build({"fail": True})
+    job.attempts = attempts
+
+    run(job)
+
+    assert job.status == status
+    assert "upstream is down" in job.error
+
+
+@task()
+def waiting():
+    raise JobDeferred(30)
+
+
+def test_run_deferred(monkeypatch):
+    monkeypatch.setattr(jobs, "finish", lambda job: True)
+    job = waiting.build({})
+    job.attempts = 3
+
+    run(job)
+
+    # Waiting doesn't use up the attempts
+    assert job.status == Job.PENDING
+    assert job.max_attempts == 4
+
+
+def test_run_unknown_task(monkeypatch):
+    monkeypatch.setattr(jobs, "finish", lambda job: True)
+    job = Job(task="gone", attempts=1)
+
+    run(job)
+
+    assert job.status == Job.FAILED
+
+
+@pytest.mark.django_db
+def test_claim_order():
+    flaky.enqueue(fail=False, priority=LOW)
+    flaky.enqueue(fail=False, priority=HIGH)
+    flaky.enqueue(fail=False, delay=60)
+
+    first, second = claim("test", 3)
+
+    assert (first.priority, second.priority) == (HIGH, LOW)
+    assert first.attempts == 1
+    assert not claim("test")
+    assert Job.objects.get(pk=first.pk).status == Job.RUNNING
+
+
+@pytest.mark.django_db
+def test_key_queues_once():
+    flaky.enqueue_many(
+        [{"fail": False}, {"fail": False}], key=lambda kwargs: "same")
+    flaky.enqueue(key="same", fail=False)
+
+    job, = claim("test", 3)
+    run(job)
+
+    # A done job doesn't keep the key
+    flaky.enqueue(key="same", fail=False)
+    assert Job.objects.filter(status=Job.PENDING).count() == 1
+
+
+@pytest.mark.django_db
+def test_key_of_a_running_job():
+    queued = flaky.enqueue(key="same", fail=False)
+    running, = claim("test")
+
+    again = flaky.enqueue(key="same", fail=False)
+
+    assert again.pk == queued.pk == running.pk
+    assert again.status == Job.RUNNING
+    assert Job.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_email_user_queued():
+    user = User.objects.create_user("reader@example.com", "password")
+
+    user.email_user("Verify", "<p>Link</p>")
+
+    job = Job.objects.get()
+    assert job.task == send_user_email.name
+    assert job.kwargs["email"] == "reader@example.com"
+
+
+@pytest.mark.django_db
+def test_verification_queued_without_token(rf):
+    user = User.objects.create_user("reader@example.com", "password")
+
+    user.email_verification(
+        rf.get("/"), "Verify", "account/email/activation_email.html")
+
+    # The link is made by the worker, staff reading the job can't use it
+    job = Job.objects.get()
+    assert job.task == send_verification_email.name
+    assert job.kwargs == {
+        "user_id": user.pk,
+        "subject": "Verify",
+        "template": "account/email/activation_email.html",
+        "site": {"domain": "testserver", "protocol": "http"},
+    }
+
+
+@pytest.mark.django_db
+def test_expired_lease():
+    flaky.enqueue(fail=False)
+    job, = claim("lost")
+    Job.objects.update(lease_until=timezone.now() - timedelta(seconds=1))
+
+    assert reclaim() == 1
+    taken, = claim("alive")
+    assert taken.attempts == 2
+
+    # The lost worker comes back, its result is dropped
+    job.status = Job.DONE
+    assert not finish(job)
+    assert extend_leases([job]) == 0
+    assert extend_leases([taken]) == 1
+    assert Job.objects.get().worker == "alive"
+
+
+@pytest.mark.django_db
+def test_expired_last_attempt():
+    flaky.enqueue(fail=False)
+    Job.objects.update(
+        status=Job.RUNNING, attempts=2,
+        lease_until=timezone.now() - timedelta(seconds=1))
+
+    assert reclaim() == 0
+    assert Job.objects.get().status == Job.FAILED
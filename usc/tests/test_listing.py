@@ -0,0 +1,87 @@
+import pytest
+from django.db import connection
+from django.urls import reverse
+from USCODE.models import Collection, Node
+
+YEARS = 5
+
+
+def get_columns(queryset):
+    sql = str(queryset.query)
+    return sql[:sql.index(" FROM ")]
+
+
+def test_child_listing_skips_content():
+    node = Node(id=1, node_type='node')
+
+    columns = get_columns(node.node_set.listing())
+
+    assert '"uscode_node"."content"' not in columns
+    assert '"uscode_node"."vector_column"' not in columns
+    for field in ('slug_id', 'title', 'heading', 'htmlfile', 'pdffile'):
+        assert f'"uscode_node"."{field}"' in columns
+
+
+def test_collection_listing_skips_content():
+    collection = Collection(id=1, code='USCODE')
+
+    columns = get_columns(collection.node_set.listing())
+
+    assert '"uscode_node"."content"' not in columns
+
+
+def test_listing_fields_exist():
+    names = {field.name for field in Node._meta.get_fields()}
+
+    assert set(Node.LISTING_FIELDS) <= names
+    assert 'content' not in Node.LISTING_FIELDS
+
+
+def test_emptiness_check_fetches_one_row():
+    node = Node(id=1, node_type='node')
+    query = node.node_set.listing().query.exists(using=connection.alias)
+
+    sql = str(query)
+
+    assert "LIMIT 1" in sql
+    assert '"uscode_node"."content"' not in sql
+
+
+def test_child_listing_stays_in_the_year_partition():
+    node = Node(id=1, node_type='node', selected_year_from=2022)
+
+    sql = str(node.get_children().query)
+
+    assert '"uscode_node"."selected_year_from" = 2022' in sql
+
+
+@pytest.fixture
+def years(monkeypatch, settings, tmp_path):
+    """Year nodes of the collection, listed from the database as no
+    snapshot was built"""
+    settings.TOC_SNAPSHOT_DIR = tmp_path
+    monkeypatch.setattr(
+        "USCODE.models.get_collection_name", lambda code: "United States Code")
+
+    collection = Collection.objects.create(code=settings.USCODE)
+    for year in range(2018, 2018 + YEARS):
+        Node.objects.create(
+            collection=collection, collection_code=collection,
+            selected_year_from=year, root_node=True, title=str(year),
+            node_key=str(year), level=0, node_type="node", child_count=1)
+
+
+@pytest.mark.django_db
+def test_collection_listing_queries(client, years, django_assert_num_queries):
+    # The collection, the emptiness check and the listing, whatever the
+    # number of years
+    with django_assert_num_queries(3):
+        response = client.get(reverse("USCODE:collection"))
+
+    assert response.status_code == 200
+    nodes = list(response.context["nodes"])
+    assert len(nodes) == YEARS
+    for node in nodes:
+        deferred = node.get_deferred_fields()
+        assert "body_id" in deferred
+        assert "vector_column" in deferred
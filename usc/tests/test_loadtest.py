@@ -0,0 +1,60 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from utils.loadtest import Endpoint, LoadTest, Result, parse_mix
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(500 if self.path == "/broken/" else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_parse_mix():
+    assert parse_mix("node=4, leaf=0.5,search") == {
+        "node": 4.0, "leaf": 0.5, "search": 1.0,
+    }
+
+
+def test_percentiles():
+    result = Result("node")
+    result.latencies = [i / 1000 for i in range(1, 101)]
+    result.errors = 5
+
+    percentiles = result.get_percentiles()
+    assert percentiles[50] == pytest.approx(50.5)
+    assert percentiles[99] == pytest.approx(99.01)
+    assert result.get_error_rate() == 0.05
+
+
+def test_load_test(site):
+    test = LoadTest(site, [
+        Endpoint("node", 3, ["/view/a/", "/view/b/"]),
+        Endpoint("broken", 1, ["/broken/"]),
+        Endpoint("empty", 1, []),
+    ], rps=200, duration=0.5, workers=4, seed=1)
+
+    results = test.run()
+
+    assert set(results) == {"node", "broken"}
+    assert results["node"].count + results["broken"].count == 100
+    assert results["node"].count > results["broken"].count
+    assert results["node"].errors == 0
+    assert results["broken"].get_error_rate() == 1
+
+    report = test.get_report().splitlines()
+    assert report[0].split()[:2] == ["endpoint", "requests"]
+    assert report[2].startswith("broken")
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import sys
+from threading import Event
+
+import pytest
+from utils.logger import AsyncFileHandler, JsonFormatter
+
+
+@pytest.fixture
+def test_logger():
+    test_logger = logging.getLogger("basic.test")
+    test_logger.propagate = False
+    yield test_logger
+    test_logger.handlers.clear()
+    test_logger.propagate = True
+
+
+def get_record(message, *args, **kwargs):
+    return logging.LogRecord(
+        "basic.ingest", logging.INFO, __file__, 1, message, args, None,
+        **kwargs)
+
+
+def test_json_formatter():
+    record = get_record("Added %s nodes", 3)
+    record.duration_ms = 12.5
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["level"] == "INFO"
+    assert data["logger"] == "basic.ingest"
+    assert data["message"] == "Added 3 nodes"
+    assert data["duration_ms"] == 12.5
+    assert "args" not in data
+
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError("no title")
+    except ValueError:
+        record = logging.LogRecord(
+            "basic.error", logging.ERROR, __file__, 1, "Failed", None,
+            sys.exc_info())
+
+    data = json.loads(JsonFormatter().format(record))
+    assert "ValueError: no title" in data["exception"]
+
+
+def test_async_handler(tmp_path, test_logger):
+    path = tmp_path / "debug.log"
+    handler = AsyncFileHandler(path)
+    handler.setFormatter(JsonFormatter())
+    test_logger.addHandler(handler)
+
+    nodes = ["Title 1"]
+    test_logger.info("Adding %s", nodes, extra={"count": 1})
+    # Formatted when logged, not when written
+    nodes.append("Title 2")
+    handler.close()
+
+    data, = [json.loads(line) for line in path.read_text().splitlines()]
+    assert data["message"] == "Adding ['Title 1']"
+    assert data["count"] == 1
+
+
+def test_async_handler_full(tmp_path, test_logger):
+    written = Event()
+
+    class Blocked(logging.Handler):
+        def handle(self, record):
+            written.wait()
+
+    handler = AsyncFileHandler(tmp_path / "debug.log", queue_size=2)
+    handler.target = Blocked()
+    test_logger.addHandler(handler)
+
+    for i in range(10):
+        test_logger.warning("Node %s", i)
+
+    # The listener holds one record and the queue two, logging didn't wait
+    assert handler.dropped >= 7
+    written.set()
+    handler.close()
+
+
+def test_async_handler_flush(tmp_path, test_logger):
+    path = tmp_path / "debug.log"
+    handler = AsyncFileHandler(path)
+    test_logger.addHandler(handler)
+
+    test_logger.info("Title 1")
+    thread = handler.listener._thread
+    handler.flush()
+
+    # Written by the same thread, still running
+    assert path.read_text() == "Title 1\n"
+    assert handler.listener._thread is thread and thread.is_alive()
+    handler.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="no fork")
+def test_async_handler_forked(tmp_path, test_logger):
+    path = tmp_path / "debug.log"
+    handler = AsyncFileHandler(path)
+    test_logger.addHandler(handler)
+    test_logger.info("Parent")
+    handler.flush()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # The parent's thread isn't running here
+            test_logger.info("Worker")
+            handler.flush()
+        finally:
+            os._exit(0)
+
+    os.waitpid(pid, 0)
+    handler.close()
+    assert path.read_text().splitlines() == ["Parent", "Worker"]
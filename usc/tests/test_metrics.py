@@ -0,0 +1,175 @@
+import json
+import os
+from time import time
+
+import pytest
+from django.http import Http404
+from django.test import RequestFactory
+from Main.views import metrics
+from requests.exceptions import ConnectionError
+from utils import data, metrics as usc_metrics
+from utils.metrics import Counter, Histogram, get_process_id, registry
+
+
+@pytest.fixture
+def isolated():
+    """Metrics made by a test don't stay in the registry"""
+    before = list(registry)
+    yield
+    registry[:] = before
+
+
+def test_counter(isolated):
+    counter = Counter("test_total", "Test", ["view"])
+    counter.inc(view='say "hi"')
+    counter.inc(2, view='say "hi"')
+
+    assert counter.render().splitlines() == [
+        "# HELP test_total Test",
+        "# TYPE test_total counter",
+        'test_total{view="say \\"hi\\""} 3',
+    ]
+
+
+def test_histogram(isolated):
+    histogram = Histogram(
+        "test_seconds", "Test", ["source"], buckets=(.1, 1))
+    histogram.observe(.1, source="USCODE")
+    histogram.observe(.5, source="USCODE")
+    histogram.observe(3, source="USCODE")
+
+    assert histogram.render().splitlines()[2:] == [
+        'test_seconds_bucket{source="USCODE",le="0.1"} 1',
+        'test_seconds_bucket{source="USCODE",le="1"} 2',
+        'test_seconds_bucket{source="USCODE",le="+Inf"} 3',
+        'test_seconds_count{source="USCODE"} 3',
+        'test_seconds_sum{source="USCODE"} 3.6',
+    ]
+
+
+def test_retries(monkeypatch):
+    monkeypatch.setattr(data, "sleep", lambda seconds: None)
+    retries = usc_metrics.UPSTREAM_RETRIES
+    failures = usc_metrics.UPSTREAM_FAILURES
+    calls = []
+
+    @data.retry_request_decorator
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError()
+        return "ok"
+
+    @data.retry_request_decorator
+    def down():
+        raise ConnectionError()
+
+    assert flaky() == "ok"
+    with pytest.raises(ConnectionError):
+        down()
+
+    assert retries.values[("flaky",)] == 2
+    assert retries.values[("down",)] == 10
+    assert failures.values[("down",)] == 1
+    assert sum(usc_metrics.UPSTREAM_SECONDS.values[("flaky",)][:-1]) == 1
+
+
+@pytest.mark.parametrize("authorization, allowed", [
+    ("Bearer secret", True),
+    ("Bearer guess", False),
+    ("", False),
+])
+def test_metrics_view(settings, authorization, allowed):
+    settings.METRICS_TOKEN = "secret"
+    settings.METRICS_DIR = ""
+    request = RequestFactory().get(
+        "/metrics", HTTP_AUTHORIZATION=authorization)
+
+    if not allowed:
+        with pytest.raises(Http404):
+            metrics(request)
+        return
+
+    response = metrics(request)
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b"# TYPE usc_upstream_seconds histogram" in response.content
+
+
+def test_metrics_off_without_token(settings):
+    settings.METRICS_TOKEN = ""
+    request = RequestFactory().get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+
+    with pytest.raises(Http404):
+        metrics(request)
+
+
+def test_processes_add_up(isolated, tmp_path):
+    counter = Counter("test_total", "Test", ["view"])
+    histogram = Histogram("test_seconds", "Test", buckets=(1,))
+    counter.inc(2, view="index")
+    histogram.observe(.5)
+
+    # What another worker saved
+    (tmp_path / "worker-999999-a.json").write_text(json.dumps({
+        "test_total": [[["index"], 3], [["search"], 1]],
+        "test_seconds": [[[], [0, 1, 2.0]]],
+    }))
+
+    lines = usc_metrics.render(tmp_path).splitlines()
+
+    assert 'test_total{view="index"} 5' in lines
+    assert 'test_total{view="search"} 1' in lines
+    assert 'test_seconds_count 2' in lines
+    assert 'test_seconds_sum 2.5' in lines
+    assert (tmp_path / f"worker-{get_process_id()}.json").exists()
+
+
+def test_reused_pid_gets_its_own_file(monkeypatch):
+    first = get_process_id()
+    assert get_process_id() == first
+
+    # A forked worker, then one given the pid of a stopped one
+    monkeypatch.setattr(os, "getpid", lambda: 999999)
+    second = get_process_id()
+    monkeypatch.setitem(usc_metrics.process, "pid", None)
+
+    assert second.startswith("999999-")
+    assert len({first, second, get_process_id()}) == 3
+
+
+def save_worker(directory, name, total, age=0):
+    path = directory / f"worker-{name}.json"
+    path.write_text(json.dumps({"test_total": [[["index"], total]]}))
+    os.utime(path, (time() - age, time() - age))
+    return path
+
+
+def test_stopped_workers_are_retired(isolated, tmp_path):
+    Counter("test_total", "Test", ["view"])
+    stopped = save_worker(tmp_path, "1-a", 3, age=600)
+    save_worker(tmp_path, "2-b", 4)
+
+    for _ in range(2):
+        lines = usc_metrics.render(tmp_path, 300).splitlines()
+        assert 'test_total{view="index"} 7' in lines
+
+    assert not stopped.exists()
+    retired = json.loads((tmp_path / "retired.json").read_text())
+    assert retired["metrics"] == {"test_total": [[["index"], 3]]}
+
+
+def test_retired_worker_is_added_once(isolated, tmp_path):
+    Counter("test_total", "Test", ["view"])
+    # Retired by a scrape that stopped before removing the file
+    save_worker(tmp_path, "1-a", 3, age=600)
+    (tmp_path / "retired.json").write_text(json.dumps({
+        "metrics": {"test_total": [[["index"], 3]]},
+        "workers": ["worker-1-a.json"],
+    }))
+
+    for _ in range(2):
+        lines = usc_metrics.render(tmp_path, 300).splitlines()
+        assert 'test_total{view="index"} 3' in lines
+
+    assert json.loads(
+        (tmp_path / "retired.json").read_text())["workers"] == []
@@ -0,0 +1,13 @@
+import pytest
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@pytest.mark.parametrize("path", settings.MIDDLEWARE)
+def test_middleware_runs_async(path):
+    # One sync only middleware has Django run every request in a thread
+    # under ASGI, the async views included
+    middleware = import_string(path)
+
+    assert middleware.async_capable
+    assert middleware.sync_capable
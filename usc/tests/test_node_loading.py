@@ -0,0 +1,86 @@
+from unittest.mock import Mock
+
+from CFR.models import CFRNode
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from Main.middleware import NodeLoadingMiddleware
+from USCODE.models import Node
+from utils.locks import NodeLoading, single_flight
+import pytest
+
+
+@pytest.fixture
+def middleware():
+    return NodeLoadingMiddleware(lambda request: HttpResponse())
+
+
+def test_loading_page(middleware, settings):
+    settings.NODE_LOAD_RETRY_AFTER = 3
+    request = RequestFactory().get("/uscode/node/title-1/")
+
+    response = middleware.process_exception(
+        request, NodeLoading("uscode-node:1"))
+
+    assert response.status_code == 503
+    assert response["Retry-After"] == "3"
+    assert b'http-equiv="refresh" content="3"' in response.content
+
+
+def test_other_errors_pass_through(middleware):
+    request = RequestFactory().get("/uscode/node/title-1/")
+
+    assert middleware.process_exception(request, ValueError()) is None
+
+
+@pytest.mark.parametrize(
+    "fields, expected",
+    [
+        ({"root_node": True, "title": "2022"}, "2022"),
+        ({"granule_id": "USCODE-2022-title42", "title": "Title 42"},
+         "USCODE-2022-title42"),
+        ({"browse_path_alias": "2022/title42/chap21", "title": "Chapter 21"},
+         "2022/title42/chap21"),
+        ({"title": "Front Matter"}, "Front Matter"),
+    ]
+)
+def test_node_key(fields, expected):
+    node = Node(**{"root_node": False, **fields})
+
+    assert node.get_node_key() == expected
+
+
+def count_advisory_locks() -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+            "AND pid = pg_backend_pid()")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_releases_its_lock():
+    with single_flight("uscode-node:1"):
+        assert count_advisory_locks() == 1
+
+    assert count_advisory_locks() == 0
+
+
+@pytest.mark.django_db
+def test_nested_loads_hold_their_locks_until_the_commit():
+    # Others would not see the children before the outer commit
+    with transaction.atomic():
+        for key in ("uscode-node:1", "uscode-node:2"):
+            with single_flight(key):
+                pass
+
+        assert count_advisory_locks() == 2
+
+
+def test_leaves_load_nothing(monkeypatch):
+    monkeypatch.setattr(
+        "CFR.models.single_flight", Mock(side_effect=AssertionError))
+
+    # Without database access, any query would fail the test
+    for node_type in ("section", "appendix"):
+        CFRNode(pk=1, node_type=node_type).get_child_nodes()
@@ -0,0 +1,86 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from USCODE.models import PARTITION_BOUND, Collection, Node
+import pytest
+
+
+def test_partition_name():
+    assert Node.objects.get_partition_name("2022") == "uscode_node_y2022"
+
+
+@pytest.mark.parametrize(
+    "bound",
+    ["FOR VALUES IN (2022)", "FOR VALUES IN ('2022')"]
+)
+def test_partition_bound(bound):
+    assert PARTITION_BOUND.search(bound).group(1) == "2022"
+
+
+@pytest.fixture
+def partitioned():
+    """The node table partitioned by year like the migrations leave it,
+    the test database is built without them. The transaction of the
+    test undoes it"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            ALTER TABLE uscode_node RENAME TO uscode_node_plain;
+
+            CREATE TABLE uscode_node (
+                LIKE uscode_node_plain INCLUDING DEFAULTS
+            ) PARTITION BY LIST (selected_year_from);
+        """)
+
+
+def get_tables() -> list:
+    return connection.introspection.table_names()
+
+
+@pytest.mark.django_db
+def test_plain_table_is_left_alone(monkeypatch, settings):
+    monkeypatch.setattr(
+        "USCODE.models.get_collection_name", lambda code: "United States Code")
+    collection = Collection.objects.create(code=settings.USCODE)
+
+    assert not Node.objects.is_partitioned()
+    assert not Node.objects.ensure_partition(2022)
+
+    collection.add_child_node({
+        "title": "2022", "level": 0, "browsePath": "2022", "nodetype": "node",
+    })
+
+    assert Node.objects.filter(selected_year_from=2022).count() == 1
+    assert Node.objects.get_partitions() == []
+    with pytest.raises(CommandError):
+        call_command("year_partitions", attach=2022)
+
+
+@pytest.mark.django_db
+def test_attach_and_detach(partitioned):
+    assert Node.objects.is_partitioned()
+    assert Node.objects.ensure_partition(2021)
+    assert Node.objects.ensure_partition(2022)
+    assert not Node.objects.ensure_partition(2022)
+
+    years = [year for year, *_ in Node.objects.get_partitions()]
+    assert years == [2021, 2022]
+
+    # Kept as an archive
+    Node.objects.detach_partition(2021)
+    assert [year for year, *_ in Node.objects.get_partitions()] == [2022]
+    assert "uscode_node_y2021" in get_tables()
+
+    Node.objects.detach_partition(2022, drop=True)
+    assert Node.objects.get_partitions() == []
+    assert "uscode_node_y2022" not in get_tables()
+
+
+@pytest.mark.django_db
+def test_year_filter_reads_one_partition(partitioned):
+    for year in (2021, 2022):
+        Node.objects.ensure_partition(year)
+
+    plan = Node.objects.filter(selected_year_from=2022, title="x").explain()
+
+    assert "uscode_node_y2022" in plan
+    assert "uscode_node_y2021" not in plan
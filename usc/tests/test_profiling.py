@@ -0,0 +1,119 @@
+import json
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory
+from Main.middleware import ProfilingMiddleware
+from Main.views import profile
+from utils.profiling import CPROFILE, Profiler, StackSampler
+from utils.timing import collect_stats, record_upstream
+
+STAFF = SimpleNamespace(is_staff=True)
+VISITOR = SimpleNamespace(is_staff=False)
+
+
+def busy_loop(seconds: float):
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        pass
+
+
+def slow_view(request):
+    busy_loop(0.05)
+    record_upstream(0.01, "https://www.ecfr.gov/api/versioner/v1/titles")
+    return HttpResponse("page")
+
+
+@pytest.fixture
+def profile_dir(settings, tmp_path):
+    settings.PROFILE_DIR = tmp_path
+    return tmp_path
+
+
+def get_request(user, **params):
+    request = RequestFactory().get("/search/", params)
+    request.user = user
+    return request
+
+
+def test_sampler():
+    with StackSampler(interval=0.001) as sampler:
+        busy_loop(0.05)
+
+    folded = sampler.get_folded()
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert stack.split(";")[-1].startswith("busy_loop (")
+    assert int(count) > 5
+
+
+def test_cprofile(tmp_path):
+    with Profiler(CPROFILE) as profiler:
+        busy_loop(0.01)
+
+    path = profiler.save(tmp_path / "request")
+    assert path.endswith(".prof")
+
+
+@pytest.mark.parametrize("user, params", [
+    (VISITOR, {"_profile": "sample"}),
+    (STAFF, {}),
+])
+def test_not_profiled(profile_dir, user, params):
+    middleware = ProfilingMiddleware(slow_view)
+
+    response = middleware(get_request(user, **params))
+
+    assert not response.has_header("X-Profile")
+    assert not list(profile_dir.iterdir())
+
+
+def test_async_profiled(profile_dir):
+    async def view(request):
+        return slow_view(request)
+
+    middleware = ProfilingMiddleware(view)
+
+    response = async_to_sync(middleware)(
+        get_request(STAFF, _profile="sample"))
+
+    assert response.content == b"page"
+    assert response.has_header("X-Profile")
+
+
+def test_profiled(profile_dir):
+    middleware = ProfilingMiddleware(slow_view)
+
+    with collect_stats():
+        response = middleware(get_request(STAFF, _profile="sample"))
+
+    assert response.content == b"page"
+    profile_name = response["X-Profile"].rsplit("/", 1)[-1]
+    timeline_name = response["X-Profile-Timeline"].rsplit("/", 1)[-1]
+
+    assert "busy_loop" in (profile_dir / profile_name).read_text()
+
+    timeline = json.loads((profile_dir / timeline_name).read_text())
+    assert timeline["path"] == "/search/?_profile=sample"
+    assert timeline["upstream_calls"] == 1
+    assert [event["kind"] for event in timeline["timeline"]] == ["upstream"]
+
+    download = profile(get_request(STAFF), profile_name)
+    assert b"busy_loop" in b"".join(download.streaming_content)
+
+    for user, name in ((VISITOR, profile_name), (STAFF, "../settings.py")):
+        with pytest.raises(Http404):
+            profile(get_request(user), name)
+
+
+def test_timeline_offsets():
+    with collect_stats() as stats:
+        stats.timeline = []
+        sleep(0.01)
+        record_upstream(0.005, "https://api.govinfo.gov/collections")
+
+    event, = stats.timeline
+    assert event["start"] >= 5
+    assert event["duration"] == 5
@@ -0,0 +1,318 @@
+import asyncio
+from threading import Thread
+from unittest.mock import Mock
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync
+from CFR.models import CFRNode, CFRNodeManager
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from Main.middleware import RequestStatsMiddleware
+from USCODE.models import Collection, Node
+from utils import data
+from utils.timing import (QueryTimer, RequestStats, collect_stats,
+                          record_upstream, track)
+
+SECTIONS = 20
+
+
+class FakeResponse:
+    status_code = 200
+    content = b"<html><title>Sec. 1</title>" \
+        b"<link rel='stylesheet' href='style.css'></html>"
+    text = content.decode()
+
+    def json(self):
+        return {"ancestors": [{}, {"type": "section", "identifier": "1.1"}]}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Answer the calls to govinfo and eCFR without the network"""
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return FakeResponse()
+
+    def handle(request):
+        calls.append(str(request.url))
+        if "/ancestry/" in request.url.path:
+            return httpx.Response(200, json=FakeResponse().json())
+        return httpx.Response(200, content=FakeResponse.content)
+
+    monkeypatch.setattr(data.session, "get", get)
+    monkeypatch.setattr(
+        data, "get_async_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+    return calls
+
+
+@pytest.fixture
+def async_clients(monkeypatch, upstream):
+    """The httpx clients the views opened"""
+    clients = []
+    get_async_client = data.get_async_client
+
+    def record():
+        client = get_async_client()
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(data, "get_async_client", record)
+    return clients
+
+
+def assert_budget(response, queries: int, upstream: int = 0):
+    """Fail when the request took more queries or upstream calls than
+    it's allowed to"""
+    assert response.status_code == 200
+    stats = response.wsgi_request.stats
+    assert stats.queries <= queries, stats
+    assert stats.upstream_calls <= upstream, stats
+
+
+def test_server_timing():
+    stats = RequestStats()
+    stats.add_query(0.0125)
+    stats.add_query(0.0025)
+    stats.add_upstream(0.2)
+
+    assert stats.get_server_timing() == \
+        'db;dur=15.0;desc="2 queries", upstream;dur=200.0;desc="1 calls"'
+
+
+def test_query_timer():
+    stats = RequestStats()
+    timer = QueryTimer(stats)
+
+    assert timer(lambda *args: "rows", "SELECT 1", None, False, {}) == "rows"
+    assert stats.queries == 1
+
+
+def test_upstream_calls(upstream):
+    with collect_stats() as stats:
+        data.get_content_text("https://www.govinfo.gov/content/pkg/x.htm")
+
+    assert upstream == ["https://www.govinfo.gov/content/pkg/x.htm"]
+    assert stats.upstream_calls == 1
+
+    # Outside a request nothing is counted
+    record_upstream(1.0)
+    assert stats.upstream_calls == 1
+
+
+def test_async_upstream_calls(upstream):
+    url = "https://www.govinfo.gov/content/pkg/x.htm"
+    with collect_stats() as stats:
+        title, css, _ = asyncio.run(data.aget_content_title_css_file(url))
+
+    assert (title, css) == ("Sec. 1", "style.css")
+    assert upstream == [url]
+    assert stats.upstream_calls == 1
+
+
+def test_async_clients_closed(async_clients):
+    # What the WSGI handler does for each async view, a new loop
+    url = "https://www.govinfo.gov/content/pkg/x.htm"
+    for _ in range(2):
+        async_to_sync(data.aget_content_title_css_file)(url)
+
+    assert len(async_clients) == 2
+    assert all(client.is_closed for client in async_clients)
+
+
+def test_threads_count_for_the_request():
+    with collect_stats() as stats:
+        thread = Thread(target=track(record_upstream), args=(0.5,))
+        thread.start()
+        thread.join()
+
+    assert stats.upstream_calls == 1
+    assert track(record_upstream) is record_upstream
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_server_timing_header(settings, enabled):
+    settings.SERVER_TIMING = enabled
+    middleware = RequestStatsMiddleware(lambda request: HttpResponse())
+    request = RequestFactory().get("/")
+
+    response = middleware(request)
+
+    assert request.stats.queries == 0
+    assert response.has_header("Server-Timing") == enabled
+
+
+def test_async_server_timing_header(settings):
+    settings.SERVER_TIMING = True
+
+    async def get_response(request):
+        record_upstream(0.5)
+        return HttpResponse()
+
+    middleware = RequestStatsMiddleware(get_response)
+    request = RequestFactory().get("/")
+
+    assert asyncio.iscoroutinefunction(middleware)
+    response = async_to_sync(middleware)(request)
+
+    assert request.stats.upstream_calls == 1
+    assert response.has_header("Server-Timing")
+
+
+@pytest.fixture
+def usc_tree(monkeypatch, settings, tmp_path):
+    """A year with a title of sections, read from the database as no
+    snapshot was built"""
+    settings.TOC_SNAPSHOT_DIR = tmp_path
+    monkeypatch.setattr(
+        "USCODE.models.get_collection_name", lambda code: "United States Code")
+
+    collection = Collection.objects.create(code=settings.USCODE)
+    common = {"collection_code": collection, "selected_year_from": 2022}
+
+    year = Node.objects.create(
+        collection=collection, root_node=True, title="2022", node_key="2022",
+        level=0, node_type="node", child_count=1, **common)
+    title = Node.objects.create(
+        parent=year, root_node=False, title="Title 42", title_number=42,
+        node_key="title42", level=1, node_type="node",
+        child_count=SECTIONS, leaf_count=SECTIONS, **common)
+    sections = [
+        Node.objects.create(
+            parent=title, root_node=False, title=f"Sec. {i}",
+            title_number=42, node_key=f"sec{i}", level=2, node_type="leaf",
+            section="LEAF", leaf_number_from=str(i),
+            htmlfile=f"USCODE-2022-title42/html/{i}.htm",
+            pdffile=f"USCODE-2022-title42/pdf/{i}.pdf", **common)
+        for i in range(1, SECTIONS + 1)
+    ]
+    return title, sections
+
+
+@pytest.fixture
+def cfr_tree(settings, tmp_path):
+    settings.TOC_SNAPSHOT_DIR = tmp_path
+
+    title = CFRNode.objects.create(
+        identifier="12", node_type="title", label="Title 12",
+        label_description="Banks and Banking",
+        up_to_date_as_of="2022-12-01", child_count=1)
+    part = CFRNode.objects.create(
+        identifier="1", node_type="part", label="Part 1", parent=title,
+        title_node=title, child_count=SECTIONS, leaf_count=SECTIONS)
+    sections = [
+        CFRNode.objects.create(
+            identifier=f"1.{i}", node_type="section", label=f"§ 1.{i}",
+            parent=part, title_node=title)
+        for i in range(1, SECTIONS + 1)
+    ]
+    return part, sections
+
+
+@pytest.mark.django_db
+def test_usc_collection_view(client, usc_tree, upstream):
+    response = client.get(reverse("USCODE:collection"))
+    assert_budget(response, queries=3)
+
+
+@pytest.mark.django_db
+def test_usc_node_view(client, usc_tree, upstream):
+    title, _ = usc_tree
+
+    response = client.get(reverse("USCODE:node", args=[title.slug_id]))
+    assert_budget(response, queries=5)
+
+
+@pytest.mark.django_db
+def test_usc_leaf_view(client, usc_tree, upstream):
+    _, sections = usc_tree
+
+    response = client.get(reverse("USCODE:leaf", args=[sections[0].slug_id]))
+    assert_budget(response, queries=4, upstream=1)
+
+
+@pytest.mark.django_db
+def test_cfr_node_view(client, cfr_tree, upstream):
+    part, _ = cfr_tree
+
+    response = client.get(reverse("CFR:node", args=[part.slug_id]))
+    assert_budget(response, queries=3)
+
+
+@pytest.mark.django_db
+def test_cfr_content(client, cfr_tree, upstream):
+    _, sections = cfr_tree
+
+    response = client.get(reverse("CFR:html", args=[sections[0].slug_id]))
+    assert_budget(response, queries=3, upstream=2)
+
+
+@pytest.mark.django_db
+def test_cfr_content_closes_its_client(client, cfr_tree, async_clients):
+    _, sections = cfr_tree
+
+    for section in sections[:2]:
+        response = client.get(reverse("CFR:html", args=[section.slug_id]))
+        assert response.status_code == 200
+
+    # One client per request, shared by its two calls to eCFR
+    assert len(async_clients) == 2
+    assert all(client.is_closed for client in async_clients)
+
+
+@pytest.fixture
+def cfr_hits(monkeypatch):
+    """eCFR finds every section of the tree"""
+    async def search(query):
+        return [
+            {"title": "12", "section": f"1.{i}"}
+            for i in range(1, SECTIONS + 1)
+        ]
+
+    monkeypatch.setattr("CFR.models.acfr_full_text_search", search)
+
+
+@pytest.mark.django_db
+def test_full_text_search(client, cfr_tree, cfr_hits):
+    response = client.get(
+        reverse("main:search"), {"search": "banks", "collection": "CFR"})
+    assert_budget(response, queries=4)
+
+
+@pytest.mark.django_db
+def test_hits_load_each_title_once(cfr_tree, monkeypatch):
+    part, sections = cfr_tree
+    # As if the counts weren't stored, every hit would ask for them
+    CFRNode.objects.filter(node_type="title").update(child_count=0)
+    loaded = []
+    monkeypatch.setattr(
+        CFRNode, "new_child_nodes", lambda node: loaded.append(node))
+
+    results = [{"title": "12", "section": s.identifier} for s in sections]
+    with collect_stats() as stats:
+        hits = list(CFRNode.objects.get_hits(results))
+
+    assert len(hits) == SECTIONS
+    assert loaded == []
+    # The titles, one check of the loaded sections, the hits
+    assert stats.queries == 3
+
+
+@pytest.mark.django_db
+def test_hits_without_load(cfr_tree, monkeypatch):
+    _, sections = cfr_tree
+    monkeypatch.setattr(
+        CFRNodeManager, "get_titles", Mock(side_effect=AssertionError))
+    monkeypatch.setattr(
+        CFRNode, "get_child_nodes", Mock(side_effect=AssertionError))
+
+    results = [{"title": "12", "section": s.identifier} for s in sections]
+    results.append({"title": "99", "section": "1.1"})
+    hits = list(CFRNode.objects.get_hits(results, load=False))
+
+    # The title not stored is left out, nothing is asked from eCFR
+    assert {hit.pk for hit in hits} == {s.pk for s in sections}
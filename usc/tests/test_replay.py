@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from utils import replay
+from utils.replay import (RECORD, AsyncReplayTransport, MissingRecording,
+                          ReplayAdapter, install_replay)
+
+
+class Upstream(BaseAdapter):
+    """The real API, answers with the url it was called with"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        response = Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers["Content-Type"] = "application/json"
+        response.headers["Content-Encoding"] = "gzip"
+        response._content = b'{"url": "%s"}' % request.url.encode()
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    delays = []
+    monkeypatch.setattr(replay, "sleep", delays.append)
+    return delays
+
+
+async def async_get(transport, url):
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await client.get(url)
+
+
+def get_session(tmp_path, **options):
+    session = requests.Session()
+    upstream = Upstream()
+    install_replay(session, tmp_path, upstream=upstream, **options)
+    return session, upstream
+
+
+def test_record_and_replay(tmp_path, delays):
+    session, upstream = get_session(tmp_path, mode=RECORD)
+    url = "https://api.govinfo.gov/collections?b=2&a=1"
+    recorded = session.get(url)
+
+    session, _ = get_session(tmp_path, latency=0.1)
+    replayed = session.get("https://api.govinfo.gov/collections?a=1&b=2")
+
+    assert upstream.calls == 1
+    assert replayed.status_code == 200
+    assert replayed.json() == recorded.json() == {"url": url}
+    assert replayed.headers["Content-Type"] == "application/json"
+    assert "Content-Encoding" not in replayed.headers
+    assert delays == [0.1]
+
+
+def test_missing_recording(tmp_path, delays):
+    session, upstream = get_session(tmp_path)
+
+    with pytest.raises(MissingRecording):
+        session.get("https://www.ecfr.gov/api/versioner/v1/titles")
+    assert upstream.calls == 0
+
+
+def test_jitter_and_errors(tmp_path, delays):
+    session, _ = get_session(tmp_path, mode=RECORD)
+    session.get("https://www.ecfr.gov/api/versioner/v1/titles")
+
+    adapter = ReplayAdapter(
+        tmp_path, latency=0.1, jitter=0.05, error_rate=0.5, seed=1,
+        upstream=Upstream())
+    session.mount("https://", adapter)
+
+    errors = 0
+    for _ in range(100):
+        try:
+            session.get("https://www.ecfr.gov/api/versioner/v1/titles")
+        except ConnectionError:
+            errors += 1
+
+    assert 30 < errors < 70
+    assert all(0.05 <= delay <= 0.15 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_async_replay(tmp_path, delays):
+    session, _ = get_session(tmp_path, mode=RECORD)
+    url = "https://api.govinfo.gov/collections?b=2&a=1"
+    session.get(url)
+
+    adapter = ReplayAdapter(tmp_path, upstream=Upstream())
+    response = asyncio.run(async_get(AsyncReplayTransport(adapter), url))
+
+    assert response.json() == {"url": url}
+    assert "Content-Encoding" not in response.headers
+
+    adapter.error_rate = 1
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(async_get(AsyncReplayTransport(adapter), url))
@@ -0,0 +1,103 @@
+import pytest
+from asgiref.sync import async_to_sync
+from account.models import User
+from CFR.models import CFRNode
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from Main.middleware import ReplicaMiddleware
+from Main.models import Job
+from USCODE.models import Collection
+from utils.routers import (PRIMARY, REPLICA, ReplicaRouter, use_primary,
+                           use_replica)
+
+router = ReplicaRouter()
+
+
+def test_reads_of_the_legal_text():
+    assert router.db_for_read(CFRNode) is None
+
+    with use_replica():
+        assert router.db_for_read(CFRNode) == REPLICA
+        assert router.db_for_read(User) is None
+        assert router.db_for_read(Job) is None
+
+        with use_primary():
+            assert router.db_for_read(CFRNode) is None
+
+
+def test_reads_after_a_write():
+    with use_replica():
+        router.db_for_write(Job)
+        assert router.db_for_read(CFRNode) == REPLICA
+
+        assert router.db_for_write(CFRNode) == PRIMARY
+        assert router.db_for_read(CFRNode) is None
+
+
+def test_reads_in_a_transaction(monkeypatch):
+    monkeypatch.setattr(connections[PRIMARY], "in_atomic_block", True)
+
+    with use_replica():
+        assert router.db_for_read(CFRNode) == PRIMARY
+
+
+def test_migrations():
+    assert router.allow_migrate(PRIMARY, "CFR")
+    assert not router.allow_migrate(REPLICA, "CFR")
+
+
+@pytest.mark.parametrize("method, name, args, expected", [
+    ("get", "main:search", [], REPLICA),
+    ("get", "CFR:node", ["title-12"], REPLICA),
+    ("post", "main:search", [], None),
+    ("get", "main:qa", ["a3c2b6a0-7c1f-4a3e-9d5e-2f0c1b9e8d7a"], None),
+])
+def test_middleware(method, name, args, expected):
+    read = []
+
+    def get_response(request):
+        middleware.process_view(request, None, (), {})
+        read.append(router.db_for_read(CFRNode))
+        return HttpResponse()
+
+    middleware = ReplicaMiddleware(get_response)
+    request = getattr(RequestFactory(), method)(reverse(name, args=args))
+    request.resolver_match = resolve(request.path_info)
+
+    middleware(request)
+
+    assert read == [expected]
+    # Nothing is left for the next request of the thread
+    assert router.db_for_read(CFRNode) is None
+
+
+@pytest.mark.django_db(databases=["default", "replica"], transaction=True)
+def test_collection_read_from_replica(client, settings):
+    Collection.objects.create(code=settings.USCODE)
+
+    with CaptureQueriesContext(connections[REPLICA]) as replica:
+        response = client.get(reverse("USCODE:collection"))
+
+    assert response.status_code == 200
+    assert len(replica) > 0
+
+
+def test_async_middleware():
+    read = []
+
+    async def get_response(request):
+        middleware.process_view(request, None, (), {})
+        read.append(router.db_for_read(CFRNode))
+        return HttpResponse()
+
+    middleware = ReplicaMiddleware(get_response)
+    request = RequestFactory().get(reverse("main:search"))
+    request.resolver_match = resolve(request.path_info)
+
+    async_to_sync(middleware)(request)
+
+    assert read == [REPLICA]
+    assert router.db_for_read(CFRNode) is None
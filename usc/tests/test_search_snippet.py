@@ -0,0 +1,82 @@
+import pytest
+from django.contrib.postgres.search import SearchHeadline, SearchVector
+from django.db import connection
+from django.db.models import Value
+from django.test.utils import CaptureQueriesContext
+from USCODE.models import Collection, Node, SectionContent
+from utils.search import HIGHLIGHT_START, HIGHLIGHT_STOP, render_snippet
+
+
+def mark(word):
+    return f"{HIGHLIGHT_START}{word}{HIGHLIGHT_STOP}"
+
+
+@pytest.mark.parametrize(
+    "snippet, expected",
+    [
+        (None, ""),
+        ("", ""),
+        ("no match here", "no match here"),
+        (f"the {mark('court')} shall", "the <mark>court</mark> shall"),
+        (
+            f"{mark('a')} ... {mark('b')}",
+            "<mark>a</mark> ... <mark>b</mark>"
+        ),
+        (
+            f"<script>{mark('x')}</script>",
+            "&lt;script&gt;<mark>x</mark>&lt;/script&gt;"
+        ),
+    ]
+)
+def test_render_snippet(snippet, expected):
+    assert render_snippet(snippet) == expected
+
+
+@pytest.fixture
+def long_section(settings):
+    """A section whose only match lies past its share of the budget"""
+    settings.SEARCH_SNIPPET_BUDGET = 2000
+    settings.SEARCH_MAX_RESULTS = 10
+
+    text = "the court shall hear " * 50 + "tariff"
+    collection = Collection.objects.create(code=settings.USCODE)
+    common = {"collection_code": collection, "selected_year_from": 2022}
+
+    year = Node.objects.create(
+        collection=collection, root_node=True, title="2022", node_key="2022",
+        level=0, node_type="node", child_count=1, **common)
+    section = Node.objects.create(
+        parent=year, root_node=False, title="Sec. 1", title_number=42,
+        node_key="sec1", level=1, node_type="leaf", section="LEAF",
+        body=SectionContent.objects.store(text), **common)
+    Node.objects.filter(pk=section.pk).update(
+        vector_column=SearchVector(Value(text)))
+    return section
+
+
+@pytest.mark.django_db
+def test_snippet_reads_its_share_of_the_text(long_section):
+    results = Node.objects.full_text_search("court")
+
+    snippet = results.query.annotations["snippet"]
+    assert isinstance(snippet, SearchHeadline)
+    # 2000 characters for 10 results
+    assert 'SUBSTRING("uscode_content"."text", 1, 200)' in str(results.query)
+
+    with CaptureQueriesContext(connection) as queries:
+        nodes = list(results)
+
+    sql = queries[-1]["sql"]
+    assert sql.count('"uscode_content"."text"') == \
+        sql.count('SUBSTRING("uscode_content"."text"')
+    assert nodes == [long_section]
+    assert mark("court") in nodes[0].snippet
+    assert "body" not in nodes[0]._state.fields_cache
+
+
+@pytest.mark.django_db
+def test_snippet_skips_matches_past_the_budget(long_section):
+    nodes = list(Node.objects.full_text_search("tariff"))
+
+    assert nodes == [long_section]
+    assert mark("tariff") not in nodes[0].snippet
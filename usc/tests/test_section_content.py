@@ -0,0 +1,108 @@
+import re
+from importlib import import_module
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from USCODE.models import Collection, Node, SectionContent
+from utils.search import HIGHLIGHT_START, HIGHLIGHT_STOP
+
+# The test database is built without the migrations
+section_content = import_module("USCODE.migrations.0005_section_content")
+
+
+def test_digest_is_sha256_of_utf8_text():
+    digest = SectionContent.get_digest("§ 1983. Civil action")
+
+    assert digest == (
+        "3be702cc70bff7eb802ebb3cb93e7719acedb89284196ea2ecec1e4f093a460c")
+    assert digest != SectionContent.get_digest("§ 1983. Civil action.")
+
+
+def test_node_rows_have_no_text():
+    columns = {field.column for field in Node._meta.concrete_fields}
+
+    assert "content" not in columns
+    assert "body_id" in columns
+
+
+@pytest.fixture
+def year(monkeypatch, settings):
+    monkeypatch.setattr(
+        "USCODE.models.get_collection_name", lambda code: "United States Code")
+    collection = Collection.objects.create(code=settings.USCODE)
+    return Node.objects.create(
+        collection=collection, collection_code=collection,
+        selected_year_from=2022, root_node=True, title="2022",
+        node_key="2022", level=0, node_type="node", child_count=3)
+
+
+def add_section(year: Node, number: int, **fields) -> Node:
+    return Node.objects.create(
+        parent=year, collection_code=year.collection_code,
+        selected_year_from=year.selected_year_from, root_node=False,
+        title=f"Sec. {number}", title_number=42, node_key=f"sec{number}",
+        level=1, node_type="leaf", section="LEAF", **fields)
+
+
+@pytest.fixture
+def vector_trigger():
+    with connection.cursor() as cursor:
+        cursor.execute(section_content.VECTOR_FUNCTION)
+        cursor.execute(section_content.VECTOR_TRIGGER)
+
+
+@pytest.mark.django_db
+def test_vector_reads_the_body(year, vector_trigger):
+    body = SectionContent.objects.store("The court shall hear the action")
+    section = add_section(year, 1983, body=body)
+
+    vector = Node.objects.values_list(
+        'vector_column', flat=True).get(pk=section.pk)
+
+    assert "'court'" in vector
+    assert "'sec'" in vector
+    # No weight label after the positions, the vector stays unweighted
+    assert not re.search(r"\d[ABC]\b", vector)
+
+
+@pytest.mark.django_db
+def test_search_and_snippets_read_the_body(year, vector_trigger):
+    body = SectionContent.objects.store("The court shall hear the action")
+    section = add_section(year, 1983, body=body)
+
+    nodes = list(Node.objects.full_text_search("court"))
+
+    assert nodes == [section]
+    assert f"{HIGHLIGHT_START}court{HIGHLIGHT_STOP}" in nodes[0].snippet
+
+
+@pytest.mark.django_db
+def test_move_section_content_in_batches(year):
+    texts = ["Civil action", "Civil action", "Equal rights"]
+    sections = [add_section(year, i) for i in range(len(texts))]
+
+    # The column the migrations drop, with the texts still inline
+    with connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE uscode_node ADD COLUMN content text")
+        for section, text in zip(sections, texts):
+            cursor.execute(
+                "UPDATE uscode_node SET content = %s WHERE id = %s",
+                [text, section.pk])
+
+    out = StringIO()
+    call_command("move_section_content", batch_size=2, stdout=out)
+
+    assert "Moved 2 section texts\n" in out.getvalue()
+    assert "Moved 3 section texts\n" in out.getvalue()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM uscode_node WHERE content IS NOT NULL")
+        assert cursor.fetchone() == (0,)
+
+    moved = Node.objects.filter(pk__in=[s.pk for s in sections])\
+        .order_by('pk').values_list('body__text', flat=True)
+    assert list(moved) == texts
+    # The same text is stored once
+    assert SectionContent.objects.count() == 2
@@ -0,0 +1,83 @@
+from utils.semantic import LexicalEmbedder, SemanticIndex
+import numpy as np
+import pytest
+
+
+DOCUMENTS = [
+    ("USCODE", 10, "Civil action for deprivation of rights under color "
+                   "of any statute of any State"),
+    ("USCODE", 11, "Employers shall not discriminate against employees "
+                   "because of race, color, religion or sex"),
+    ("CFR", 20, "Standards of performance for new stationary sources "
+                "of air pollution"),
+    ("CFR", 21, "Motor vehicle safety standards for tires"),
+]
+
+
+@pytest.fixture
+def index():
+    return SemanticIndex.build(
+        DOCUMENTS, LexicalEmbedder(), labels=["USCODE", "CFR"], batch_size=3)
+
+
+def search(index, query, k=4):
+    vector = LexicalEmbedder().embed([query])[0]
+    return index.search(vector, k)
+
+
+def test_embeddings_are_unit_vectors():
+    vectors = LexicalEmbedder().embed(["employer discrimination", "", "a"])
+
+    assert vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[0]), 1)
+    assert not vectors[1].any()
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("deprived of civil rights by a state", ("USCODE", 10)),
+        ("employment discrimination on account of religion", ("USCODE", 11)),
+        ("air pollution from stationary sources", ("CFR", 20)),
+        ("tire safety standards", ("CFR", 21)),
+    ]
+)
+def test_search(index, query, expected):
+    label, node_id, score = search(index, query)[0]
+
+    assert (label, node_id) == expected
+    assert 0 < score <= 1
+
+
+def test_search_orders_by_score(index):
+    scores = [score for *_, score in search(index, "safety standards", k=10)]
+
+    assert len(scores) == len(DOCUMENTS)
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_save_and_load(index, tmp_path):
+    path = tmp_path / "semantic"
+    index.save(path)
+    index.save(path)
+
+    loaded = SemanticIndex.load(path)
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.vectors.dtype == np.int8
+    assert len(loaded) == len(DOCUMENTS)
+    assert search(loaded, "tire safety") == search(index, "tire safety")
+
+
+def test_sentence_embedder_finds_paraphrases():
+    pytest.importorskip("sentence_transformers")
+    from utils.semantic import SentenceEmbedder
+
+    embedder = SentenceEmbedder()
+    index = SemanticIndex.build(DOCUMENTS, embedder, labels=["USCODE", "CFR"])
+
+    # No word in common with the section
+    vector = embedder.embed(["firing someone over their faith"])[0]
+    label, node_id, _ = index.search(vector, 1)[0]
+
+    assert (label, node_id) == ("USCODE", 11)
@@ -0,0 +1,54 @@
+from CFR.models import CFRNode
+from USCODE.models import Node
+from utils.general import compact_slug
+
+
+def test_compact_slug_is_stable():
+    slug = compact_slug("USCODE-2022-title42", "USCODE", 2022)
+
+    assert slug == compact_slug("USCODE-2022-title42", "USCODE", 2022)
+    assert slug != compact_slug("USCODE-2022-title42", "USCODE", 2021)
+    assert slug.startswith("uscode-2022-title42-")
+
+
+def test_compact_slug_is_short():
+    slug = compact_slug("Part " * 100, "CFR", "40")
+
+    assert len(slug) <= 53
+    assert not compact_slug("§§", "CFR", "40").startswith("-")
+
+
+def test_uscode_slug_follows_the_path():
+    root = Node(root_node=True, title="2022", selected_year_from=2022)
+    root.slug_id = root.get_slug()
+
+    child = Node(
+        root_node=False, parent=root, title="Title 42",
+        granule_id="USCODE-2022-title42", node_key="USCODE-2022-title42",
+    )
+    other_year = Node(
+        root_node=True, title="2021", selected_year_from=2021)
+    other_year.slug_id = other_year.get_slug()
+
+    moved = Node(
+        root_node=False, parent=other_year, title="Title 42",
+        granule_id="USCODE-2022-title42", node_key="USCODE-2022-title42",
+    )
+
+    assert root.slug_id.startswith("2022-")
+    assert child.get_slug().startswith("uscode-2022-title42-")
+    assert child.get_slug() != moved.get_slug()
+
+
+def test_cfr_slug_follows_the_path():
+    title = CFRNode(
+        id=1, identifier="40", node_type="title",
+        label_description="Environment")
+    title.slug_id = title.get_slug()
+
+    part = CFRNode(
+        identifier="60", node_type="part", label="Part 60", parent=title)
+
+    assert title.slug_id.startswith("environment-")
+    assert part.get_slug().startswith("part-60-")
+    assert part.get_slug() == part.get_slug()
@@ -0,0 +1,124 @@
+from django.conf import settings
+from Main import toc
+from utils.toc import HAS_CHILDREN, HAS_PAPER, TocRow, TocSnapshot
+import numpy as np
+import pytest
+
+ROWS = [
+    TocRow(1, None, "2022-a", "2022", "2022", flags=HAS_CHILDREN),
+    TocRow(5, 1, "title-42-b", "Title 42", "Title 42", flags=HAS_CHILDREN),
+    TocRow(3, 1, "title-1-c", "Title 1", "Title 1", flags=HAS_CHILDREN),
+    TocRow(9, 5, "s1983-d", "§1983 <Civil>", "<Civil>", pdf="/1983.pdf",
+           flags=HAS_PAPER, key="42/1983"),
+    TocRow(7, 5, "s1981-e", "§1981", "§1981", flags=HAS_PAPER,
+           key="42/1981"),
+    TocRow(4, 3, "s1-f", "§1", "§1", flags=HAS_PAPER, key="1/1"),
+    TocRow(2, None, "2021-g", "2021", "2021", flags=HAS_CHILDREN),
+]
+
+
+@pytest.fixture
+def snapshot():
+    return TocSnapshot.build(ROWS)
+
+
+def labels(snapshot, indexes):
+    return [snapshot.get_string("label", i) for i in indexes]
+
+
+def test_roots_and_children(snapshot):
+    assert labels(snapshot, snapshot.get_roots()) == ["2022", "2021"]
+
+    title_42 = snapshot.index_of(5)
+    assert labels(snapshot, snapshot.get_children(title_42)) == [
+        "§1981", "§1983 <Civil>"]
+    assert list(snapshot.get_children(snapshot.index_of(2))) == []
+
+
+def test_path_and_lookup(snapshot):
+    section = snapshot.find("42/1983")
+
+    assert labels(snapshot, snapshot.get_path(section)) == [
+        "2022", "Title 42", "§1983 <Civil>"]
+    assert snapshot.find("42/1984") is None
+    assert snapshot.find("4" * 100) is None
+    assert snapshot.index_of(8) is None
+
+
+def test_save_and_load(snapshot, tmp_path):
+    snapshot.save(tmp_path / "uscode")
+    snapshot.save(tmp_path / "uscode")
+
+    loaded = TocSnapshot.load(tmp_path / "uscode")
+
+    assert isinstance(loaded.ids, np.memmap)
+    assert len(loaded) == len(ROWS)
+    assert loaded.find("1/1") == snapshot.find("1/1")
+    assert loaded.get_string("slug", loaded.index_of(9)) == "s1983-d"
+
+
+def test_save_publishes_versions(snapshot, tmp_path):
+    path = tmp_path / "uscode"
+    for _ in range(3):
+        snapshot.save(path)
+
+    # The link moved to the last version, the one before is kept for
+    # readers still loading it
+    versions = sorted(tmp_path.glob("uscode.[0-9]*"))
+    assert path.is_symlink()
+    assert len(versions) == 2
+    assert path.resolve() == versions[-1]
+
+
+def test_reload_is_throttled(snapshot, tmp_path, settings):
+    settings.TOC_SNAPSHOT_DIR = str(tmp_path)
+    settings.TOC_RELOAD_INTERVAL = 60
+    toc.loaded.clear()
+    path = toc.get_toc_path(settings.USCODE)
+    snapshot.save(path)
+
+    first = toc.get_toc(settings.USCODE)
+    snapshot.save(path)
+    assert toc.get_toc(settings.USCODE) is first
+
+    settings.TOC_RELOAD_INTERVAL = 0
+    assert toc.get_toc(settings.USCODE) is not first
+
+
+@pytest.fixture
+def saved(snapshot, tmp_path, settings):
+    settings.TOC_SNAPSHOT_DIR = str(tmp_path)
+    toc.loaded.clear()
+    snapshot.save(toc.get_toc_path(settings.USCODE))
+
+
+def test_child_listing(saved):
+    nodes = toc.get_child_nodes(settings.USCODE, 5)
+
+    assert [node.get_title() for node in nodes] == ["§1981", "§1983 <Civil>"]
+    assert not nodes[0].has_children()
+    assert nodes[1].get_pdf_link() == "/1983.pdf"
+    assert nodes[1].slug_id in nodes[1].get_view_document_link()
+
+
+def test_unknown_nodes_fall_back(saved):
+    assert toc.get_child_nodes(settings.USCODE, 404) is None
+
+    # Children not loaded when the snapshot was taken
+    assert toc.get_child_nodes(settings.USCODE, 2) is None
+    assert toc.get_child_nodes(settings.CFR, 5) is None
+
+
+def test_bread_crumbs_are_escaped(saved):
+    crumbs = toc.get_bread_crumbs(
+        settings.USCODE, 9, prefix=lambda: "<li>USC</li>")
+
+    assert crumbs.startswith("<li>USC</li>")
+    assert crumbs.count("breadcrumb-item") == 3
+    assert "&lt;Civil&gt;" in crumbs
+
+
+def test_find_node(saved):
+    node = toc.find_node(settings.USCODE, toc.get_usc_key(42, "1983"))
+
+    assert node.slug_id == "s1983-d"
@@ -26,9 +26,6 @@ INSTALLED_APPS = [
     # postgres
     'django.contrib.postgres',
 
-    # Installed
-    "debug_toolbar",
-
     # Local
     'Main',
     'USCODE',
@@ -38,13 +35,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Main.middleware.RequestStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Main.middleware.ReplicaMiddleware',
+    'Main.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'Main.middleware.NodeLoadingMiddleware',
 ]
 
 ROOT_URLCONF = 'usc.urls'
@@ -70,18 +70,40 @@ WSGI_APPLICATION = 'usc.wsgi.application'
 AUTH_USER_MODEL = 'account.User'
 
 
-# Use postgres
+# Use postgres. Behind a transaction pooler like PgBouncer (DB_POOLER)
+# server side cursors can't be used and the pooler keeps the
+# connections, otherwise each worker thread keeps its connection for
+# DB_CONN_MAX_AGE seconds and checks it before reusing it. Under ASGI
+# the requests run on new threads, use the pooler there
+DB_POOLER = config("DB_POOLER", default=False, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
         'NAME': config("DB_NAME"),
         'USER': config("DB_USER"),
         'PASSWORD': config("DB_PASSWORD"),
-        'HOST': 'localhost',
-        'PORT': '',
+        'HOST': config("DB_HOST", default='localhost'),
+        'PORT': config("DB_PORT", default=''),
+        'CONN_MAX_AGE': config(
+            "DB_CONN_MAX_AGE", default=0 if DB_POOLER else 60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER,
     }
 }
 
+# A streaming replica of the primary, the browse and search pages read
+# the legal text from it (see utils.routers)
+DB_REPLICA_HOST = config("DB_REPLICA_HOST", default='')
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config("DB_REPLICA_PORT", default=''),
+    }
+
+DATABASE_ROUTERS = ['utils.routers.ReplicaRouter']
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -121,6 +143,9 @@ MEDIA_URL = '/media/'
 
 
 # Logging settings
+# Records are written by a thread of their own, one JSON object a line.
+# LOG_INGEST_LEVEL and LOG_UPSTREAM_LEVEL at DEBUG log every node and
+# every call to govinfo and eCFR
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -134,36 +159,39 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': False,
         },
+        'basic.ingest': {
+            'level': config('LOG_INGEST_LEVEL', default='INFO'),
+        },
+        'basic.upstream': {
+            'level': config('LOG_UPSTREAM_LEVEL', default='INFO'),
+        },
     },
     'handlers': {
         'basic_h': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'utils.logger.AsyncFileHandler',
             'filename': BASE_DIR / 'logs/debug.log',
-            'formatter': 'simple',
+            'formatter': 'json',
         },
         'basic_e': {
             'level': 'WARNING',
-            'class': 'logging.FileHandler',
+            'class': 'utils.logger.AsyncFileHandler',
             'filename': BASE_DIR / 'logs/error.log',
-            'formatter': 'simple',
+            'formatter': 'json',
         },
     },
     'formatters': {
         'simple': {
             'format': '{levelname} : {asctime} : {message}',
             'style': '{',
-        }
+        },
+        'json': {
+            '()': 'utils.logger.JsonFormatter',
+        },
     }
 }
 
 
-# DEBUG TOOLBAR SETTINGS
-INTERNAL_IPS = [
-    "127.0.0.1",
-]
-
-
 # Emails settings
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = config('EMAIL_HOST', default='localhost')
@@ -187,9 +215,115 @@ ENCRYPTING_KEY = config('ENCRYPTING_KEY')
 USCODE = "USCODE"
 CFR = "CFR"
 
+# Views, or namespaces of views, reading from the replica on GET
+REPLICA_VIEWS = ['main:index', 'main:search', 'main:autocomplete', USCODE, CFR]
+
 SEARCH_MAX_RESULTS = 100
 
+# Search result snippets, the budget is the number of content
+# characters ts_headline may scan for one search query
+SEARCH_SNIPPET_BUDGET = config(
+    'SEARCH_SNIPPET_BUDGET', default=2_000_000, cast=int)
+SEARCH_SNIPPET_MAX_WORDS = 35
+SEARCH_SNIPPET_MIN_WORDS = 15
+SEARCH_SNIPPET_MAX_FRAGMENTS = 2
+
+# Search box suggestions
+AUTOCOMPLETE_MIN_LENGTH = 3
+AUTOCOMPLETE_MAX_RESULTS = 10
+AUTOCOMPLETE_CACHE_TTL = 60
+
+# Seconds a request waits for another one loading the same node from
+# govinfo before it gets the loading page, which retries after
+NODE_LOAD_LOCK_TIMEOUT = 5
+NODE_LOAD_RETRY_AFTER = 3
+
+# Send the query count, SQL time and upstream calls of each request in
+# a Server-Timing header, shown in the network tab of the dev tools
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+
+# Staff profile a request with ?_profile=sample (or cprofile) or the
+# X-Profile header, profiles are stored here
+PROFILE_PARAM = '_profile'
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_INTERVAL = 0.005
+
+# /metrics answers the scraper sending this bearer token, it is off
+# without one. Each process keeps its own values, with METRICS_DIR set
+# they are saved there every METRICS_SAVE_INTERVAL seconds and a scrape
+# adds up the values of every web and job worker. Without it each
+# process has to be scraped on its own. The values of a worker that
+# stopped saving METRICS_RETIRE_AFTER seconds ago are kept in a retired
+# total. Empty the directory on deploys
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_SAVE_INTERVAL = 10
+METRICS_RETIRE_AFTER = 300
+
+# Seconds the async views wait on govinfo and eCFR
+UPSTREAM_TIMEOUT = config('UPSTREAM_TIMEOUT', default=30, cast=float)
+
+# Serve govinfo and eCFR from recordings in this directory instead of
+# the network, see utils/replay.py. "record" saves the real responses
+# first. Latency and jitter are in seconds
+UPSTREAM_REPLAY_DIR = config('UPSTREAM_REPLAY_DIR', default='')
+UPSTREAM_REPLAY_MODE = config('UPSTREAM_REPLAY_MODE', default='replay')
+UPSTREAM_REPLAY_LATENCY = config(
+    'UPSTREAM_REPLAY_LATENCY', default=0.0, cast=float)
+UPSTREAM_REPLAY_JITTER = config(
+    'UPSTREAM_REPLAY_JITTER', default=0.0, cast=float)
+UPSTREAM_REPLAY_ERROR_RATE = config(
+    'UPSTREAM_REPLAY_ERROR_RATE', default=0.0, cast=float)
+
+# Background jobs, run by the run_jobs command. Inline runs them in the
+# request instead, for development without a worker. The questions of
+# the search page are jobs too, without a worker or JOBS_INLINE they are
+# never answered. Delays in seconds, a job whose worker stops extending
+# the lease goes to another worker
+JOBS_INLINE = config('JOBS_INLINE', default=False, cast=bool)
+JOBS_POLL_INTERVAL = 1
+JOBS_LEASE = config('JOBS_LEASE', default=60, cast=int)
+JOBS_RETRY_DELAY = 10
+JOBS_MAX_RETRY_DELAY = 60 * 60
+JOBS_KEEP = 60 * 60 * 24 * 7
+
+# Question answering, run by the job workers (see JOBS_INLINE). Answers
+# are cached by normalized question, the jobs are kept QA_JOB_TTL seconds
 OPENAPI_KEY = config('OPENAPI_KEY')
+QA_BACKEND = config('QA_BACKEND', default='utils.ai_query.OpenAIBackend')
+QA_MODEL = config('QA_MODEL', default='text-davinci-003')
+QA_MAX_TOKENS = 256
+QA_TIMEOUT = config('QA_TIMEOUT', default=20, cast=float)
+QA_CACHE_TTL = 60 * 60 * 24
+QA_JOB_TTL = 60 * 60
+
+# Sections retrieved per source, the characters of a CFR section read
+# from eCFR and the token budget of the prompt
+QA_RETRIEVAL_TOP_K = 5
+QA_PASSAGE_MAX_CHARS = 2000
+QA_PROMPT_TOKEN_BUDGET = config(
+    'QA_PROMPT_TOKEN_BUDGET', default=1500, cast=int)
+
+# Semantic search over section text, the index is built offline with
+# the build_semantic_index command. SentenceEmbedder needs the
+# sentence-transformers package, utils.semantic.LexicalEmbedder runs
+# without it but only matches shared words. Rebuild the index after
+# changing the embedder
+SEMANTIC_INDEX_DIR = config(
+    'SEMANTIC_INDEX_DIR', default=str(BASE_DIR / 'indexes/semantic'))
+SEMANTIC_EMBEDDER = config(
+    'SEMANTIC_EMBEDDER', default='utils.semantic.SentenceEmbedder')
+SEMANTIC_MODEL = config(
+    'SEMANTIC_MODEL', default='sentence-transformers/all-MiniLM-L6-v2')
+SEMANTIC_MAX_RESULTS = 20
+SEMANTIC_MIN_SCORE = 0.2
+
+# Snapshots of the USCODE and CFR trees the browse views read from,
+# the workers look for a new one every TOC_RELOAD_INTERVAL seconds
+TOC_SNAPSHOT_DIR = config(
+    'TOC_SNAPSHOT_DIR', default=str(BASE_DIR / 'indexes/toc'))
+TOC_RELOAD_INTERVAL = 5
+
 SENDGRID_KEY = config('SENDGRID_KEY')
 SENDGRID_EMAIL = config('SENDGRID_EMAIL')
 
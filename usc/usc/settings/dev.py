@@ -3,3 +3,15 @@ from .base import *
 
 PRINT_LOG = True
 OFF_EMAIL = False
+
+# The debug toolbar is sync only, the requests it sees run in a thread
+# under ASGI
+INSTALLED_APPS += [
+    "debug_toolbar",
+]
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('Main.middleware.NodeLoadingMiddleware'),
+    'debug_toolbar.middleware.DebugToolbarMiddleware')
+INTERNAL_IPS = [
+    "127.0.0.1",
+]
@@ -3,6 +3,16 @@ from .base import *
 
 SECRET_KEY = "fake-key"
 
+QA_BACKEND = "utils.ai_query.StubBackend"
+SEMANTIC_EMBEDDER = "utils.semantic.LexicalEmbedder"
+
 INSTALLED_APPS += [
     "tests"
 ]
+
+# The replica is a second connection to the test database, tests read
+# from it with django_db(databases=["default", "replica"])
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
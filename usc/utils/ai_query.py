@@ -1,17 +1,199 @@
+import hashlib
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import RLock
+from typing import Callable
+
 import openai
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .logger import err_logger
+from .metrics import record_cache
+
+PROMPT = """Answer the question about US law using only the numbered \
+sources below and cite the sources you use like [1]. If the sources do \
+not answer the question, reply with "Unknown".
+
+{sources}
+Question: {question}
+Answer:"""
+
+UNKNOWN = "Unknown"
+
+CITATION = re.compile(r"\[(\d+)\]")
+
+
+class QAError(Exception):
+    """The question could not be answered"""
+
+
+class OpenAIBackend:
+    """Answers questions with the OpenAI completion API"""
+
+    def complete(self, prompt: str, timeout: float) -> str:
+        response = openai.Completion.create(
+            api_key=settings.OPENAPI_KEY,
+            request_timeout=timeout,
+            model=settings.QA_MODEL,
+            prompt=prompt,
+            temperature=0.2,
+            max_tokens=settings.QA_MAX_TOKENS,
+            top_p=1,
+            frequency_penalty=0,
+            presence_penalty=0
+        )
+        return response['choices'][0]['text']
+
+
+class StubBackend:
+    """Local stand in for the OpenAI API, used in tests and development"""
+
+    answer = "See [1]."
+
+    def complete(self, prompt: str, timeout: float) -> str:
+        return self.answer
+
+
+def get_backend():
+    """Get the configured QA backend"""
+    return import_string(settings.QA_BACKEND)()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, a token is about four characters of English"""
+    return len(text) // 4 + 1
+
+
+def build_prompt(question: str, passages: list[dict], budget: int):
+    """Fit as many of the passages, best first, as the token budget
+    allows. Returns the prompt and the passages used in it"""
+    budget -= estimate_tokens(PROMPT + question)
+
+    sources = []
+    used = []
+    for passage in passages:
+        source = f"[{len(used) + 1}] {passage['label']}\n{passage['text']}\n"
+        tokens = estimate_tokens(source)
+
+        if tokens > budget:
+            # Cut the passage to what is left when that is still useful
+            if budget < 50:
+                break
+            source = source[:budget * 4] + "...\n"
+            tokens = budget
+
+        sources.append(source)
+        used.append(passage)
+        budget -= tokens
+
+    prompt = PROMPT.format(sources="\n".join(sources), question=question)
+    return prompt, used
+
+
+def get_citations(answer: str, passages: list[dict]) -> list[dict]:
+    """Get the passages the answer cites, in the order they are cited"""
+    citations = []
+    for number in dict.fromkeys(CITATION.findall(answer)):
+        index = int(number) - 1
+        if 0 <= index < len(passages):
+            passage = passages[index]
+            citations.append({
+                "number": int(number),
+                "label": passage["label"],
+                "url": passage["url"],
+            })
+    return citations
+
+
+def answer_question(question: str, retrieve: Callable) -> dict:
+    """Answer the question from the passages retrieved for it"""
+    try:
+        passages = retrieve(question)
+    finally:
+        # Retrieval runs in a pool thread, give its connections back,
+        # the replica's too
+        connections.close_all()
+
+    if not passages:
+        return {"answer": UNKNOWN, "citations": []}
+
+    prompt, used = build_prompt(
+        question, passages, settings.QA_PROMPT_TOKEN_BUDGET)
+    answer = get_backend().complete(prompt, settings.QA_TIMEOUT).strip()
+
+    return {"answer": answer, "citations": get_citations(answer, used)}
+
+
+def normalize_question(query: str) -> str:
+    """Questions differing only in case, spacing or
+    trailing punctuation get the same answer"""
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+def get_cache_key(question: str) -> str:
+    digest = hashlib.sha256(question.encode()).hexdigest()
+    return f"qa-rag:{digest}"
+
+
+# Questions being answered right now, concurrent requests for the same
+# question wait on the same upstream call instead of making their own.
+# A job worker answers one question at a time, the other threads hold
+# the calls still running after their QA_TIMEOUT
+CALL_THREADS = 4
+executor = ThreadPoolExecutor(
+    max_workers=CALL_THREADS, thread_name_prefix="qa")
+in_flight: dict[str, Future] = {}
+in_flight_lock = RLock()
+
+
+def finish(key: str, future: Future):
+    """Cache the answer and let the next request for the question
+    start a new call if this one failed"""
+    with in_flight_lock:
+        in_flight.pop(key, None)
+
+    if future.exception() is None:
+        cache.set(key, future.result(), settings.QA_CACHE_TTL)
+    else:
+        err_logger.error(f"QA call failed: {future.exception()}")
+
+
+def get_answer_future(key: str, query: str, retrieve: Callable) -> Future:
+    """Get the running call for the question or start one"""
+    with in_flight_lock:
+        future = in_flight.get(key)
+        if future is None:
+            future = executor.submit(answer_question, query, retrieve)
+            in_flight[key] = future
+            future.add_done_callback(lambda f: finish(key, f))
+
+    return future
+
+
+def get_cached_answer(query: str):
+    """Get the answer of a question asked before, if any"""
+    return record_cache(
+        "qa", cache.get(get_cache_key(normalize_question(query))))
+
+
+def ai_query(query: str, retrieve: Callable) -> dict:
+    """Answer a question with citations to the passages of our own
+    data that `retrieve` finds for it"""
+    key = get_cache_key(normalize_question(query))
 
+    answer = cache.get(key)
+    if answer is not None:
+        return answer
 
-def ai_query(query: str) -> str:
-    openai.api_key = settings.OPENAPI_KEY
+    future = get_answer_future(key, query.strip(), retrieve)
 
-    response = openai.Completion.create(
-        model="text-davinci-003",
-        prompt=f"This is an AI that answers questions related to US laws. The user asks a question and the AI lawyer bot answers the question. If the user asks a question that is nonsense, trickery, or has no clear answer, the AI Lawyer bot should reply with \"Unknown\".\nQuestion: How to get custody of your child?\nIt depends on the specific facts and circumstances of your case, but generally, to obtain custody of your child, you will need to file a petition or other legal action with your local family court and proceed through the court process. The court will consider factors such as the relationship between the child and each parent, the child’s wishes, and any evidence of domestic violence or child abuse. Ultimately, the court's goal is to make a decision that is in the best interests of the child.\n#\nQuestion: How long do you have to answer a legal complaint under Federal Rules of Civil Procedure?\nUnder the Federal Rules of Civil Procedure, you generally have 21 days from the date you are served with a complaint to answer the allegations made in the complaint. If you fail to respond within the allotted time, the court may enter a default judgment against you.\n#\nQuestion: What if I lost important legal documents in the flood?\nIf you lost important legal documents in a flood, you should contact the agency or court that issued the document, as well as your insurance company. Depending on the type of document, you may be able to obtain a replacement or have the document re-filed with the court. Your insurance company may be able to provide coverage for the cost of replacing the document.\n#\nQuestion: Can a resident of the mobile home park sell his mobile home in New Jersey?\nYes, a resident of a mobile home park in New Jersey can sell their mobile home. However, there are certain rules and regulations that must be followed, including obtaining written permission from the park owner prior to the sale and providing notice to the park owner and any potential buyers of the park's rules and regulations.\n#\nQuestion: What does impeachment of the President mean?\nImpeachment of the President is the process by which the House of Representatives can formally charge the President of the United States with \"high crimes and misdemeanors.\" If the House votes to impeach the President, the matter is then referred to the Senate for trial. If the Senate finds the President guilty, the President is removed from office.\n#\nQuestion: What can I do if the Agent under a Power of Attorney took money for herself?\nIf you believe that the agent under a Power of Attorney has taken money for themselves, you may file a complaint with the local licensing authority or law enforcement. Depending on the circumstance, you may also be able to seek damages in civil court. It is important to contact a qualified attorney who can advise you on the best way to proceed.\n#\nQuestion: Does Alaska recognize or allow Palimony lawsuits?\nYes, Alaska does recognize and allow palimony lawsuits. In Alaska, palimony suits are based on the doctrine of equitable estoppel and can be brought by either party, though traditionally it is the party who did not execute the contract who will be successful in a palimony suit.\n#\nQuestion: What are the laws in Illinois on the placement of children with my relatives?\nUnder Illinois law, the court is given broad discretion when it comes to placing children with relatives. The court considers the best interest of the child when making its decision and is not limited to the blood relationship between the child and the relatives. The court will consider the stability of the home, the relationship of the relatives to the child, the physical and mental health of the relatives, and any other factors that may impact the child’s well-being.\n#\nQuestion: Can I sue a tattoo artist for performing tattooing on my minor son’s body without my consent?\nYes, you can sue a tattoo artist for performing tattooing on your minor son's body without your consent. Depending on the circumstances, you may be able to sue the artist for negligence, medical malpractice, or battery. Additionally, many states have laws prohibiting the tattooing of minors without parental consent. It is important to speak with a qualified attorney who can advise you on the specific laws in your jurisdiction.\n#\nQuestion: What is the Statute of Limitations in Arizona?\nThe Statute of Limitations in Arizona depends on the type of claim. Generally speaking, a person has two years from the date of the injury or loss to file a claim for a personal injury, wrongful death, or breach of contract. For debt collection, a person has three years from the date the debt was incurred to file a claim. For fraud, a person has three years from the date of the discovery of the fraud to file a claim.\n# \nQuestion: Debtor, an individual, filed for relief under Chapter 7. Two weeks prior to filing for bankruptcy, Debtor obtained credit counseling over the phone from one of the nonprofit budget and credit counseling services on the list approved by the United States trustee. Has the Debtor satisfied the Code’s credit counseling requirement? \nYES The Code requires Debtor to obtain credit counseling services within 180 days of filing for bankruptcy. Debtor received credit counseling two weeks before filing for relief under Chapter 7. She received counseling from a service approved by the United States trustee. Credit counseling may occur over the phone, in person, or on the Internet, and may be done in individual or group sessions. [B.C. § 109(h)] \n#\nQuestion: Debtor is a consumer. She files for relief under Chapter 11. Is Debtor eligible for relief under Chapter 11? \nYES While Chapter 11 is often referred to as the business reorganization chapter, the Supreme Court has held that an individual consumer debtor may file for relief under Chapter 11. [Toibb v. Radloff, 501 U.S. 157 (1991)] \n#\nQuestion: Debtor is employed and earns $3,000 per week. She owes $600,000 in unsecured debts and $600,000 in secured debts. Is she eligible for relief under Chapter 13? \n NO, Chapter 13 relief is available only to an individual who has regular income, whose unsecured debts total less than $465,275, and whose secured debts total less than $1,395,875. Here, Debtor’s unsecured debts of $600,000 exceed the statutory limitation and, thus, make her ineligible for Chapter 13 relief. [B.C. § 109(e)] \n#\nQuestion: Can the United States trustee serve as a trustee in a Chapter 11 case? \n DEPENDS. The United States trustee may serve as the trustee in a subchapter V case but not in a non-subchapter V Chapter 11 case. [B.C. §§ 1104(d), 1183] \n#\nQuestion: Is a trustee normally appointed in a Chapter 11 case? \n DEPENDS. A trustee is appointed in a subchapter V Chapter 11 case but the debtor remains in possession. [B.C. §§ 1182(2), 1183] In a non-subchapter V case, the bankruptcy court may appoint a trustee, but such appointment is the exception to the rule. The debtor normally stays in possession of estate property and continues to manage its business. \n# \nQuestion: Acme Corporation files for relief under Chapter 11. There are reasonable grounds to suspect that current members of Acme’s board and the CEO have engaged in actual fraud in managing Acme. Must the United States trustee move for appointment of a Chapter 11 trustee? \n YES, Congress amended the Bankruptcy Code in 2005 to require the United States trustee to file a motion for appointment of a Chapter 11 trustee under certain circumstances. Because reasonable grounds exist to suspect that Acme’s board and its CEO have engaged in actual fraud in managing Acme, the United States trustee must file a motion for appointment of a trustee. [B.C. § 1104(e)] \n# \nQuestion: Debtor files for relief under Chapter 7. The Chapter 7 trustee sells estate property to Buyer. After sale to Buyer, the trustee discovers that Debtor was not the sole owner of the property. Buyer sues the trustee. Is the trustee personally liable for breach of her duties? \n DEPENDS. The Circuits are split on the type of conduct that gives rise to liability on the part of the trustee. Some courts hold trustees personally liable for either intentional or negligent violations of their fiduciary duties, while others impose personal liability only for intentional violations of the trustee’s duties. \n#\nQuestion: Debtor files a voluntary Chapter 11 petition. There is no Chapter 11 trustee in the case. Debtor’s fixed, liquidated, unsecured debts are $10 million, not counting debts for goods, service, taxes, or debts owed to Debtor’s insiders. Creditor, long before the plan confirmation hearing, requests appointment of an examiner. Must the bankruptcy court order appointment of an examiner? \n YES, The Code requires the bankruptcy court to appoint an examiner if a party in interest requests such appointment prior to plan confirmation and the debtor’s fixed, liquidated unsecured debts exceed $5 million, excluding debts for goods, services, taxes, or debts owed to insiders. Notice and a hearing are required. [B.C. § 1104(c)(2)] \n#\nQuestion: Debtor is an individual and hires Lawyer to file her Chapter 7 petition. Is Lawyer entitled to have her fees paid from Debtor’s Chapter 7 estate? \n NO, The Supreme Court has held that § 330(a)(1) does not authorize payment of estate funds to the debtor’s Chapter 7 lawyer for the lawyer’s work representing the debtor in debtor’s bankruptcy case. Therefore, Lawyer must obtain her fee upfront from Debtor and not rely on compensation from estate funds under § 330(a)(1). [Lamie v. United States Trustee, 540 U.S. 526 (2004)] \n#\nQuestion: Debtor files for relief under Chapter 7. Debtor owns a pedigree dog that has puppies a month after the Chapter 7 filing. Are the puppies property of the bankruptcy estate? \n YES Debtor owned the dog at the start of her bankruptcy case and, thus, the dog is property of the estate. The puppies are offspring of estate property and, therefore, also are property of the estate under § 541(a)(6). \n#\nQuestion: On February 1, Bank loans Acme $250,000, and Acme grants Bank a security interest in its equipment. The parties sign a valid security agreement on February 1. On March 15, Bank files a UCC–1 on Acme’s equipment in the proper state office. On June 1, Acme files for bankruptcy. Can the trustee avoid Bank’s security interest as a preference? \n YES Section 547(e)(2)(A) provides that if a creditor perfects its interest within 30 days of the transfer, then the transfer is made at the time that it takes effect between the debtor and creditor. The transfer is the grant of the security interest. Bank perfected on March 15, which is more than 30 days from the grant of the security interest. When perfection happens outside the 30-day window, § 547(e)(2)(B) provides that the transfer is deemed to occur on the day of perfection. That means that the transfer to Bank is on account of an antecedent debt (debt arose on February 1) and is within 90 days of bankruptcy filing (March 15 to June 2) when the Debtor is presumed insolvent. Bank improves its position as a secured creditor. All the elements of a preference are satisfied, which means that the trustee can avoid the security interest. Bank is unsecured in Debtor’s bankruptcy case. \n#\nQuestion: On February 1, Bank loans Acme $250,000, and Acme grants Bank a security interest in its equipment. The parties sign a valid security agreement on February 1. On March 15, Bank files a UCC–1 on Acme’s equipment in the proper state office. On June 1, Acme files for bankruptcy. If Acme files for bankruptcy on August 5, can the trustee avoid Bank’s security interest as a preference? \n NO The transfer still occurs on March 15, but bankruptcy was filed more than 90 days after the transfer. [B.C. § 547(b)(3), (4)] Thus, there is no preference. \n#\nQuestion: A month before filing for bankruptcy, Debtor, who is insolvent, transfers property to Amy for less than reasonably equivalent value. Amy sells the property to Ben, who takes in good faith, pays fair value for the property, and is unaware of the transaction between Amy and Debtor. Debtor files for bankruptcy. Can the trustee recover the property from Ben? \n NO The transfer to Amy was a fraudulent transfer. It was made for less than reasonably equivalent value while Debtor was insolvent. Thus, the trustee may avoid the transfer under § 548(a)(1)(B)(i), (ii)(I). But, the trustee may not recover the property from Ben, because Ben is not the initial transferee and, thus, has a defense to a recovery action. Because Ben took in good faith, without knowledge of the voidability of the transfer, and paid value, the trustee may not recover from Ben. [B.C. § 550(b)(1)] The trustee may recover the value of the property from Amy, however, because she was the initial transferee. [B.C. § 550(a)(1)] \n#\nQuestion: Debtor files a Chapter 7 petition. Debtor has $8,000 in assets to pay her unsecured priority and general unsecured creditors. Administrative expenses are $4,000. Debtor owes property taxes of $2,000 for the year prior to the date of filing her bankruptcy petition. She also owes $6,000 in federal income taxes for the two years prior to filing her bankruptcy petition. Unsecured creditors’ claims total $30,000. Will the unsecured creditors receive a dividend in Debtor’s bankruptcy case? \n NO In Chapter 7, priority claimants are paid in the order of priority in the Code. Administrative expenses are second priority claims; therefore, they are paid before tax claims and, in this example, are paid in full. After paying the administrative claims, there is $4,000 left to pay the $8,000 in tax claims. Tax claimants share pro rata in remaining funds, if there are insufficient funds to pay them in full. The federal taxing authorities are 75% of the remaining tax claims ($6,000 of $8,000), which means that they get 75% of the $4,000 remaining or $3,000. The property tax claimant gets $1,000 or 25% of the $4,000 remaining. After paying the tax claimants, there is no money available to pay a dividend to the general unsecured creditors. \n# \nQuestion: Debtor files for relief under Chapter 7. Debtor owes Creditor $100,000, which is secured by a security interest on $110,000 worth of Debtor’s property. Must Creditor file a proof of claim in order to have an allowed claim? \n YES In a Chapter 7, 12, or 13 case, a secured creditor must file a proof of claim in order to have an allowed claim. [Bankruptcy Rule 3002(a)] \n#\nQuestion: Debtor files for relief under Chapter 7. Debtor owes Creditor $100,000, which is secured by a security interest on $110,000 worth of Debtor’s property. Would the answer change if Debtor had filed for relief under Chapter 11? \n DEPENDS In a Chapter 11 case, however, the secured creditor need not file a proof of claim form if the debtor correctly schedules the creditor’s debt and does not list the debt as contingent, unliquidated, or disputed. [Bankruptcy Rule 3003(c)(2)] \n#\nQuestion: {query}",
-        temperature=0.9,
-        max_tokens=256,
-        top_p=1,
-        frequency_penalty=0,
-        presence_penalty=0
-    )
-    return response['choices'][0]['text']
+    try:
+        return future.result(timeout=settings.QA_TIMEOUT)
+    except FutureTimeoutError:
+        raise QAError(f"No answer after {settings.QA_TIMEOUT} seconds")
+    except Exception as e:
+        raise QAError(str(e)) from e
@@ -0,0 +1,121 @@
+import re
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+# Words and symbols that may separate the two ends of a range
+RANGE = r"\s*(?:-|–|—|\bto\b|\bthrough\b|\bthru\b)\s*"
+
+USC_PATTERN = re.compile(
+    r"^(?P<title>\d+)\s*"
+    r"U\.?\s*S\.?\s*C(?:\.|ode)?(?:\s*A\.?)?\s*"
+    r"(?P<prefix>§§?|sections?|secs?\.?)?\s*"
+    r"(?P<section>\d[0-9A-Za-z\-]*)"
+    r"(?P<subsections>(?:\([0-9A-Za-z]+\))*)"
+    rf"(?:{RANGE}(?P<end>\d[0-9A-Za-z\-]*))?"
+    r"(?:\s*et\.?\s*seq\.?)?$",
+    re.IGNORECASE
+)
+
+CFR_PATTERN = re.compile(
+    r"^(?P<title>\d+)\s*"
+    r"C\.?\s*F\.?\s*R\.?\s*"
+    r"(?P<prefix>§§?|parts?|pts?\.?|sections?|secs?\.?)?\s*"
+    r"(?P<section>\d+(?:\.[0-9A-Za-z]+)?)"
+    r"(?P<subsections>(?:\([0-9A-Za-z]+\))*)"
+    rf"(?:{RANGE}(?P<end>\d+(?:\.[0-9A-Za-z]+)?))?$",
+    re.IGNORECASE
+)
+
+SUBSECTION = re.compile(r"\(([0-9A-Za-z]+)\)")
+
+# Section numbers like 1981-1983 are a range only when the leading
+# numbers grow, 1400Z-2 is a section of its own
+SECTION_RANGE = re.compile(r"^(\d+)([A-Za-z]*)-(\d+)([A-Za-z]*)$")
+
+
+class Citation(NamedTuple):
+    """A parsed USC or CFR citation"""
+
+    collection: str
+    title: int
+    section: str
+    end: Optional[str] = None
+    subsections: tuple = ()
+    part: bool = False
+
+
+def normalize(query: str) -> str:
+    """Squash whitespace and the non breaking spaces pasted from PDFs"""
+    return " ".join(query.replace("\xa0", " ").split())
+
+
+def split_section_range(section: str, plural: bool):
+    """Split sections like 1981-1983 cited with §§ into a range"""
+    match = SECTION_RANGE.match(section)
+    if not plural or not match:
+        return section, None
+
+    start, end = match.group(1), match.group(3)
+    if int(start) >= int(end):
+        return section, None
+
+    return start + match.group(2), end + match.group(4)
+
+
+def parse_usc(query: str) -> Optional[Citation]:
+    """Parse citations like 42 U.S.C. § 1983(a) or 42 USC §§ 1981-1983"""
+    match = USC_PATTERN.match(query)
+    if not match:
+        return None
+
+    section, end = match.group('section'), match.group('end')
+    if end is None:
+        plural = (match.group('prefix') or '').lower() in (
+            '§§', 'sections', 'secs', 'secs.')
+        section, end = split_section_range(section, plural)
+
+    return Citation(
+        collection=settings.USCODE,
+        title=int(match.group('title')),
+        section=section,
+        end=end,
+        subsections=tuple(SUBSECTION.findall(match.group('subsections'))),
+    )
+
+
+def parse_cfr(query: str) -> Optional[Citation]:
+    """Parse citations like 40 CFR 60.1, 40 C.F.R. Part 60
+    or 40 CFR §§ 60.1-60.5"""
+    match = CFR_PATTERN.match(query)
+    if not match:
+        return None
+
+    section, end = match.group('section'), match.group('end')
+    subsections = match.group('subsections')
+
+    # Treasury style sections like 1.401(a)-1 carry a dash in the
+    # identifier itself, the end of a real range always has a dot
+    if end is not None and '.' in section and '.' not in end:
+        section, end = f"{section}{subsections}-{end}", None
+        subsections = ''
+
+    prefix = (match.group('prefix') or '').lower()
+
+    return Citation(
+        collection=settings.CFR,
+        title=int(match.group('title')),
+        section=section,
+        end=end,
+        subsections=tuple(SUBSECTION.findall(subsections)),
+        part=prefix.startswith('p') or '.' not in section,
+    )
+
+
+def parse_citation(query: str) -> Optional[Citation]:
+    """Recognize a USC or CFR citation typed in the search box"""
+    if not query:
+        return None
+
+    query = normalize(query)
+    return parse_usc(query) or parse_cfr(query)
@@ -1,8 +1,17 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
 import requests
 from django.conf import settings
 from requests.exceptions import ConnectionError
-from time import sleep
-from .logger import logger
+from time import perf_counter, sleep
+from .logger import logger, upstream_logger
+from .metrics import UPSTREAM_FAILURES, UPSTREAM_RETRIES, UPSTREAM_SECONDS
+from .replay import AsyncReplayTransport, install_replay
+from .timing import record_upstream
 from bs4 import BeautifulSoup
 from urllib.parse import urlencode
 
@@ -12,31 +21,150 @@ def retry_request_decorator(func):
     Decorator for requests functions,
     keeps on trying for a specific amount of time
 
-    :param func: request function
+    :param func: request function, async ones are awaited
     :type func: Any
     """
 
+    if asyncio.iscoroutinefunction(func):
+        return async_retry_request_decorator(func)
+
     def inner(*args, **kwargs):
         tries = 0
 
-        while tries < 10:
-            try:
-                res = func(*args, **kwargs)
-                return res
-            except ConnectionError:
-                tries += 1
-                logger.info(f"Retrying for {func.__name__}: Tries {tries}")
-                sleep(.5)
+        with UPSTREAM_SECONDS.time(function=func.__name__):
+            while tries < 10:
+                try:
+                    res = func(*args, **kwargs)
+                    return res
+                except ConnectionError:
+                    tries += 1
+                    retrying(func, tries)
+                    sleep(.5)
 
-        raise ConnectionError(f"Request for {func.__name__} failed")
+        raise failed(func)
 
     return inner
 
 
-@retry_request_decorator
-def get_content_title_css_file(url):
-    """Get the title and css file from the Gov API"""
-    response = requests.get(url)
+def async_retry_request_decorator(func):
+    """retry_request_decorator of the async functions, httpx has errors
+    of its own"""
+
+    async def inner(*args, **kwargs):
+        tries = 0
+
+        with UPSTREAM_SECONDS.time(function=func.__name__):
+            while tries < 10:
+                try:
+                    return await func(*args, **kwargs)
+                except (ConnectionError, httpx.TransportError):
+                    tries += 1
+                    retrying(func, tries)
+                    await asyncio.sleep(.5)
+
+        raise failed(func)
+
+    return inner
+
+
+def retrying(func, tries: int):
+    UPSTREAM_RETRIES.inc(function=func.__name__)
+    logger.info(
+        f"Retrying for {func.__name__}: Tries {tries}")
+
+
+def failed(func) -> ConnectionError:
+    UPSTREAM_FAILURES.inc(function=func.__name__)
+    return ConnectionError(f"Request for {func.__name__} failed")
+
+
+# One session keeps the connections to govinfo and eCFR open between
+# the many requests of an ingestion
+session = requests.Session()
+
+replay = None
+if settings.UPSTREAM_REPLAY_DIR:
+    replay = install_replay(
+        session, settings.UPSTREAM_REPLAY_DIR,
+        mode=settings.UPSTREAM_REPLAY_MODE,
+        latency=settings.UPSTREAM_REPLAY_LATENCY,
+        jitter=settings.UPSTREAM_REPLAY_JITTER,
+        error_rate=settings.UPSTREAM_REPLAY_ERROR_RATE,
+    )
+
+
+def get(url, **kwargs):
+    """GET from an upstream API, counted in the stats of the request"""
+    start = perf_counter()
+    status = None
+    try:
+        response = session.get(url, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        duration = perf_counter() - start
+        record_upstream(duration, url)
+        upstream_logger.debug(
+            "GET %s", url, extra={
+                "url": url,
+                "status": status,
+                "duration_ms": round(duration * 1000, 2),
+            })
+
+
+# The client of the running view. Under WSGI each async view runs in
+# an event loop of its own, the client and its connections can't
+# outlive the view
+current_client: ContextVar[Optional[httpx.AsyncClient]] = ContextVar(
+    'current_client', default=None)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    transport = None
+    if replay is not None:
+        transport = AsyncReplayTransport(replay)
+    return httpx.AsyncClient(
+        transport=transport, timeout=settings.UPSTREAM_TIMEOUT)
+
+
+@asynccontextmanager
+async def upstream_client():
+    """Share a client between the upstream calls of the block, its
+    connections are closed when the block ends"""
+    async with get_async_client() as client:
+        token = current_client.set(client)
+        try:
+            yield client
+        finally:
+            current_client.reset(token)
+
+
+async def aget(url, **kwargs):
+    """GET from an upstream API without holding a thread, counted in the
+    stats of the request like get"""
+    client = current_client.get()
+    if client is None:
+        async with upstream_client():
+            return await aget(url, **kwargs)
+
+    start = perf_counter()
+    status = None
+    try:
+        response = await client.get(url, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        duration = perf_counter() - start
+        record_upstream(duration, url)
+        upstream_logger.debug(
+            "GET %s", url, extra={
+                "url": url,
+                "status": status,
+                "duration_ms": round(duration * 1000, 2),
+            })
+
+
+def parse_title_css_file(response):
     if response.status_code == 200:
         soup = BeautifulSoup(response.content, 'html.parser')
         title = soup.title.string
@@ -46,20 +174,32 @@ def get_content_title_css_file(url):
     return None, None, None
 
 
+@retry_request_decorator
+def get_content_title_css_file(url):
+    """Get the title and css file from the Gov API"""
+    return parse_title_css_file(get(url))
+
+
+@retry_request_decorator
+async def aget_content_title_css_file(url):
+    """get_content_title_css_file for the async views"""
+    return parse_title_css_file(await aget(url))
+
+
 @retry_request_decorator
 def get_content_text(url):
     """Get text content from the Gov API"""
-    response = requests.get(url)
+    response = get(url)
     if response.status_code == 200:
         soup = BeautifulSoup(response.content, 'html.parser')
         return soup.text
-    return None, None, None
+    return None
 
 
 @retry_request_decorator
 def get_collection_name(collection_code):
     """Get collection name from the Gov API"""
-    response = requests.get(settings.GOV_API_URL)
+    response = get(settings.GOV_API_URL)
     if response.status_code == 200:
         data: list = response.json()['collections']
         filtered = list(filter(
@@ -74,7 +214,7 @@ def get_collection_name(collection_code):
 @retry_request_decorator
 def request_data(url):
     """Request data from the Gov API"""
-    response = requests.get(url, params={'fetchChildrenOnly': '1'})
+    response = get(url, params={'fetchChildrenOnly': '1'})
     if response.status_code == 200:
         return response.json()
 
@@ -85,28 +225,26 @@ def request_data(url):
 def get_cfr_json(title, date):
     url = f"/versioner/v1/structure/{date}/title-{title}.json"
     full_url = f"{settings.ECFR_API}{url}"
-    response = requests.get(full_url)
+    response = get(full_url)
     return response.json()
 
 
 @retry_request_decorator
 def get_cfr_titles() -> list[dict]:
     url = f"{settings.ECFR_API}/versioner/v1/titles"
-    response = requests.get(url)
+    response = get(url)
     return response.json().get("titles", [])
 
 
-@retry_request_decorator
-def cfr_full_text_search(query: str):
-    """Full text search for CFR"""
-    url = f"{settings.ECFR_API}/search/v1/results"
-
-    response = requests.get(url, params={
+def get_cfr_search_params(query: str) -> dict:
+    return {
         "query": query,
         "per_page": 20,
         "order": "relevance"
-    })
+    }
+
 
+def parse_cfr_search(response):
     if response.status_code == 200:
         data = response.json()
 
@@ -126,13 +264,27 @@ def cfr_full_text_search(query: str):
 
 
 @retry_request_decorator
-def get_cfr_ancestors(
+def cfr_full_text_search(query: str):
+    """Full text search for CFR"""
+    url = f"{settings.ECFR_API}/search/v1/results"
+    return parse_cfr_search(get(url, params=get_cfr_search_params(query)))
+
+
+@retry_request_decorator
+async def acfr_full_text_search(query: str):
+    """cfr_full_text_search for the async views"""
+    url = f"{settings.ECFR_API}/search/v1/results"
+    return parse_cfr_search(
+        await aget(url, params=get_cfr_search_params(query)))
+
+
+def get_cfr_ancestors_url(
     title: str, date: str, node_type: str, identifier: str
 ) -> str:
-    """Get the CFR Doc URL"""
-    ancestor = f"{settings.ECFR_API}/versioner/v1/ancestry/{date}/title-{title}.json?{node_type}={identifier}"  # noqa: E501
-    data = requests.get(ancestor)
+    return f"{settings.ECFR_API}/versioner/v1/ancestry/{date}/title-{title}.json?{node_type}={identifier}"  # noqa: E501
+
 
+def parse_cfr_ancestors(data):
     if data.status_code == 200:
         ancestors = data.json().get('ancestors', [])
 
@@ -140,6 +292,25 @@ def get_cfr_ancestors(
             return ancestors[1:]
 
 
+def get_cfr_content_url(title: str, date: str, ancestors: list) -> str:
+    query_params = map(
+        lambda x: f"{x['type']}={x['identifier']}",
+        ancestors
+    )
+    query = "&".join(query_params)
+
+    return f"{settings.ECFR_API}/renderer/v1/content/enhanced/{date}/title-{title}?{query}"  # noqa: E501
+
+
+@retry_request_decorator
+def get_cfr_ancestors(
+    title: str, date: str, node_type: str, identifier: str
+) -> str:
+    """Get the CFR Doc URL"""
+    return parse_cfr_ancestors(
+        get(get_cfr_ancestors_url(title, date, node_type, identifier)))
+
+
 @retry_request_decorator
 def get_cfr_html(
     title: str, date: str, node_type: str, identifier: str
@@ -150,15 +321,24 @@ def get_cfr_html(
     if ancestors is None:
         return None
 
-    query_params = map(
-        lambda x: f"{x['type']}={x['identifier']}",
-        ancestors
-    )
-    query = "&".join(query_params)
+    response = get(get_cfr_content_url(title, date, ancestors))
+    if response.status_code == 200:
+        return response.text
+
 
-    url = f"{settings.ECFR_API}/renderer/v1/content/enhanced/{date}/title-{title}?{query}"  # noqa: E501
+@retry_request_decorator
+async def aget_cfr_html(
+    title: str, date: str, node_type: str, identifier: str
+) -> str:
+    """get_cfr_html for the async views"""
+    response = await aget(
+        get_cfr_ancestors_url(title, date, node_type, identifier))
+    ancestors = parse_cfr_ancestors(response)
+
+    if ancestors is None:
+        return None
 
-    response = requests.get(url)
+    response = await aget(get_cfr_content_url(title, date, ancestors))
     if response.status_code == 200:
         return response.text
 
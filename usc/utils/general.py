@@ -1,7 +1,9 @@
+import hashlib
 import json
 import logging
 
 from django.conf import settings
+from django.utils.text import slugify
 import requests
 
 # Create the logger and set the logging level
@@ -17,6 +19,18 @@ def invalid_str(value):
     return False
 
 
+def compact_slug(name: str, *identity) -> str:
+    """Short slug that comes out the same on every load, a readable
+    name and a hash of what identifies the node"""
+    key = "/".join(str(part) for part in identity)
+    digest = hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+    prefix = slugify(name or "")[:40].strip("-")
+    if prefix:
+        return f"{prefix}-{digest}"
+    return digest
+
+
 def choices_to_dict(dicts=None):
     if dicts is None:
         dicts = {}
@@ -24,10 +38,10 @@ def choices_to_dict(dicts=None):
     return [{'value': a[0], 'name':a[1]} for a in dicts]
 
 
-# Print that only works when on
-def printt(*args, **kwargs):
+# Debug log that only works when on
+def printt(*args):
     if settings.PRINT_LOG:
-        return print(*args, **kwargs)
+        logger.debug(" ".join(str(arg) for arg in args))
 
 
 def send_email(email, subject, message, fail=True):
@@ -36,7 +50,7 @@ def send_email(email, subject, message, fail=True):
     """
 
     if settings.PRINT_LOG:
-        print(message)
+        logger.debug(message, extra={"email": email, "subject": subject})
 
     if settings.OFF_EMAIL:
         return True
@@ -56,14 +70,26 @@ def send_email(email, subject, message, fail=True):
             url='https://api.sendgrid.com/v3/mail/send',
             json=data, headers=headers)
 
-        print(response.text)
-
-        print(response.status_code, 'Email was sent')
+        if not response.ok:
+            # Retried by the job while it has attempts left
+            err_logger.error(
+                "Email was refused", extra={
+                    "subject": subject,
+                    "status": response.status_code,
+                    "response": response.text,
+                })
+            return False
+
+        logger.info(
+            "Email was sent", extra={
+                "subject": subject,
+                "status": response.status_code,
+            })
 
         return True
 
-    except Exception as e:
-        print(e)
+    except Exception:
+        err_logger.exception("Email was not sent")
 
     return False
 
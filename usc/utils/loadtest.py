@@ -0,0 +1,149 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, local
+from time import perf_counter, sleep
+from typing import NamedTuple
+
+import numpy as np
+import requests
+
+PERCENTILES = (50, 95, 99)
+
+
+class Endpoint(NamedTuple):
+    """A kind of request of the traffic mix, with the urls it's sent to"""
+
+    name: str
+    weight: float
+    urls: list
+
+
+class Result:
+    """Latencies and errors of the requests to an endpoint"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+
+    @property
+    def count(self):
+        return len(self.latencies)
+
+    def get_percentiles(self) -> dict:
+        """Latencies in milliseconds by percentile"""
+        if not self.latencies:
+            return {q: 0.0 for q in PERCENTILES}
+
+        values = np.percentile(self.latencies, PERCENTILES) * 1000
+        return dict(zip(PERCENTILES, values.tolist()))
+
+    def get_error_rate(self) -> float:
+        return self.errors / self.count if self.count else 0.0
+
+
+def parse_mix(mix: str) -> dict:
+    """Weights of the endpoints from "node=4,leaf=3,search=1" """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class LoadTest:
+    """Sends the mix of requests at a fixed rate, whatever the answer
+    times, so slow responses don't hold back the next requests. The
+    latency counts from when a request was due, not when a worker got
+    to it"""
+
+    def __init__(self, base_url: str, endpoints: list[Endpoint],
+                 rps: float, duration: float, workers: int = 32,
+                 timeout: float = 30, seed=None):
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = [endpoint for endpoint in endpoints if endpoint.urls]
+        self.rps = rps
+        self.duration = duration
+        self.workers = workers
+        self.timeout = timeout
+        self.random = random.Random(seed)
+
+        self.results = {
+            endpoint.name: Result(endpoint.name)
+            for endpoint in self.endpoints
+        }
+        self.sessions = local()
+        self.lock = Lock()
+
+    def get_session(self) -> requests.Session:
+        if not hasattr(self.sessions, "session"):
+            self.sessions.session = requests.Session()
+        return self.sessions.session
+
+    def get_plan(self) -> list:
+        """The endpoint and url of every request, in order"""
+        weights = [endpoint.weight for endpoint in self.endpoints]
+        total = int(self.rps * self.duration)
+
+        chosen = self.random.choices(self.endpoints, weights, k=total)
+        return [
+            (endpoint, self.random.choice(endpoint.urls))
+            for endpoint in chosen
+        ]
+
+    def send(self, endpoint: Endpoint, url: str, due: float):
+        try:
+            response = self.get_session().get(
+                self.base_url + url, timeout=self.timeout,
+                allow_redirects=False)
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+
+        result = self.results[endpoint.name]
+        with self.lock:
+            result.latencies.append(perf_counter() - due)
+            if failed:
+                result.errors += 1
+
+    def run(self) -> dict:
+        """Send the requests and get the results by endpoint"""
+        plan = self.get_plan()
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            start = perf_counter()
+            for i, (endpoint, url) in enumerate(plan):
+                due = start + i / self.rps
+                delay = due - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+                executor.submit(self.send, endpoint, url, due)
+
+        self.elapsed = perf_counter() - start
+        return self.results
+
+    def get_report(self) -> str:
+        """A table of the results, one line per endpoint"""
+        lines = [
+            f"{'endpoint':<12}{'requests':>10}{'rps':>9}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}"
+        ]
+
+        for result in self.results.values():
+            p50, p95, p99 = result.get_percentiles().values()
+            lines.append(
+                f"{result.name:<12}{result.count:>10}"
+                f"{result.count / self.elapsed:>9.1f}"
+                f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}"
+                f"{result.get_error_rate():>9.1%}"
+            )
+
+        return "\n".join(lines)
+
+    def get_total(self) -> Result:
+        """The results of every endpoint together"""
+        total = Result("all")
+        for result in self.results.values():
+            total.latencies.extend(result.latencies)
+            total.errors += result.errors
+        return total
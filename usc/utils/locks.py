@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import (DatabaseError, OperationalError, connection,
+                       transaction)
+
+from .logger import err_logger
+
+
+class NodeLoading(Exception):
+    """Another request is loading the children of the node"""
+
+
+@contextmanager
+def single_flight(key: str, timeout: float = None):
+    """Run the block in a transaction holding an advisory lock on the
+    key, so only one request or worker loads a node at a time. Others
+    wait up to timeout seconds, then NodeLoading is raised.
+
+    On its own the lock belongs to the session and is released once the
+    block commits. Nested in an outer transaction the block's rows are
+    only seen by others after the outer commit, so the lock belongs to
+    that transaction and is held until then"""
+    if timeout is None:
+        timeout = settings.NODE_LOAD_LOCK_TIMEOUT
+
+    nested = connection.in_atomic_block
+    lock = "pg_advisory_xact_lock" if nested else "pg_advisory_lock"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SET LOCAL lock_timeout = %s", [f"{int(timeout * 1000)}ms"])
+
+        try:
+            cursor.execute(
+                f"SELECT {lock}(hashtextextended(%s, 0))", [key])
+        except OperationalError as e:
+            raise NodeLoading(key) from e
+
+        cursor.execute("SET LOCAL lock_timeout TO DEFAULT")
+
+    if nested:
+        with transaction.atomic():
+            yield
+        return
+
+    try:
+        # Released after the children commit
+        with transaction.atomic():
+            yield
+    finally:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(hashtextextended(%s, 0))",
+                    [key])
+        except DatabaseError:
+            # A lost connection released it
+            err_logger.warning(f"Could not unlock {key}")
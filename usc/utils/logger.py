@@ -1,5 +1,116 @@
+import copy
+import json
 import logging
-
+import os
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
 
 logger = logging.getLogger('basic')
 err_logger = logging.getLogger('basic.error')
+
+# Per node messages of the ingestion and every call to govinfo and
+# eCFR, silenced by LOG_INGEST_LEVEL and LOG_UPSTREAM_LEVEL
+ingest_logger = logging.getLogger('basic.ingest')
+upstream_logger = logging.getLogger('basic.upstream')
+
+# Attributes every record has, anything else was passed in `extra`
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord(
+    "", 0, "", 0, "", None, None)).keys()) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields passed in `extra` like
+    duration_ms next to the message"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        data.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(data, default=str)
+
+
+class Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room in a full queue rather than losing the stop
+        self.queue.put(self._sentinel)
+
+
+class AsyncFileHandler(QueueHandler):
+    """Writes to a file from a thread of its own, logging only puts the
+    record in a queue. Records are dropped rather than waited for when
+    the queue is full.
+
+    The thread is started by the first record of each process, one
+    started before a fork (gunicorn --preload) doesn't run in the
+    worker"""
+
+    def __init__(self, filename, queue_size: int = 100000):
+        super().__init__(Queue(queue_size))
+        self.target = logging.FileHandler(filename, delay=True)
+        self.queue_size = queue_size
+        self.dropped = 0
+
+        self.listener = None
+        self.pid = None
+
+    def setFormatter(self, fmt):
+        # Records are formatted on the writing thread
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def start(self):
+        """A queue and a writing thread of this process, the records
+        the parent queued are its own to write"""
+        self.queue = Queue(self.queue_size)
+        self.listener = Listener(self.queue, self.target)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def is_started(self) -> bool:
+        return self.pid == os.getpid()
+
+    def emit(self, record: logging.LogRecord):
+        # Called holding the handler's lock, only one thread starts it
+        if not self.is_started():
+            self.start()
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The arguments could change before the record is written
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait for the queued records to be written"""
+        if self.is_started():
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self.is_started():
+            self.listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,358 @@
+import atexit
+import fcntl
+import json
+import os
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, Thread
+from time import perf_counter, sleep, time
+from uuid import uuid4
+
+# Seconds, from a cached page to a slow upstream call
+LATENCY_BUCKETS = (
+    .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+registry = []
+
+
+class Metric:
+    """A metric in the Prometheus text format. Values are kept per
+    process, each worker serves its own"""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = Lock()
+        registry.append(self)
+
+    def get_key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def format_labels(self, key: tuple, **extra) -> str:
+        pairs = [*zip(self.labelnames, key), *extra.items()]
+        if not pairs:
+            return ""
+
+        labels = ",".join(
+            f'{name}="{escape(value)}"' for name, value in pairs)
+        return "{" + labels + "}"
+
+    def get_values(self) -> dict:
+        """A copy of the values of this process"""
+        with self.lock:
+            return dict(self.values)
+
+    def combine(self, value, other):
+        """The value of two processes together"""
+        return value + other
+
+    def get_samples(self, values: dict):
+        """(suffix, labels, value) of every sample"""
+        for key, value in sorted(values.items()):
+            yield "", self.format_labels(key), value
+
+    def render(self, values: dict = None) -> str:
+        if values is None:
+            values = self.get_values()
+
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(
+            f"{self.name}{suffix}{labels} {format_value(value)}"
+            for suffix, labels, value in self.get_samples(values)
+        )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def combine(self, value, other):
+        # The gauges are timestamps, the latest one wins
+        return max(value, other)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self.get_key(labels)
+        i = bisect_left(self.buckets, value)
+
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                # Counts per bucket and the +Inf one, then the sum
+                counts = self.values[key] = [0] * (len(self.buckets) + 2)
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the block took"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def get_values(self) -> dict:
+        with self.lock:
+            return {key: list(counts) for key, counts in self.values.items()}
+
+    def combine(self, value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def get_samples(self, values: dict):
+        for key, counts in sorted(values.items()):
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                total += count
+                le = bound if bound == "+Inf" else format_value(bound)
+                yield "_bucket", self.format_labels(key, le=le), total
+            yield "_count", self.format_labels(key), total
+            yield "_sum", self.format_labels(key), counts[-1]
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r'\"')\
+        .replace("\n", r"\n")
+
+
+def format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# Worker files are named by pid and a random id, a worker given the pid
+# of a stopped one doesn't overwrite its counts
+WORKER_FILES = "worker-*.json"
+RETIRED_FILE = "retired.json"
+
+process = {"pid": None, "id": None}
+process_lock = Lock()
+
+
+def get_process_id() -> str:
+    """The id of this process, a forked process gets its own"""
+    with process_lock:
+        if process["pid"] != os.getpid():
+            process.update(pid=os.getpid(), id=f"{os.getpid()}-{uuid4().hex}")
+        return process["id"]
+
+
+def read(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write(path: Path, data: dict):
+    """Replace the file at once, a scrape never reads half of it"""
+    tmp = path.with_name(f".{get_process_id()}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+def add(totals: dict, data: dict):
+    """Add saved values, by metric, to the totals"""
+    metrics = {metric.name: metric for metric in registry}
+    for name, samples in data.items():
+        metric = metrics.get(name)
+        if metric is None:
+            continue
+
+        values = totals.setdefault(name, {})
+        for key, value in samples:
+            key = tuple(key)
+            values[key] = metric.combine(values[key], value) \
+                if key in values else value
+
+
+def dump(totals: dict) -> dict:
+    """The totals as saved"""
+    return {
+        name: [[list(key), value] for key, value in values.items()]
+        for name, values in totals.items()
+    }
+
+
+def save(directory):
+    """Write the values of this process for the others to render"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    values = {metric.name: metric.get_values() for metric in registry}
+    write(directory / f"worker-{get_process_id()}.json", dump(values))
+
+
+def retire(directory, retire_after: float):
+    """Add the values of the workers that stopped saving retire_after
+    seconds ago to the retired ones and remove their files. A worker
+    still running saves every interval, retire_after has to be well
+    above it or its values would be counted twice"""
+    directory = Path(directory)
+    stopped_before = time() - retire_after
+
+    with open(directory / ".lock", "w") as lock:
+        # One scrape at a time, a worker is retired once
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        retired = read(directory / RETIRED_FILE)
+        # Retired but not removed yet, when the last scrape stopped
+        # in between
+        workers = [
+            name for name in retired.get("workers", [])
+            if (directory / name).exists()
+        ]
+        stopped = [
+            path for path in directory.glob(WORKER_FILES)
+            if path.stat().st_mtime < stopped_before
+        ]
+        if not stopped and workers == retired.get("workers", []):
+            return
+
+        totals = {}
+        add(totals, retired.get("metrics", {}))
+        for path in stopped:
+            if path.name not in workers:
+                add(totals, read(path))
+                workers.append(path.name)
+
+        write(directory / RETIRED_FILE,
+              {"metrics": dump(totals), "workers": workers})
+        for path in stopped:
+            path.unlink(missing_ok=True)
+
+
+def collect(directory, retire_after: float = None) -> dict:
+    """The values of every process that saved them, by metric, and of
+    the retired ones. Workers stopped retire_after seconds ago are
+    retired, their counts still add up"""
+    save(directory)
+    if retire_after:
+        retire(directory, retire_after)
+
+    directory = Path(directory)
+    totals = {metric.name: {} for metric in registry}
+    add(totals, read(directory / RETIRED_FILE).get("metrics", {}))
+    for path in directory.glob(WORKER_FILES):
+        add(totals, read(path))
+    return totals
+
+
+def render(directory=None, retire_after: float = None) -> str:
+    """Every metric in the Prometheus text format, of this process or of
+    every process saving to the directory"""
+    totals = collect(directory, retire_after) if directory else {}
+    return "\n".join(
+        metric.render(totals.get(metric.name)) for metric in registry
+    ) + "\n"
+
+
+# The process the saving thread runs in, a forked process starts its own
+saver = {"pid": None}
+saver_lock = Lock()
+
+
+def start_saver(directory, interval: float):
+    """Save the values of this process every interval seconds, and when
+    it exits"""
+    if saver["pid"] == os.getpid():
+        return
+
+    with saver_lock:
+        if saver["pid"] == os.getpid():
+            return
+        saver["pid"] = os.getpid()
+
+    def run():
+        while True:
+            sleep(interval)
+            try:
+                save(directory)
+            except OSError:
+                pass
+
+    Thread(target=run, name="metrics", daemon=True).start()
+    atexit.register(save, directory)
+
+
+UPSTREAM_SECONDS = Histogram(
+    "usc_upstream_seconds",
+    "Calls to govinfo and eCFR by function of utils.data, with retries",
+    ["function"])
+UPSTREAM_RETRIES = Counter(
+    "usc_upstream_retries_total",
+    "Calls to govinfo and eCFR retried after a connection error",
+    ["function"])
+UPSTREAM_FAILURES = Counter(
+    "usc_upstream_failures_total",
+    "Calls to govinfo and eCFR given up after the retries",
+    ["function"])
+
+REQUEST_SECONDS = Histogram(
+    "usc_request_seconds", "Time to answer a request by view", ["view"])
+DB_SECONDS = Histogram(
+    "usc_db_seconds", "SQL time of a request by view", ["view"])
+DB_QUERIES = Histogram(
+    "usc_db_queries", "Queries of a request by view", ["view"],
+    buckets=COUNT_BUCKETS)
+
+CACHE_REQUESTS = Counter(
+    "usc_cache_requests_total", "Cache lookups by cache and result",
+    ["cache", "result"])
+
+SEARCH_SECONDS = Histogram(
+    "usc_search_seconds", "Search latency by source", ["source"])
+
+INGESTED_NODES = Counter(
+    "usc_ingested_nodes_total", "Nodes stored by the ingestion",
+    ["collection"])
+INGESTED_AT = Gauge(
+    "usc_ingested_timestamp_seconds",
+    "When the ingestion last stored nodes", ["collection"])
+
+JOB_SECONDS = Histogram(
+    "usc_job_seconds", "Background jobs run by task and result",
+    ["task", "result"])
+
+
+def record_cache(cache: str, value):
+    """Count a lookup as a hit or a miss, and pass its value on"""
+    CACHE_REQUESTS.inc(cache=cache, result="miss" if value is None else "hit")
+    return value
+
+
+def record_ingested(collection: str, count: int):
+    INGESTED_NODES.inc(count, collection=collection)
+    INGESTED_AT.set(time(), collection=collection)
@@ -0,0 +1,94 @@
+import cProfile
+import sys
+from collections import Counter
+from threading import Event, Thread, get_ident
+from types import FrameType
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+
+
+def get_frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+    # Semicolons split the frames of a folded stack
+    return name.replace(";", ":")
+
+
+def fold(frame: FrameType) -> str:
+    """The stack of the frame from the outermost call, as a line of a
+    folded stacks file"""
+    names = []
+    while frame is not None:
+        names.append(get_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stack of the thread that started it from another
+    thread, the profiled code runs at full speed between samples. The
+    result is in the folded format flamegraph.pl and speedscope read"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = Event()
+
+    def __enter__(self):
+        self.thread_id = get_ident()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+
+    def get_folded(self) -> str:
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self.stacks.most_common()
+        ) + "\n"
+
+
+class Profiler:
+    """Profile a block with the sampler, or with cProfile to get every
+    call at a higher cost"""
+
+    def __init__(self, mode: str = SAMPLE, interval: float = 0.005):
+        self.mode = mode
+        if mode == CPROFILE:
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = StackSampler(interval)
+
+    def __enter__(self):
+        if self.mode == CPROFILE:
+            self.profiler.enable()
+        else:
+            self.profiler.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == CPROFILE:
+            self.profiler.disable()
+        else:
+            self.profiler.__exit__(*exc)
+
+    def save(self, path) -> str:
+        """Write the profile next to the path, get the file name"""
+        if self.mode == CPROFILE:
+            path = f"{path}.prof"
+            self.profiler.dump_stats(path)
+        else:
+            path = f"{path}.folded"
+            with open(path, "w") as f:
+                f.write(self.profiler.get_folded())
+        return path
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import random
+from pathlib import Path
+from threading import Lock
+from time import sleep
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from requests import Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError, RequestException
+from requests.models import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Headers that still hold once the body is stored decoded
+KEPT_HEADERS = ("Content-Type", "Last-Modified", "ETag")
+
+
+class MissingRecording(RequestException):
+    """A request was never recorded, it isn't retried like a failed
+    connection"""
+
+
+def get_key(request: PreparedRequest) -> str:
+    """The same request gets the same key, whatever the order of the
+    query parameters. httpx requests get the key of the same request
+    sent with requests"""
+    parts = urlsplit(str(request.url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit(parts._replace(query=query, fragment=""))
+    return hashlib.sha1(f"{request.method} {url}".encode()).hexdigest()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Stands in for govinfo and eCFR. Records the responses of the real
+    APIs once and serves them back, with the latency, jitter and
+    connection errors of the network to benchmark against"""
+
+    def __init__(self, directory, mode: str = REPLAY, latency: float = 0,
+                 jitter: float = 0, error_rate: float = 0, seed=None,
+                 upstream: BaseAdapter = None):
+        super().__init__()
+        self.directory = Path(directory)
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.upstream = upstream or HTTPAdapter()
+
+        self.random = random.Random(seed)
+        self.lock = Lock()
+
+    def get_paths(self, request: PreparedRequest):
+        key = get_key(request)
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def get_fault(self) -> tuple[float, bool]:
+        """The delay of the next response and whether it fails"""
+        with self.lock:
+            delay = self.latency + self.random.uniform(
+                -self.jitter, self.jitter)
+            failed = self.random.random() < self.error_rate
+        return max(delay, 0), failed
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if self.mode == RECORD:
+            return self.record(request, **kwargs)
+
+        delay, failed = self.get_fault()
+        sleep(delay)
+        if failed:
+            raise ConnectionError(
+                f"Injected error for {request.url}", request=request)
+
+        return self.replay(request)
+
+    def save(self, request, status: int, reason: str, headers,
+             content: bytes):
+        """Store a response of the real API"""
+        meta, body = self.get_paths(request)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        body.write_bytes(content)
+        meta.write_text(json.dumps({
+            "url": str(request.url),
+            "status": status,
+            "reason": reason,
+            "headers": {
+                name: headers[name]
+                for name in KEPT_HEADERS if name in headers
+            },
+        }))
+
+    def load(self, request) -> tuple[dict, bytes]:
+        """The stored response to the request"""
+        meta, body = self.get_paths(request)
+        if not meta.exists():
+            raise MissingRecording(
+                f"No recording of {request.url}", request=request)
+
+        return json.loads(meta.read_text()), body.read_bytes()
+
+    def record(self, request: PreparedRequest, **kwargs) -> Response:
+        response = self.upstream.send(request, **kwargs)
+        self.save(
+            request, response.status_code, response.reason,
+            response.headers, response.content)
+        return response
+
+    def replay(self, request: PreparedRequest) -> Response:
+        data, content = self.load(request)
+
+        response = Response()
+        response.status_code = data["status"]
+        response.reason = data["reason"]
+        response.headers = CaseInsensitiveDict(data["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = content
+        return response
+
+    def close(self):
+        self.upstream.close()
+
+
+def install_replay(session: Session, directory, **options) -> ReplayAdapter:
+    """Send the requests of the session to recordings in the directory"""
+    adapter = ReplayAdapter(directory, **options)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """The replay adapter for the httpx client of the async views, both
+    read and write the same recordings"""
+
+    def __init__(self, adapter: ReplayAdapter,
+                 upstream: httpx.AsyncBaseTransport = None):
+        self.adapter = adapter
+        self.upstream = upstream or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        if self.adapter.mode == RECORD:
+            response = await self.upstream.handle_async_request(request)
+            response = httpx.Response(
+                response.status_code, headers=response.headers,
+                stream=response.stream, request=request)
+            content = await response.aread()
+            self.adapter.save(
+                request, response.status_code, response.reason_phrase,
+                response.headers, content)
+            return response
+
+        delay, failed = self.adapter.get_fault()
+        await asyncio.sleep(delay)
+        if failed:
+            raise httpx.ConnectError(
+                f"Injected error for {request.url}", request=request)
+
+        data, content = self.adapter.load(request)
+        return httpx.Response(
+            data["status"], headers=data["headers"], content=content,
+            request=request)
+
+    async def aclose(self):
+        await self.upstream.aclose()
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# Apps whose tables the replica serves, the legal text. Users, sessions
+# and jobs are read where they're written
+REPLICA_APPS = {'USCODE', 'CFR'}
+
+# Where the reads of the current request go: REPLICA for the browse and
+# search pages (see Main.middleware.ReplicaMiddleware), PRIMARY once
+# pinned, None otherwise
+read_from: ContextVar[Optional[str]] = ContextVar('read_from', default=None)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary in the block, whatever the view"""
+    token = read_from.set(PRIMARY)
+    try:
+        yield
+    finally:
+        read_from.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Read the legal text from the replica in the block"""
+    token = read_from.set(REPLICA)
+    try:
+        yield
+    finally:
+        read_from.reset(token)
+
+
+def has_replica() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    """Sends the reads of the browse and search pages to the replica.
+    Writes, the ingestion and the workers, and the reads of a request
+    that wrote the legal text or is in a transaction go to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if read_from.get() != REPLICA \
+                or model._meta.app_label not in REPLICA_APPS \
+                or not has_replica():
+            return None
+
+        # Rows written in the transaction aren't on the replica yet
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # The request reads what it wrote from then on
+        if read_from.get() == REPLICA \
+                and model._meta.app_label in REPLICA_APPS:
+            read_from.set(PRIMARY)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets the tables from the primary
+        return db == PRIMARY
@@ -0,0 +1,27 @@
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Markers passed to ts_headline, control characters never show up in
+# the section text so they are safe to swap for html after escaping
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+
+def render_snippet(snippet: str) -> str:
+    """Escape a search snippet and turn the markers into <mark> tags"""
+    if not snippet:
+        return ""
+
+    html = escape(snippet)\
+        .replace(HIGHLIGHT_START, "<mark>")\
+        .replace(HIGHLIGHT_STOP, "</mark>")
+
+    return mark_safe(html)
+
+
+def strip_snippet(snippet: str) -> str:
+    """Get the plain text of a search snippet"""
+    if not snippet:
+        return ""
+
+    return snippet.replace(HIGHLIGHT_START, "").replace(HIGHLIGHT_STOP, "")
@@ -0,0 +1,213 @@
+import re
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+WORD = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a all an and any are as at be by each for from has have if in into is
+it its may must no not of on or other shall such than that the their
+there these this to under was were which will with
+""".split())
+
+SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "ed", "es", "s")
+
+
+def stem(word: str) -> str:
+    """Crude suffix stripping so that word forms share features"""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def get_features(text: str) -> Counter:
+    """Stemmed words, word pairs and word prefixes of the text"""
+    words = [
+        stem(word)
+        for word in WORD.findall(text.lower())
+        if word not in STOP_WORDS
+    ]
+
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+    # Prefixes let related words like "employ" and "employer" meet
+    features.update(f"{word[:5]}~" for word in words if len(word) > 5)
+    return features
+
+
+class SentenceEmbedder:
+    """Embeds text with a sentence embedding model on the CPU, texts
+    with the same meaning get close vectors without sharing a word.
+    The model reads the first 256 word pieces of a text, the heading
+    and the start of a section. sentence-transformers is imported here,
+    it pulls in torch and the lexical embedder runs without it"""
+
+    def __init__(self, model: str = None):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(
+            model or settings.SEMANTIC_MODEL, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Get unit length float32 vectors of the texts"""
+        vectors = self.model.encode(
+            [text or "" for text in texts], batch_size=64,
+            convert_to_numpy=True, normalize_embeddings=True)
+        return vectors.astype(np.float32)
+
+
+class LexicalEmbedder:
+    """Embeds text on the CPU without a model file. Every feature is
+    hashed to a few dimensions with a random sign, which keeps the
+    inner products of the sparse feature vectors (sparse random
+    projection). This is still word matching: texts only meet through
+    shared words, word forms or prefixes, never as paraphrases. For
+    development and tests, without the model"""
+
+    def __init__(self, dim: int = 256, hashes: int = 3):
+        self.dim = dim
+        self.hashes = hashes
+
+    def get_positions(self, feature: str):
+        data = feature.encode()
+        for salt in range(self.hashes):
+            value = zlib.crc32(data, salt)
+            yield value % self.dim, 1.0 if value & (1 << 31) else -1.0
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in get_features(text).items():
+            weight = 1.0 + np.log(count)
+            for position, sign in self.get_positions(feature):
+                vector[position] += sign * weight
+        return vector
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Get unit length float32 vectors of the texts"""
+        vectors = np.stack([self.embed_one(text or "") for text in texts])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors: np.ndarray) -> np.ndarray:
+    """Store unit vectors as int8, a quarter of the float32 size"""
+    return np.round(vectors * 127).astype(np.int8)
+
+
+class SemanticIndex:
+    """Quantized vectors of documents with the collection and id of
+    the node each one belongs to"""
+
+    FILES = ("vectors", "ids", "collections")
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray,
+                 collections: np.ndarray, labels: list[str]):
+        self.vectors = vectors
+        self.ids = ids
+        self.collections = collections
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, documents, embedder, labels: list[str],
+              batch_size: int = 1000):
+        """Build an index from (collection label, id, text) documents"""
+        vectors, ids, collections = [], [], []
+
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == batch_size:
+                cls._add_batch(batch, embedder, labels,
+                               vectors, ids, collections)
+                batch = []
+        cls._add_batch(batch, embedder, labels, vectors, ids, collections)
+
+        return cls(
+            vectors=np.concatenate(vectors or [
+                np.zeros((0, embedder.dim), dtype=np.int8)]),
+            ids=np.array(ids, dtype=np.int64),
+            collections=np.array(collections, dtype=np.int8),
+            labels=labels,
+        )
+
+    @staticmethod
+    def _add_batch(batch, embedder, labels, vectors, ids, collections):
+        if not batch:
+            return
+        vectors.append(quantize(embedder.embed([text for *_, text in batch])))
+        ids.extend(node_id for _, node_id, _ in batch)
+        collections.extend(labels.index(label) for label, *_ in batch)
+
+    def save(self, path: Path):
+        """Write the index as .npy files that can be memory mapped"""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+
+        for name in self.FILES:
+            np.save(tmp / f"{name}.npy", getattr(self, name))
+        (tmp / "labels.txt").write_text("\n".join(self.labels))
+
+        # Swap the whole directory so readers never see half an index
+        if path.exists():
+            old = path.with_name(path.name + ".old")
+            path.rename(old)
+            tmp.rename(path)
+            for child in old.iterdir():
+                child.unlink()
+            old.rmdir()
+        else:
+            tmp.rename(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """Memory map a saved index, pages are shared between workers"""
+        path = Path(path)
+        arrays = {
+            name: np.load(path / f"{name}.npy", mmap_mode="r")
+            for name in cls.FILES
+        }
+        labels = (path / "labels.txt").read_text().split("\n")
+        return cls(labels=labels, **arrays)
+
+    def search(self, query: np.ndarray, k: int, chunk_size: int = 1024):
+        """Get the (collection label, id, score) of the k documents
+        most similar to the query vector"""
+        if len(self) == 0:
+            return []
+
+        query = query.astype(np.float32)
+        scores = np.empty(len(self), dtype=np.float32)
+
+        # The int8 chunks are converted into one buffer small enough to
+        # stay in the CPU cache, a new float32 array per chunk takes
+        # longer than the products
+        buffer = np.empty((chunk_size, self.vectors.shape[1]), np.float32)
+        for start in range(0, len(self), chunk_size):
+            chunk = self.vectors[start:start + chunk_size]
+            floats = buffer[:len(chunk)]
+            floats[...] = chunk
+            np.dot(floats, query, out=scores[start:start + len(chunk)])
+
+        k = min(k, len(self))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            (
+                self.labels[self.collections[i]],
+                int(self.ids[i]),
+                float(scores[i] / 127),
+            )
+            for i in top
+        ]
@@ -0,0 +1,157 @@
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+class RequestStats:
+    """What a request cost in SQL queries and calls to govinfo and eCFR"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.upstream_calls = 0
+        self.upstream_time = 0.0
+        self.lock = Lock()
+
+        # Only kept for a profiled request, see utils.profiling
+        self.started = perf_counter()
+        self.timeline = None
+
+    def add_query(self, duration: float, sql: str = None):
+        with self.lock:
+            self.queries += 1
+            self.sql_time += duration
+            self.add_event("sql", duration, sql)
+
+    def add_upstream(self, duration: float, url: str = None):
+        with self.lock:
+            self.upstream_calls += 1
+            self.upstream_time += duration
+            self.add_event("upstream", duration, url)
+
+    def add_event(self, kind: str, duration: float, detail: str):
+        if self.timeline is not None:
+            start = perf_counter() - duration - self.started
+            self.timeline.append({
+                "kind": kind,
+                "start": round(start * 1000, 3),
+                "duration": round(duration * 1000, 3),
+                "detail": detail,
+            })
+
+    def __repr__(self):
+        return (
+            f"<RequestStats queries={self.queries} "
+            f"sql={self.sql_time * 1000:.1f}ms "
+            f"upstream_calls={self.upstream_calls} "
+            f"upstream={self.upstream_time * 1000:.1f}ms>"
+        )
+
+    def get_server_timing(self) -> str:
+        """The stats as a Server-Timing header, shown by the browser
+        dev tools next to the request"""
+        return ", ".join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'upstream;dur={self.upstream_time * 1000:.1f};'
+            f'desc="{self.upstream_calls} calls"',
+        ])
+
+
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    'current_stats', default=None)
+
+
+class QueryTimer:
+    """Database execute wrapper counting and timing the queries"""
+
+    def __init__(self, stats: RequestStats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.add_query(perf_counter() - start, sql)
+
+
+def record_upstream(duration: float, url: str = None):
+    """Count a call to an upstream API in the stats of the request"""
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add_upstream(duration, url)
+
+
+@contextmanager
+def collect_stats():
+    """Collect the stats of everything run in the block"""
+    stats = RequestStats()
+    token = current_stats.set(stats)
+
+    try:
+        with _wrap_connections(QueryTimer(stats), list(connections)):
+            yield stats
+    finally:
+        current_stats.reset(token)
+
+
+@asynccontextmanager
+async def acollect_stats():
+    """collect_stats for an async request, whose queries run on the
+    thread sync_to_async keeps for it"""
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    timer = QueryTimer(stats)
+
+    await sync_to_async(_add_wrapper)(timer)
+    try:
+        yield stats
+    finally:
+        await sync_to_async(_remove_wrapper)(timer)
+        current_stats.reset(token)
+
+
+def track(func):
+    """Count what the function costs for the current request when it
+    runs on another thread, which has its own connections"""
+    stats = current_stats.get()
+    if stats is None:
+        return func
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        token = current_stats.set(stats)
+        try:
+            with _wrap_connections(QueryTimer(stats), list(connections)):
+                return func(*args, **kwargs)
+        finally:
+            current_stats.reset(token)
+
+    return inner
+
+
+@contextmanager
+def _wrap_connections(wrapper, aliases: list):
+    if not aliases:
+        yield
+        return
+
+    with connections[aliases[0]].execute_wrapper(wrapper):
+        with _wrap_connections(wrapper, aliases[1:]):
+            yield
+
+
+def _add_wrapper(wrapper):
+    for alias in connections:
+        connections[alias].execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    for alias in connections:
+        connections[alias].execute_wrappers.remove(wrapper)
@@ -0,0 +1,197 @@
+import fcntl
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+HAS_CHILDREN = 1
+HAS_PAPER = 2
+
+# Citation keys longer than this are not looked up in the snapshot
+KEY_WIDTH = 48
+
+
+def publish_directory(path: Path, write: Callable[[Path], object]):
+    """Write a new version of a directory and swap it in for the readers.
+    The path is a symlink to the latest version, replaced in one step, a
+    reader sees the old or the new version, never none. Builders take
+    turns, the previous version is kept for the readers loading it"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path.with_name(f"{path.name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        version = path.with_name(f"{path.name}.{time.time_ns()}")
+        version.mkdir()
+        write(version)
+
+        link = path.with_name(f"{path.name}.link")
+        link.unlink(missing_ok=True)
+        link.symlink_to(version.name)
+        if path.is_dir() and not path.is_symlink():
+            # Saved before the versions, replaced once
+            shutil.rmtree(path)
+        os.replace(link, path)
+
+        versions = sorted(
+            path.parent.glob(f"{path.name}.[0-9]*"),
+            key=lambda old: int(old.suffix[1:]))
+        for old in versions[:-2]:
+            shutil.rmtree(old)
+
+
+class TocRow(NamedTuple):
+    """What the snapshot keeps of a node"""
+
+    id: int
+    parent_id: Optional[int]
+    slug: str
+    label: str
+    crumb: str
+    pdf: str = ""
+    flags: int = 0
+    key: str = ""
+
+
+class TocSnapshot:
+    """The tree of a collection in flat arrays. Nodes are stored in
+    breadth first order, so the children of a node are a contiguous
+    range and only need an offset and a count. Strings are utf-8 blobs
+    with offsets, everything can be memory mapped"""
+
+    ARRAYS = ("ids", "parents", "first_child", "child_count", "flags",
+              "sorted_ids", "id_order", "keys", "key_index")
+    STRINGS = ("slug", "label", "crumb", "pdf")
+
+    def __init__(self, **arrays):
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, rows: Iterable[TocRow]):
+        """Build a snapshot from the rows of every node of the tree"""
+        rows = {row.id: row for row in rows}
+
+        children = {}
+        for row in sorted(rows.values(), key=lambda row: row.id):
+            parent_id = row.parent_id if row.parent_id in rows else None
+            children.setdefault(parent_id, []).append(row.id)
+
+        # Breadth first, the children of a node end up side by side
+        order = list(children.get(None, []))
+        first_child, child_count = [], []
+        for node_id in order:
+            nodes = children.get(node_id, [])
+            first_child.append(len(order))
+            child_count.append(len(nodes))
+            order.extend(nodes)
+
+        position = {node_id: i for i, node_id in enumerate(order)}
+        ordered = [rows[node_id] for node_id in order]
+
+        ids = np.array(order, dtype=np.int64)
+        id_order = np.argsort(ids, kind="stable").astype(np.int32)
+        keyed = sorted(
+            (row.key.encode(), position[row.id])
+            for row in ordered
+            if row.key and len(row.key.encode()) <= KEY_WIDTH
+        )
+
+        arrays = {
+            "ids": ids,
+            "parents": np.array([
+                position.get(row.parent_id, -1) for row in ordered
+            ], dtype=np.int32),
+            "first_child": np.array(first_child, dtype=np.int32),
+            "child_count": np.array(child_count, dtype=np.int32),
+            "flags": np.array(
+                [row.flags for row in ordered], dtype=np.uint8),
+            "sorted_ids": ids[id_order],
+            "id_order": id_order,
+            "keys": np.array(
+                [key for key, _ in keyed], dtype=f"S{KEY_WIDTH}"),
+            "key_index": np.array(
+                [index for _, index in keyed], dtype=np.int32),
+        }
+
+        for name in cls.STRINGS:
+            data = [getattr(row, name).encode() for row in ordered]
+            offsets = np.zeros(len(data) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(item) for item in data])
+            arrays[name] = np.frombuffer(b"".join(data), dtype=np.uint8)
+            arrays[f"{name}_offsets"] = offsets
+
+        return cls(**arrays)
+
+    @classmethod
+    def get_names(cls):
+        return [
+            *cls.ARRAYS,
+            *cls.STRINGS,
+            *(f"{name}_offsets" for name in cls.STRINGS),
+        ]
+
+    def save(self, path: Path):
+        """Write the snapshot as .npy files, published all at once"""
+        publish_directory(path, lambda directory: [
+            np.save(directory / f"{name}.npy", getattr(self, name))
+            for name in self.get_names()
+        ])
+
+    @classmethod
+    def load(cls, path: Path):
+        """Memory map a saved snapshot, pages are shared between workers"""
+        path = Path(path)
+        return cls(**{
+            name: np.load(path / f"{name}.npy", mmap_mode="r")
+            for name in cls.get_names()
+        })
+
+    def get_string(self, name: str, index: int) -> str:
+        offsets = getattr(self, f"{name}_offsets")
+        start, stop = offsets[index], offsets[index + 1]
+        return bytes(getattr(self, name)[start:stop]).decode()
+
+    def index_of(self, node_id: int) -> Optional[int]:
+        """Position of a node in the snapshot, None if it isn't in it"""
+        i = np.searchsorted(self.sorted_ids, node_id)
+        if i < len(self) and self.sorted_ids[i] == node_id:
+            return int(self.id_order[i])
+        return None
+
+    def get_children(self, index: int) -> range:
+        start = int(self.first_child[index])
+        return range(start, start + int(self.child_count[index]))
+
+    def get_roots(self) -> range:
+        """The nodes without a parent come first, the children of the
+        first one start right after them"""
+        if len(self) == 0:
+            return range(0)
+        return range(int(self.first_child[0]))
+
+    def get_path(self, index: int) -> list:
+        """Positions of the nodes from the root down to the node"""
+        path = []
+        while index >= 0:
+            path.append(index)
+            index = int(self.parents[index])
+        return path[::-1]
+
+    def find(self, key: str) -> Optional[int]:
+        """Position of the node with the citation key"""
+        data = key.encode()
+        if len(data) > KEY_WIDTH:
+            return None
+
+        i = np.searchsorted(self.keys, data)
+        if i < len(self.keys) and self.keys[i] == data:
+            return int(self.key_index[i])
+        return None